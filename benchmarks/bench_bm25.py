@@ -0,0 +1,76 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from retrieval.bm25_index import BM25Index, build_bm25_index
+
+
+def synthetic_chunks(n_reviews, chunk_size, vocab_size=50000, mean_length=40, seed=0):
+    """
+    Cleaned-review-like texts with Zipf-distributed terms, as DataFrame chunks.
+    """
+    rng = np.random.default_rng(seed)
+    vocab = np.array([f"w{i}" for i in range(vocab_size)])
+    for start in range(0, n_reviews, chunk_size):
+        size = min(chunk_size, n_reviews - start)
+        lengths = rng.poisson(mean_length, size) + 1
+        words = vocab[np.minimum(rng.zipf(1.1, lengths.sum()) - 1, vocab_size - 1)]
+        texts = [' '.join(doc) for doc in np.split(words, np.cumsum(lengths)[:-1])]
+        yield pd.DataFrame({'review_hash_id': [f"review-{i}" for i in range(start, start + size)],
+                            'cleaned_review_text': texts})
+
+
+def directory_size(path):
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def query_latencies(index, queries, top_k, prune):
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(index.search(query, top_k=top_k, prune=prune)[0])
+        latencies.append(time.perf_counter() - start)
+    return np.asarray(latencies) * 1000, results
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark BM25 index build time, size and query latency.")
+    parser.add_argument('--reviews', type=int, default=200000)
+    parser.add_argument('--chunk-size', type=int, default=50000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, 'bm25')
+        start = time.perf_counter()
+        build_bm25_index(path, chunks=synthetic_chunks(args.reviews, args.chunk_size))
+        build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = BM25Index.open(path)
+        load_seconds = time.perf_counter() - start
+        postings = len(index.docs)
+        size = directory_size(path)
+        print(f"{args.reviews:,} reviews, {len(index.terms):,} terms, {postings:,} postings")
+        print(f"build {build_seconds:.1f}s ({args.reviews / build_seconds:,.0f} reviews/sec), load {load_seconds:.2f}s, "
+              f"on disk {size / 2 ** 20:.1f} MiB ({size * 8 / postings:.1f} bits/posting)")
+
+        # Queries of 1-4 terms drawn from the corpus, so common and rare terms both appear
+        rng = np.random.default_rng(1)
+        sample = next(synthetic_chunks(args.queries, args.queries, seed=2))['cleaned_review_text']
+        queries = [' '.join(rng.choice(text.split(), rng.integers(1, 5))) for text in sample]
+
+        exhaustive, expected = query_latencies(index, queries, args.top_k, prune=False)
+        pruned, results = query_latencies(index, queries, args.top_k, prune=True)
+        for label, latencies in (("exhaustive", exhaustive), ("MaxScore", pruned)):
+            print(f"{label:<12} p50={np.percentile(latencies, 50):7.2f}ms  p99={np.percentile(latencies, 99):7.2f}ms")
+        same = sum(set(a) == set(b) for a, b in zip(results, expected))
+        print(f"MaxScore top-{args.top_k} identical to exhaustive for {same}/{len(queries)} queries")
@@ -0,0 +1,48 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from sqlalchemy import create_engine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from ingestion.bulk_loader import bulk_load
+
+DEFAULT_INPUT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'processed', 'cleaned_data.csv'))
+
+
+def timed(label, rows, func):
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {rows / elapsed:>12,.0f} rows/sec ({elapsed:.2f}s)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark bulk load strategies against a local SQLite database.")
+    parser.add_argument('--input', default=DEFAULT_INPUT)
+    parser.add_argument('--scale', type=int, default=20, help="How many times to repeat the reviews")
+    parser.add_argument('--chunksize', type=int, default=10000)
+    parser.add_argument('--url', default=None, help="SQLAlchemy URL; defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input, dtype=str)
+    df = pd.concat([df] * args.scale, ignore_index=True)
+    chunks = lambda: (df.iloc[start:start + args.chunksize] for start in range(0, len(df), args.chunksize))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        engine = create_engine(args.url or f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}")
+        print(f"Loading {len(df):,} rows x {len(df.columns)} columns into {engine.url.get_backend_name()}")
+
+        timed("to_sql if_exists='replace'", len(df),
+              lambda: df.to_sql('product_reviews', con=engine, if_exists='replace', index=False))
+        for strategy in ('executemany', 'multi', 'fast_executemany'):
+            timed(f"bulk_load replace/{strategy}", len(df),
+                  lambda: bulk_load(chunks(), 'product_reviews', engine, strategy=strategy, chunksize=args.chunksize))
+        timed("bulk_load merge/auto", len(df),
+              lambda: bulk_load(chunks(), 'product_reviews', engine, mode='merge', key_columns=['review_hash_id'],
+                                chunksize=args.chunksize))
+        engine.dispose()
@@ -0,0 +1,64 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from benchmarks.synthetic_reviews import write_reviews
+from ingestion.data_ingestion import DEFAULT_CHUNK_SIZE, apply_schema
+
+INGEST_SCRIPT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'ingestion', 'data_ingestion.py'))
+
+
+def run_loader(path, db_path, eager, chunk_size):
+    """
+    Run one load in a fresh process, so its peak RSS is its own, and return the job's stats.
+    """
+    command = [sys.executable, INGEST_SCRIPT, '--input', path, '--chunk-size', str(chunk_size), '--json']
+    if eager:
+        command.append('--eager')
+    env = dict(os.environ, LLM_DB_URL=f"sqlite:///{db_path}", LLM_METRICS_ENABLED='0')
+    result = subprocess.run(command, capture_output=True, text=True, env=env)
+    if result.returncode != 0:
+        return {'error': (result.stderr.strip().splitlines() or ['failed'])[-1]}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the streaming, schema-typed ingestion with the original whole-file loader.")
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--formats', nargs='+', default=['json', 'jsonl', 'csv'])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        paths = {}
+        for file_format in args.formats:
+            paths[file_format] = os.path.join(tmp_dir, f"reviews.{file_format}")
+            write_reviews(paths[file_format], args.rows)
+
+        # In-memory footprint of one chunk with inferred dtypes versus the explicit schema
+        sample = pd.read_csv(paths['csv'], nrows=args.chunk_size) if 'csv' in paths else None
+        if sample is not None:
+            inferred = sample.memory_usage(deep=True).sum()
+            typed = apply_schema(sample).memory_usage(deep=True).sum()
+            print(f"One {len(sample):,}-row chunk: {inferred / 2 ** 20:,.1f} MiB inferred, "
+                  f"{typed / 2 ** 20:,.1f} MiB typed ({typed / inferred:.0%})")
+
+        print(f"{args.rows:,} reviews into SQLite")
+        print(f"{'format':<8}{'loader':<12}{'rows/sec':>12}{'seconds':>10}{'peak RSS MiB':>15}")
+        for file_format, path in paths.items():
+            size_mib = os.path.getsize(path) / 2 ** 20
+            for label, eager in (('eager', True), ('streaming', False)):
+                stats = run_loader(path, os.path.join(tmp_dir, f"{file_format}_{label}.db"), eager, args.chunk_size)
+                if 'error' in stats:
+                    print(f"{file_format:<8}{label:<12}  {stats['error']}")
+                    continue
+                print(f"{file_format:<8}{label:<12}{stats['rows_per_sec']:>12,.0f}{stats['seconds']:>10.2f}"
+                      f"{stats['peak_rss_mib']:>15,.0f}")
+            print(f"{'':<8}({size_mib:,.0f} MiB file)")
@@ -0,0 +1,71 @@
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from benchmarks.stub_encoder import StubEncoder
+from monitoring.logging_config import LazyRepr, SampledLogger, setup_logging, stop_logging
+
+PROMPT = "Which deodorant do reviewers say lasts all day without leaving white marks on clothes?"
+
+
+def per_call(func, calls):
+    """
+    Mean and p99 microseconds per call in the calling thread, plus the loop's total seconds.
+    """
+    latencies = np.empty(calls)
+    start = time.perf_counter()
+    for i in range(calls):
+        call_start = time.perf_counter_ns()
+        func()
+        latencies[i] = time.perf_counter_ns() - call_start
+    return latencies.mean() / 1000, np.percentile(latencies, 99) / 1000, time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Per-call logging overhead on the query path, synchronous versus queued handlers.")
+    parser.add_argument('--calls', type=int, default=20000)
+    args = parser.parse_args()
+
+    from retrieval.query_api import generate_embedding
+    from vectorization import model_manager
+
+    # A cached prompt, so generate_embedding's cost is the cache lookup plus its logging
+    model_manager._models[model_manager.DEFAULT_MODEL_NAME] = StubEncoder()
+    model = model_manager.get_embedding_model()
+    generate_embedding(PROMPT, model)
+    payload = [{'review_id': f"review-{i}", 'embedding': np.random.rand(384).tolist()} for i in range(5)]
+    logger = logging.getLogger('bench')
+
+    # The console handler writes to stderr; keep the terminal for the results
+    stderr, sys.stderr = sys.stderr, open(os.devnull, 'w')
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for label, queued in (('synchronous', False), ('queued', True)):
+            cases = [
+                ('info, prompt f-string', lambda: logger.info(f"Generating embedding for prompt: {PROMPT}")),
+                ('info, 5 embeddings f-string', lambda: logger.info(f"First few entries: {payload[:5]}")),
+                ('info, 5 embeddings LazyRepr', lambda: logger.info("First few entries: %s", LazyRepr(payload[:5]))),
+                ('sampled 1 in 100', lambda: sampled.info("Generating embedding for prompt: %s", LazyRepr(PROMPT))),
+                ('generate_embedding (cached)', lambda: generate_embedding(PROMPT, model)),
+            ]
+            for case, func in cases:
+                # A fresh log file per case, so rotation and file size are comparable
+                setup_logging(log_file=os.path.join(tmp_dir, f"{label}-{len(rows)}.log"), queued=queued)
+                sampled = SampledLogger(logging.getLogger('bench.requests'), sample_every=100)
+                mean_us, p99_us, seconds = per_call(func, args.calls)
+                drain_start = time.perf_counter()
+                stop_logging()
+                rows.append((label, case, mean_us, p99_us, seconds + time.perf_counter() - drain_start))
+    sys.stderr = stderr
+
+    print(f"{args.calls:,} calls per case; total includes draining the queue")
+    print(f"{'handlers':<13}{'case':<32}{'mean us':>9}{'p99 us':>9}{'total s':>9}")
+    for label, case, mean_us, p99_us, total in rows:
+        print(f"{label:<13}{case:<32}{mean_us:>9.1f}{p99_us:>9.1f}{total:>9.2f}")
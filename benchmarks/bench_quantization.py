@@ -0,0 +1,75 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from retrieval.exact_search import ExactSearchIndex
+from retrieval.quantized_search import QuantizedIndex
+from vectorization.vector_store import VectorStore
+
+
+def synthetic_embeddings(n, dim, n_clusters=1000, noise=0.35, seed=0):
+    """
+    Clustered unit vectors, a rough stand-in for sentence embeddings of related reviews.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, n_clusters, n)] + noise * rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def recall_at_k(results, expected):
+    return float(np.mean([len(set(a) & set(b)) / len(b) for a, b in zip(results, expected)]))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark recall, latency and memory of int8 and binary vector codes.")
+    parser.add_argument('--reviews', type=int, default=100000)
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--top-k', type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = synthetic_embeddings(args.reviews, args.dim)
+    rng = np.random.default_rng(1)
+    # Queries are perturbed corpus vectors, so each has a dense neighbourhood like a real prompt
+    queries = vectors[rng.choice(args.reviews, args.queries, replace=False)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32) / np.sqrt(args.dim)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = VectorStore.create(os.path.join(tmp_dir, 'store'), dim=args.dim)
+        ids = [f"review-{i}" for i in range(args.reviews)]
+        for start in range(0, args.reviews, 50000):
+            store.append(ids[start:start + 50000], vectors[start:start + 50000])
+
+        exact = ExactSearchIndex.from_vector_store(store.path)
+        expected, _ = exact.search(queries, top_k=args.top_k)
+
+        print(f"{args.reviews:,} vectors x {args.dim} dims, recall@{args.top_k} against exact float32 search")
+        print(f"{'mode':<22}{'recall':>8}{'p50 ms':>9}{'bytes/vec':>11}{'MiB per 1M':>12}")
+        configs = [('float32', None, None)] + [(mode, mode, rescore_k) for mode in ('int8', 'binary') for rescore_k in (0, 100, 500)]
+        indexes = {}
+        for label, mode, rescore_k in configs:
+            if mode is None:
+                index, bytes_per_vector = exact, exact.matrix.nbytes / len(exact)
+                search = lambda query: index.search(query, top_k=args.top_k)[0]
+            else:
+                if mode not in indexes:
+                    indexes[mode] = QuantizedIndex.from_vector_store(store.path, mode)
+                index = indexes[mode]
+                bytes_per_vector = index.codes.nbytes / len(index)
+                label = f"{mode} rescore={rescore_k}" if rescore_k else f"{mode} codes only"
+                search = lambda query: index.search(query, top_k=args.top_k, rescore_k=rescore_k)[0]
+
+            latencies, results = [], []
+            for query in queries:
+                start = time.perf_counter()
+                results.append(search(query))
+                latencies.append(time.perf_counter() - start)
+            print(f"{label:<22}{recall_at_k(results, expected):>8.3f}{np.percentile(latencies, 50) * 1000:>9.2f}"
+                  f"{bytes_per_vector:>11.0f}{bytes_per_vector * 1e6 / 2 ** 20:>12.0f}")
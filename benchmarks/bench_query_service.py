@@ -0,0 +1,101 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from benchmarks.stub_encoder import StubEncoder
+
+
+def latency_report(label, latencies, elapsed):
+    latencies_ms = np.asarray(latencies) * 1000
+    print(f"{label:<28} p50={np.percentile(latencies_ms, 50):8.2f}ms  p99={np.percentile(latencies_ms, 99):8.2f}ms  "
+          f"QPS={len(latencies) / elapsed:8.1f}")
+
+
+def build_fixtures(tmp_dir, n_reviews, dim, seed=0):
+    """
+    Write the same random corpus to a SQLite review_embeddings_table and to a binary vector store.
+    """
+    from ingestion.bulk_loader import bulk_load
+    from ingestion.database_setup import get_engine
+    from vectorization.vector_store import VectorStore
+
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n_reviews, dim)).astype(np.float32)
+    review_ids = [f"review-{i}" for i in range(n_reviews)]
+    table = pd.DataFrame({'review_id': review_ids, 'review_embeddings': [json.dumps(v.tolist()) for v in vectors]})
+    bulk_load(table, 'review_embeddings_table', get_engine('write'))
+
+    store_path = os.path.join(tmp_dir, 'vector_store')
+    VectorStore.create(store_path, dim=dim).append(review_ids, vectors)
+    return store_path
+
+
+def run_sequential(prompts, encoder, top_n):
+    from retrieval.query_api import generate_embedding, retrieve_similar_embeddings
+
+    latencies = []
+    start = time.perf_counter()
+    for prompt in prompts:
+        t0 = time.perf_counter()
+        retrieve_similar_embeddings(generate_embedding(prompt, encoder), top_n)
+        latencies.append(time.perf_counter() - t0)
+    return latencies, time.perf_counter() - start
+
+
+async def run_service(prompts, service, concurrency, top_n):
+    latencies = []
+    pending = iter(prompts)
+
+    async def client():
+        for prompt in pending:
+            t0 = time.perf_counter()
+            await service.query(prompt, top_n)
+            latencies.append(time.perf_counter() - t0)
+
+    await service.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    await service.stop()
+    return latencies, elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Load-test the micro-batching query service against the sequential path.")
+    parser.add_argument('--reviews', type=int, default=20000)
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--sequential-requests', type=int, default=20, help="The sequential path scans the table per query")
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--top-n', type=int, default=5)
+    parser.add_argument('--per-call-ms', type=float, default=5.0, help="Stub encoder fixed cost per encode call")
+    parser.add_argument('--per-item-ms', type=float, default=0.5, help="Stub encoder cost per text")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.environ['LLM_DB_URL'] = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+        from retrieval.query_service import QueryService
+
+        store_path = build_fixtures(tmp_dir, args.reviews, 384)
+        encoder = StubEncoder(per_call_ms=args.per_call_ms, per_item_ms=args.per_item_ms)
+        prompts = [f"query about product {i % 200} battery life" for i in range(args.requests)]
+        print(f"{args.reviews:,} reviews, {args.requests} requests, concurrency {args.concurrency}")
+
+        latencies, elapsed = run_sequential(prompts[:args.sequential_requests], encoder, args.top_n)
+        latency_report("sequential (DB scan)", latencies, elapsed)
+
+        service = QueryService.from_vector_store(store_path, encoder=encoder, max_batch_size=args.max_batch_size,
+                                                 max_wait_ms=args.max_wait_ms)
+        latencies, elapsed = asyncio.run(run_service(prompts, service, args.concurrency, args.top_n))
+        latency_report("micro-batched service", latencies, elapsed)
+        print(f"mean batch size {np.mean(service.batch_sizes):.1f} over {len(service.batch_sizes)} batches")
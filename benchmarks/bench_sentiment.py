@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from preprocessing.sentiment import LexiconSentimentScorer, TextBlobSentimentScorer, parity_report
+
+DEFAULT_INPUT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'processed', 'cleaned_data.csv'))
+
+
+def time_scorer(label, scorer, texts):
+    start = time.perf_counter()
+    scorer.score(texts)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<34} {len(texts) / elapsed:>12,.0f} rows/sec ({elapsed:.2f}s)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark sentiment backends and check parity with TextBlob.")
+    parser.add_argument('--input', default=DEFAULT_INPUT)
+    parser.add_argument('--scale', type=int, default=10, help="How many times to repeat the reviews")
+    parser.add_argument('--min-within', type=float, default=0.99,
+                        help="Fail if fewer than this share of reviews score within 0.01 of TextBlob")
+    args = parser.parse_args()
+
+    texts = pd.read_csv(args.input)['review_text'].dropna().astype(str).tolist()
+
+    report = parity_report(texts)
+    print(f"Parity with TextBlob on {report['n']} reviews: MAE={report['mae']:.5f}, "
+          f"within 0.01={report['within_0_01']:.2%}, sign agreement={report['sign_agreement']:.2%}, "
+          f"pearson={report['pearson']:.5f}")
+
+    # Make each copy distinct so the cache and deduplication don't hide the scoring cost
+    scaled = [f"{text} {i}" for i in range(args.scale) for text in texts]
+    time_scorer("textblob (per row)", TextBlobSentimentScorer(cache_size=0), scaled)
+    time_scorer("lexicon (vectorized)", LexiconSentimentScorer(cache_size=0), scaled)
+    time_scorer("lexicon (duplicates, cached)", LexiconSentimentScorer(), texts * args.scale)
+
+    if report['within_0_01'] < args.min_within:
+        print("Lexicon scorer diverges from TextBlob beyond the allowed threshold.")
+        sys.exit(1)
@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from benchmarks.bench_quantization import synthetic_embeddings
+from benchmarks.stub_encoder import StubEncoder
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+# Modules a fast-start process should never load for a cached prompt
+HEAVY_MODULES = ('torch', 'sentence_transformers', 'transformers', 'sklearn', 'scipy', 'sqlalchemy', 'pandas')
+PROMPT = "battery life is great but the screen scratches easily"
+
+# Run in a fresh interpreter: import the retrieval entry point, answer one cached prompt
+FIRST_RESULT_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+from retrieval.query_api import generate_embedding, initialize_embedding_model, retrieve_similar_embeddings_from_store
+imported = time.perf_counter()
+model = initialize_embedding_model()
+embedding = generate_embedding({prompt!r}, model)
+ids = retrieve_similar_embeddings_from_store(embedding, top_n=5, store_path={store_path!r})
+done = time.perf_counter()
+print(json.dumps({{'import_s': imported - start, 'first_result_s': done - start, 'results': len(ids),
+                  'loaded': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def parse_importtime(stderr):
+    """
+    (top-level modules, cumulative seconds of each, self seconds per root package) from -X importtime output.
+    """
+    top_level, by_package = {}, {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        package = name.strip().split('.')[0]
+        by_package[package] = by_package.get(package, 0.0) + int(self_us) / 1e6
+        if not name.startswith('  '):  # Indentation marks modules imported by another one
+            top_level[name.strip()] = int(cumulative_us) / 1e6
+    return top_level, by_package
+
+
+def import_time(module, top=8):
+    """
+    Cumulative import time of `module` in a fresh interpreter, its heaviest packages and the heavy modules it loaded.
+    """
+    code = f"import json, sys; import {module}; print(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))"
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], capture_output=True, text=True, cwd=ROOT)
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1]}
+    top_level, by_package = parse_importtime(result.stderr)
+    heaviest = sorted(by_package.items(), key=lambda item: -item[1])[:top]
+    return {'seconds': top_level.get(module, 0.0), 'heaviest': heaviest, 'loaded': json.loads(result.stdout.strip().splitlines()[-1])}
+
+
+def first_result(store_path, env):
+    """
+    Wall time from interpreter launch to the first search result, plus the in-process breakdown.
+    """
+    script = FIRST_RESULT_SCRIPT.format(prompt=PROMPT, store_path=store_path, heavy=HEAVY_MODULES)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, cwd=ROOT, env=env)
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        return {'error': result.stderr.strip().splitlines()[-1]}
+    return dict(json.loads(result.stdout.strip().splitlines()[-1]), wall_s=wall)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Measure import time and time to first result of the retrieval entry point.")
+    parser.add_argument('--reviews', type=int, default=200000, help="Vectors in the synthetic store")
+    parser.add_argument('--dim', type=int, default=384)
+    parser.add_argument('--modules', nargs='+', default=['retrieval.query_api', 'retrieval.query_service'])
+    args = parser.parse_args()
+
+    print(f"{'module':<36}{'import s':>10}  heavy modules loaded / heaviest packages (self time)")
+    for module in args.modules + ['sklearn.metrics.pairwise', 'sqlalchemy', 'pandas', 'sentence_transformers']:
+        stats = import_time(module)
+        if 'error' in stats:
+            print(f"{module:<36}{'-':>10}  {stats['error']}")
+            continue
+        heaviest = ', '.join(f"{name} {seconds * 1000:.0f}ms" for name, seconds in stats['heaviest'][:4])
+        print(f"{module:<36}{stats['seconds']:>10.3f}  [{', '.join(stats['loaded'])}] {heaviest}")
+
+    from retrieval.exact_search import prebuild_exact_index
+    from vectorization import model_manager
+    from vectorization.vector_store import VectorStore
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = VectorStore.create(os.path.join(tmp_dir, 'store'), dim=args.dim)
+        vectors = synthetic_embeddings(args.reviews, args.dim)
+        ids = [f"review-{i}" for i in range(args.reviews)]
+        for start in range(0, args.reviews, 50000):
+            store.append(ids[start:start + 50000], vectors[start:start + 50000])
+
+        # The stub stands in for the model, so the cache can be built without downloading it
+        cache_path = os.path.join(tmp_dir, 'query_cache')
+        os.environ[model_manager.QUERY_CACHE_PATH_ENV] = cache_path
+        model_manager._models[model_manager.DEFAULT_MODEL_NAME] = StubEncoder(args.dim)
+        model_manager.precompute_query_embeddings([PROMPT])
+
+        env = dict(os.environ, **{model_manager.FAST_START_ENV: '1'})
+        print(f"\nTime to first result, fast start with a cached prompt, {args.reviews:,} x {args.dim} store:")
+        print(f"{'index':<28}{'import s':>10}{'first result s':>16}{'process wall s':>16}  heavy modules loaded")
+        for label in ('normalized at startup', 'prebuilt (memory-mapped)'):
+            if label.startswith('prebuilt'):
+                prebuild_exact_index(store.path)
+            stats = first_result(store.path, env)
+            if 'error' in stats:
+                print(f"{label:<28}  {stats['error']}")
+                continue
+            print(f"{label:<28}{stats['import_s']:>10.3f}{stats['first_result_s']:>16.3f}{stats['wall_s']:>16.3f}  "
+                  f"[{', '.join(stats['loaded'])}]")
@@ -0,0 +1,138 @@
+import argparse
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from preprocessing.cleaning_engine import clean_text_fast
+
+DEFAULT_INPUT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'input', 'amazon_reviews.csv'))
+QUERY = "What do customers say about this product?"
+
+
+def load_contexts(input_csv=DEFAULT_INPUT, n_contexts=20, reviews_per_context=8):
+    """
+    A fixed set of review contexts: the first `n_contexts` products with at least three reviews.
+    """
+    df = pd.read_csv(input_csv, encoding='utf-8-sig', usecols=['retailer_product_code', 'review_text']).dropna()
+    contexts = []
+    for _, group in df.groupby('retailer_product_code', sort=True):
+        if len(group) >= 3:
+            contexts.append([{'review_text': text} for text in group['review_text'].head(reviews_per_context)])
+        if len(contexts) == n_contexts:
+            break
+    return contexts
+
+
+def _ngrams(tokens, n):
+    return Counter(tuple(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+
+
+def _f1(overlap, candidate_total, reference_total):
+    if not overlap:
+        return 0.0
+    precision, recall = overlap / candidate_total, overlap / reference_total
+    return 2 * precision * recall / (precision + recall)
+
+
+def rouge(candidate, reference):
+    """
+    ROUGE-1, ROUGE-2 and ROUGE-L F1 on cleaned, whitespace-split tokens.
+    """
+    cand, ref = clean_text_fast(candidate).split(), clean_text_fast(reference).split()
+    scores = {}
+    for n in (1, 2):
+        cand_ngrams, ref_ngrams = _ngrams(cand, n), _ngrams(ref, n)
+        scores[f"rouge{n}"] = _f1(sum((cand_ngrams & ref_ngrams).values()), sum(cand_ngrams.values()), sum(ref_ngrams.values()))
+    # Longest common subsequence, one row at a time
+    previous = [0] * (len(ref) + 1)
+    for token in cand:
+        current = [0]
+        for j, ref_token in enumerate(ref):
+            current.append(previous[j] + 1 if token == ref_token else max(previous[j + 1], current[j]))
+        previous = current
+    scores['rougeL'] = _f1(previous[-1], len(cand), len(ref))
+    return scores
+
+
+def run_config(model, quantize, threads, contexts, max_length, min_length, queue):
+    """
+    Load one configuration in a fresh process and summarize every context; reports through `queue`.
+    """
+    from retrieval.rag_use_case import PROMPT_TEMPLATE, pack_context
+    from retrieval.summarizer_backend import SummarizerBackend
+
+    start = time.perf_counter()
+    backend = SummarizerBackend(model, quantize=quantize, num_threads=threads).load()
+    load_seconds = time.perf_counter() - start
+    inputs = []
+    for records in contexts:
+        packed = pack_context(records, QUERY, backend.tokenizer, backend.max_input_tokens)
+        inputs.append(PROMPT_TEMPLATE.format(context=" ".join(record['review_text'] for record in packed), query=QUERY))
+
+    backend(inputs[0], max_length=max_length, min_length=min_length)  # Warm-up
+    latencies, outputs = [], []
+    for input_text in inputs:
+        t0 = time.perf_counter()
+        outputs.append(backend(input_text, max_length=max_length, min_length=min_length, do_sample=False)[0]['summary_text'])
+        latencies.append(time.perf_counter() - t0)
+    queue.put({'load_seconds': load_seconds, 'latencies': latencies, 'outputs': outputs,
+               'parameter_mib': backend.parameter_bytes() / 2 ** 20,
+               'peak_rss_mib': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024})
+
+
+def measure(model, quantize, threads, contexts, max_length, min_length):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target=run_config, args=(model, quantize, threads, contexts, max_length, min_length, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+if __name__ == '__main__':
+    from retrieval.summarizer_backend import DEFAULT_SUMMARIZER_MODEL, DISTILLED_SUMMARIZER_MODEL
+
+    parser = argparse.ArgumentParser(description="Compare summarizer backends on latency, memory and ROUGE against the fp32 baseline.")
+    parser.add_argument('--input', default=DEFAULT_INPUT)
+    parser.add_argument('--contexts', type=int, default=20)
+    parser.add_argument('--baseline', default=DEFAULT_SUMMARIZER_MODEL)
+    parser.add_argument('--distilled', default=DISTILLED_SUMMARIZER_MODEL, help="Hub name or local directory; '' to skip")
+    parser.add_argument('--threads', type=int, default=None)
+    parser.add_argument('--max-length', type=int, default=40)
+    parser.add_argument('--min-length', type=int, default=30)
+    parser.add_argument('--output', default=None, help="Write the results as JSON to this path")
+    args = parser.parse_args()
+
+    contexts = load_contexts(args.input, args.contexts)
+    configs = [(args.baseline, False), (args.baseline, True)]
+    if args.distilled:
+        configs += [(args.distilled, False), (args.distilled, True)]
+
+    results, reference = [], None
+    print(f"{len(contexts)} review contexts, threads={args.threads or 'default'}")
+    for model, quantize in configs:
+        result = measure(model, quantize, args.threads, contexts, args.max_length, args.min_length)
+        reference = reference or result['outputs']
+        scores = [rouge(output, ref) for output, ref in zip(result['outputs'], reference)]
+        result.update({'model': model, 'quantize': quantize,
+                       **{name: float(np.mean([s[name] for s in scores])) for name in ('rouge1', 'rouge2', 'rougeL')}})
+        latencies_ms = np.asarray(result['latencies']) * 1000
+        label = f"{os.path.basename(model.rstrip('/'))}{' int8' if quantize else ''}"
+        print(f"{label:<30} p50={np.percentile(latencies_ms, 50):8.1f}ms  p95={np.percentile(latencies_ms, 95):8.1f}ms  "
+              f"params={result['parameter_mib']:7.1f}MiB  peak RSS={result['peak_rss_mib']:7.1f}MiB  "
+              f"ROUGE-1/2/L vs baseline={result['rouge1']:.3f}/{result['rouge2']:.3f}/{result['rougeL']:.3f}")
+        results.append(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
@@ -0,0 +1,50 @@
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from preprocessing.cleaning_engine import clean_texts, clean_texts_parallel
+from preprocessing.text_cleaning import clean_text
+
+DEFAULT_INPUT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'input', 'amazon_reviews.csv'))
+
+
+def load_texts(input_csv=DEFAULT_INPUT, scale=100):
+    """
+    Every string field of the bundled review export, repeated `scale` times.
+    """
+    df = pd.read_csv(input_csv, dtype=str, keep_default_na=False)
+    texts = [value for column in df.columns for value in df[column].tolist()]
+    return texts * scale
+
+
+def time_it(label, func, texts):
+    start = time.perf_counter()
+    result = func(texts)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {len(texts) / elapsed:>14,.0f} values/sec ({elapsed:.2f}s)")
+    return result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark text cleaning against the original clean_text.")
+    parser.add_argument('--input', default=DEFAULT_INPUT)
+    parser.add_argument('--scale', type=int, default=100, help="How many times to repeat the input")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    texts = load_texts(args.input, args.scale)
+    print(f"Cleaning {len(texts):,} values ({args.scale}x {os.path.basename(args.input)})")
+
+    expected = time_it("clean_text (baseline)", lambda values: [clean_text(v) for v in values], texts)
+    single = time_it("clean_texts (single pass)", clean_texts, texts)
+    parallel = time_it("clean_texts_parallel", lambda values: clean_texts_parallel(values, n_workers=args.workers), texts)
+
+    if single != expected or parallel != expected:
+        print("Output mismatch against clean_text!")
+        sys.exit(1)
+    print("Outputs identical to clean_text.")
@@ -0,0 +1,35 @@
+import hashlib
+import time
+
+import numpy as np
+
+
+class StubEncoder:
+    """
+    Offline stand-in for SentenceTransformer: deterministic pseudo-random unit vectors per text.
+
+    `per_call_ms` and `per_item_ms` add a fixed and a per-text delay to mimic the cost profile of
+    a real encoder, where one call over many texts is much cheaper than many single-text calls.
+    """
+
+    def __init__(self, dim=384, per_call_ms=0.0, per_item_ms=0.0):
+        self.dim = dim
+        self.per_call_ms = per_call_ms
+        self.per_item_ms = per_item_ms
+
+    def get_sentence_embedding_dimension(self):
+        return self.dim
+
+    def _vector(self, text):
+        seed = int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def encode(self, texts, batch_size=32, convert_to_numpy=True, show_progress_bar=False, **kwargs):
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        delay = self.per_call_ms + self.per_item_ms * len(texts)
+        if delay:
+            time.sleep(delay / 1000.0)
+        vectors = np.stack([self._vector(text) for text in texts]) if texts else np.zeros((0, self.dim), dtype=np.float32)
+        return vectors[0] if single else vectors
@@ -0,0 +1,199 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from benchmarks.stub_encoder import StubEncoder
+from benchmarks.synthetic_reviews import ReviewProfile, generate_reviews
+from monitoring.metrics import peak_rss_bytes
+
+DEFAULT_SCALES = (10000, 100000)
+DEFAULT_MAX_REGRESSION = 0.2
+# The table-scan retrieval parses every stored embedding from JSON per query; cap its table size
+DEFAULT_DB_SCAN_MAX_ROWS = 20000
+
+# Metrics where larger is better; every other metric is a latency or duration
+THROUGHPUT_METRICS = ('rows_per_sec',)
+
+
+def _throughput(seconds, rows):
+    return {'seconds': seconds, 'rows': rows, 'rows_per_sec': rows / seconds if seconds > 0 else float('inf')}
+
+
+def _latencies(latencies):
+    latencies_ms = np.asarray(latencies) * 1000
+    return {'queries': len(latencies), 'p50_ms': float(np.percentile(latencies_ms, 50)),
+            'p99_ms': float(np.percentile(latencies_ms, 99)), 'mean_ms': float(latencies_ms.mean())}
+
+
+def _timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def run_scale(n_rows, tmp_dir, profile, queries=50, db_scan_max_rows=DEFAULT_DB_SCAN_MAX_ROWS, real_encoder=False, seed=0):
+    """
+    Time every pipeline stage on `n_rows` synthetic reviews against a fresh SQLite database.
+    """
+    from ingestion.bulk_loader import bulk_load
+    from ingestion.database_setup import dispose_engines, get_engine
+    from preprocessing.cleaning_engine import clean_series
+    from preprocessing.preprocess_pipeline import feature_engineering
+    from preprocessing.text_cleaning import clean_text
+    from retrieval import hydration
+    from retrieval.query_api import query_database_for_records, retrieve_similar_embeddings, retrieve_similar_embeddings_from_store
+    from vectorization import model_manager
+    from vectorization.embeddings_model import MODEL_NAME, encode_batch
+    from vectorization.vector_store import VectorStore
+
+    dispose_engines()
+    hydration._hydrators.clear()
+    os.environ['LLM_DB_URL'] = f"sqlite:///{os.path.join(tmp_dir, f'bench_{n_rows}.db')}"
+    if not real_encoder:
+        # Registered under the production model name, so encode_batch and generate_embedding use it
+        model_manager._models[MODEL_NAME] = StubEncoder()
+    results = {}
+
+    df, seconds = _timed(lambda: pd.concat(generate_reviews(n_rows, profile=profile, seed=seed), ignore_index=True))
+    results['generate'] = _throughput(seconds, n_rows)
+
+    texts = df['review_text'].tolist()
+    _, seconds = _timed(lambda: [clean_text(text) for text in texts])
+    results['clean_text'] = _throughput(seconds, n_rows)
+    df['cleaned_review_text'], seconds = _timed(clean_series, df['review_text'])
+    results['clean_series'] = _throughput(seconds, n_rows)
+
+    # feature_engineering scales a 'rating' column
+    df['rating'] = df['review_rating']
+    df, seconds = _timed(feature_engineering, df)
+    results['feature_engineering'] = _throughput(seconds, n_rows)
+
+    _, seconds = _timed(bulk_load, df, 'processed_product_reviews', get_engine('write'))
+    results['db_load'] = _throughput(seconds, n_rows)
+
+    review_ids = df['review_hash_id'].tolist()
+    embeddings, seconds = _timed(encode_batch, df['cleaned_review_text'].tolist())
+    results['embedding'] = _throughput(seconds, n_rows)
+    results['embedding']['encoder'] = MODEL_NAME if real_encoder else 'stub'
+
+    store_path = os.path.join(tmp_dir, f'vector_store_{n_rows}')
+    store = VectorStore.create(store_path, model_name=MODEL_NAME, dim=embeddings.shape[1], overwrite=True)
+    _, seconds = _timed(lambda: [store.append(review_ids[start:start + 50000], embeddings[start:start + 50000])
+                                 for start in range(0, n_rows, 50000)])
+    results['vector_store_append'] = _throughput(seconds, n_rows)
+
+    rng = np.random.default_rng(seed + 1)
+    query_vectors = embeddings[rng.integers(0, n_rows, queries)]
+
+    if n_rows <= db_scan_max_rows:
+        table = pd.DataFrame({'review_id': review_ids, 'review_embeddings': [json.dumps(v.tolist()) for v in embeddings]})
+        _, seconds = _timed(bulk_load, table, 'review_embeddings_table', get_engine('write'))
+        results['embeddings_table_load'] = _throughput(seconds, n_rows)
+        scan_queries = query_vectors[:max(queries // 10, 3)]
+        results['retrieve_similar_embeddings'] = _latencies([_timed(retrieve_similar_embeddings, q)[1] for q in scan_queries])
+    else:
+        results['retrieve_similar_embeddings'] = {'skipped': f"more than {db_scan_max_rows} rows"}
+
+    retrieve_similar_embeddings_from_store(query_vectors[0], store_path=store_path)  # Load the resident index
+    results['retrieve_similar_embeddings_from_store'] = _latencies(
+        [_timed(retrieve_similar_embeddings_from_store, q, store_path=store_path)[1] for q in query_vectors])
+
+    # Distinct random ids per query, so the hydrator cache does not hide the database reads
+    batches = [list(rng.choice(review_ids, 20, replace=False)) for _ in range(queries)]
+    results['query_database_for_records'] = _latencies([_timed(query_database_for_records, batch)[1] for batch in batches])
+
+    results['peak_rss_mib'] = (peak_rss_bytes() or 0) / 2 ** 20
+    dispose_engines()
+    return results
+
+
+def compare(results, baseline, max_regression=DEFAULT_MAX_REGRESSION, thresholds=None):
+    """
+    List regressions of `results` against `baseline`: a throughput that dropped, or a latency that
+    grew, by more than the allowed fraction. `thresholds` overrides the fraction per stage name.
+    """
+    thresholds = thresholds or {}
+    regressions = []
+    for scale, stages in results['scales'].items():
+        for stage, metrics in stages.items():
+            base = baseline.get('scales', {}).get(scale, {}).get(stage)
+            if not isinstance(metrics, dict) or not isinstance(base, dict):
+                continue
+            allowed = thresholds.get(stage, max_regression)
+            for metric in ('rows_per_sec', 'p50_ms', 'p99_ms'):
+                if metric not in metrics or metric not in base or not base[metric]:
+                    continue
+                change = metrics[metric] / base[metric] - 1
+                worse = -change if metric in THROUGHPUT_METRICS else change
+                if worse > allowed:
+                    regressions.append(f"{stage} @ {scale} rows: {metric} {base[metric]:,.2f} -> {metrics[metric]:,.2f} "
+                                       f"({worse:+.0%} worse, allowed {allowed:.0%})")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage on synthetic reviews at several scales.")
+    parser.add_argument('--scales', type=int, nargs='+', default=list(DEFAULT_SCALES))
+    parser.add_argument('--queries', type=int, default=50)
+    parser.add_argument('--db-scan-max-rows', type=int, default=DEFAULT_DB_SCAN_MAX_ROWS)
+    parser.add_argument('--real-encoder', action='store_true', help="Use the SentenceTransformer instead of the offline stub")
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="Earlier results file to compare against")
+    parser.add_argument('--max-regression', type=float, default=DEFAULT_MAX_REGRESSION,
+                        help="Allowed fractional slowdown per metric before the run fails")
+    parser.add_argument('--thresholds', help="JSON file of per-stage allowed regressions, e.g. {\"embedding\": 0.3}")
+    args = parser.parse_args()
+
+    profile = ReviewProfile()
+    results = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'commit': _git_commit(), 'python': platform.python_version(),
+               'platform': platform.platform(), 'cpu_count': os.cpu_count(), 'scales': {}}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_rows in args.scales:
+            print(f"Running {n_rows:,} reviews...")
+            stages = run_scale(n_rows, tmp_dir, profile, args.queries, args.db_scan_max_rows, args.real_encoder)
+            results['scales'][str(n_rows)] = stages
+            for stage, metrics in stages.items():
+                if isinstance(metrics, dict) and 'rows_per_sec' in metrics:
+                    print(f"  {stage:<40} {metrics['rows_per_sec']:>14,.0f} rows/sec")
+                elif isinstance(metrics, dict) and 'p50_ms' in metrics:
+                    print(f"  {stage:<40} p50={metrics['p50_ms']:9.2f}ms  p99={metrics['p99_ms']:9.2f}ms")
+                elif isinstance(metrics, dict):
+                    print(f"  {stage:<40} skipped ({metrics['skipped']})")
+            print(f"  {'peak RSS':<40} {stages['peak_rss_mib']:>14,.0f} MiB")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+        thresholds = None
+        if args.thresholds:
+            with open(args.thresholds, encoding='utf-8') as f:
+                thresholds = json.load(f)
+        regressions = compare(results, baseline, args.max_regression, thresholds)
+        if regressions:
+            print("Regressions against the baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"No regressions beyond {args.max_regression:.0%} against {args.baseline}.")
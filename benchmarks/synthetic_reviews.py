@@ -0,0 +1,127 @@
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+DEFAULT_SOURCE = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'input', 'amazon_reviews.csv'))
+
+
+class ReviewProfile:
+    """
+    Distributions measured on a real review file, used to generate look-alike reviews.
+
+    Keeps the source rows as product/store templates (so every column of the real schema and
+    their joint values carry over), the review-text and title vocabularies with their word
+    frequencies, the words-per-review distribution, and the distribution of how many times
+    an identical review text occurs (the duplicate cluster sizes).
+    """
+
+    def __init__(self, source=DEFAULT_SOURCE):
+        self.templates = pd.read_csv(source)
+        texts = self.templates['review_text'].fillna('').astype(str)
+        titles = self.templates['review_title'].fillna('').astype(str)
+        self.text_vocab, self.text_probs = self._vocabulary(texts)
+        self.title_vocab, self.title_probs = self._vocabulary(titles)
+        self.text_lengths = np.maximum(texts.str.split().str.len().to_numpy(), 1)
+        self.title_lengths = titles.str.split().str.len().to_numpy()
+        self.cluster_sizes = texts.value_counts().to_numpy()
+        self.ratings = self.templates['review_rating'].to_numpy()
+        dates = pd.to_datetime(self.templates['review_date'], format='%d-%m-%Y', errors='coerce').dropna()
+        self.date_range = (dates.min(), dates.max()) if len(dates) else (pd.Timestamp('2019-01-01'), pd.Timestamp('2019-12-31'))
+
+    @staticmethod
+    def _vocabulary(texts):
+        counts = texts.str.split().explode().dropna().value_counts()
+        return counts.index.to_numpy(dtype=object), (counts / counts.sum()).to_numpy()
+
+    def _texts(self, rng, vocab, probs, lengths):
+        words = vocab[rng.choice(len(vocab), lengths.sum(), p=probs)]
+        return [' '.join(chunk) for chunk in np.split(words, np.cumsum(lengths)[:-1])]
+
+
+def generate_reviews(n_rows, chunk_size=100000, profile=None, seed=0):
+    """
+    Yield DataFrames of synthetic reviews with the real schema, `chunk_size` rows at a time.
+
+    Distinct texts are drawn with the real length and word distributions, and each is repeated
+    according to the real duplicate cluster sizes (usually on other stores/products, like
+    syndicated reviews) and shuffled within its chunk. review_hash_id is unique per row.
+    """
+    profile = profile or ReviewProfile()
+    rng = np.random.default_rng(seed)
+    date_start, date_end = profile.date_range
+    date_span = max((date_end - date_start).days, 1)
+    produced = 0
+    while produced < n_rows:
+        size = min(chunk_size, n_rows - produced)
+        # Enough clusters to fill the chunk, then trim the last one
+        cluster_sizes = rng.choice(profile.cluster_sizes, size)
+        cluster_sizes = cluster_sizes[:np.searchsorted(np.cumsum(cluster_sizes), size) + 1]
+        cluster_sizes[-1] -= cluster_sizes.sum() - size
+        n_clusters = len(cluster_sizes)
+
+        texts = profile._texts(rng, profile.text_vocab, profile.text_probs, rng.choice(profile.text_lengths, n_clusters))
+        titles = profile._texts(rng, profile.title_vocab, profile.title_probs, rng.choice(profile.title_lengths, n_clusters))
+        members = rng.permutation(np.repeat(np.arange(n_clusters), cluster_sizes))
+
+        chunk = profile.templates.iloc[rng.integers(0, len(profile.templates), size)].reset_index(drop=True)
+        chunk['review_text'] = np.asarray(texts, dtype=object)[members]
+        chunk['review_title'] = np.asarray(titles, dtype=object)[members]
+        chunk['review_rating'] = rng.choice(profile.ratings, size)
+        dates = date_start + pd.to_timedelta(rng.integers(0, date_span + 1, size), unit='D')
+        chunk['review_date'] = dates.strftime('%d-%m-%Y')
+        chunk['review_hash_id'] = [hashlib.md5(f"{seed}:{produced + i}".encode('utf-8')).hexdigest() for i in range(size)]
+        produced += size
+        yield chunk
+
+
+def write_reviews(path, n_rows, chunk_size=100000, seed=0):
+    """
+    Write `n_rows` synthetic reviews to a CSV, Parquet, JSON Lines (.jsonl) or JSON array (.json)
+    file, streaming chunk by chunk.
+    """
+    start_time = time.perf_counter()
+    writer = None
+    try:
+        for i, chunk in enumerate(generate_reviews(n_rows, chunk_size, seed=seed)):
+            if path.endswith('.jsonl'):
+                with open(path, 'w' if i == 0 else 'a', encoding='utf-8') as f:
+                    f.write(chunk.to_json(orient='records', lines=True, force_ascii=False))
+            elif path.endswith('.json'):
+                # One array across chunks: each chunk's records without their brackets
+                with open(path, 'w' if i == 0 else 'a', encoding='utf-8') as f:
+                    f.write(('[' if i == 0 else ',\n') + chunk.to_json(orient='records', force_ascii=False)[1:-1])
+            elif path.endswith('.parquet'):
+                import pyarrow as pa
+                import pyarrow.parquet as pq
+
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema, compression='zstd')
+                writer.write_table(table.cast(writer.schema))
+            else:
+                chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+    finally:
+        if writer is not None:
+            writer.close()
+    if path.endswith('.json') and os.path.exists(path):
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(']')
+    return time.perf_counter() - start_time
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate a synthetic review dataset shaped like data/input/amazon_reviews.csv.")
+    parser.add_argument('path', help="Output .csv, .parquet, .jsonl or .json file")
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--chunk-size', type=int, default=100000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    seconds = write_reviews(args.path, args.rows, args.chunk_size, args.seed)
+    print(f"Wrote {args.rows:,} reviews to {args.path} in {seconds:.1f}s ({args.rows / seconds:,.0f} rows/sec).")
@@ -0,0 +1,175 @@
+import logging
+import time
+
+import pandas as pd
+from sqlalchemy import inspect, text
+
+from monitoring.metrics import stage
+
+logger = logging.getLogger()
+
+STRATEGIES = ('auto', 'executemany', 'fast_executemany', 'multi')
+MODES = ('replace', 'append', 'merge')
+
+# Upper bound on bind parameters per statement for multi-row VALUES inserts
+MAX_PARAMETERS = {'mssql': 2000, 'sqlite': 999}
+
+
+def _placeholders(paramstyle, columns):
+    if paramstyle == 'qmark':
+        return ', '.join('?' for _ in columns)
+    if paramstyle == 'format':
+        return ', '.join('%s' for _ in columns)
+    if paramstyle == 'numeric':
+        return ', '.join(f":{i + 1}" for i in range(len(columns)))
+    if paramstyle == 'named':
+        return ', '.join(f":p{i}" for i in range(len(columns)))
+    return ', '.join(f"%(p{i})s" for i in range(len(columns)))
+
+
+def _insert_fast_executemany(pd_table, conn, keys, data_iter):
+    """
+    pandas to_sql insert method that sends a whole chunk through one DBAPI executemany call.
+    On pyodbc, fast_executemany binds the chunk as a parameter array instead of one round trip per row.
+    """
+    dialect = conn.dialect
+    preparer = dialect.identifier_preparer
+    table_name = preparer.quote(pd_table.name)
+    if pd_table.schema:
+        table_name = f"{preparer.quote_schema(pd_table.schema)}.{table_name}"
+    columns = ', '.join(preparer.quote(key) for key in keys)
+    statement = f"INSERT INTO {table_name} ({columns}) VALUES ({_placeholders(dialect.paramstyle, keys)})"
+
+    rows = [tuple(row) for row in data_iter]
+    if dialect.paramstyle in ('named', 'pyformat'):
+        rows = [{f"p{i}": value for i, value in enumerate(row)} for row in rows]
+
+    cursor = conn.connection.cursor()
+    try:
+        if hasattr(cursor, 'fast_executemany'):
+            cursor.fast_executemany = True
+        cursor.executemany(statement, rows)
+    finally:
+        cursor.close()
+    return len(rows)
+
+
+def _resolve_strategy(engine, strategy):
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown strategy {strategy}; expected one of {STRATEGIES}.")
+    if strategy == 'auto':
+        return 'fast_executemany' if engine.dialect.name == 'mssql' else 'executemany'
+    return strategy
+
+
+def _to_sql_kwargs(engine, strategy, n_columns, chunksize):
+    if strategy == 'fast_executemany':
+        return {'method': _insert_fast_executemany, 'chunksize': chunksize}
+    if strategy == 'multi':
+        # Keep each multi-row VALUES statement under the dialect's bind parameter limit
+        max_rows = max(1, MAX_PARAMETERS.get(engine.dialect.name, 30000) // max(1, n_columns))
+        return {'method': 'multi', 'chunksize': min(chunksize, max_rows)}
+    return {'method': None, 'chunksize': chunksize}
+
+
+def _rename_table(conn, old_name, new_name):
+    preparer = conn.dialect.identifier_preparer
+    if conn.dialect.name == 'mssql':
+        conn.execute(text("EXEC sp_rename :old_name, :new_name"), {'old_name': old_name, 'new_name': new_name})
+    else:
+        conn.execute(text(f"ALTER TABLE {preparer.quote(old_name)} RENAME TO {preparer.quote(new_name)}"))
+
+
+def _drop_table(conn, name):
+    if inspect(conn).has_table(name):
+        conn.execute(text(f"DROP TABLE {conn.dialect.identifier_preparer.quote(name)}"))
+
+
+def _iter_chunks(data):
+    if isinstance(data, pd.DataFrame):
+        yield data
+    else:
+        yield from data
+
+
+def bulk_load(data, table_name, engine, mode='replace', key_columns=None, chunksize=10000, strategy='auto'):
+    """
+    Load a DataFrame or an iterable of DataFrame chunks into `table_name`.
+
+    Rows are first written to a staging table in chunks, so the target table stays readable
+    for the whole load. Then, in one transaction:
+      - 'replace' swaps the staging table in for the target (rename, no row copy),
+      - 'append' inserts the staged rows into the target,
+      - 'merge' deletes target rows whose `key_columns` match a staged row and inserts the staged rows.
+    `strategy` picks the insert path: 'executemany' (pandas default), 'multi' (multi-row VALUES),
+    'fast_executemany' (one DBAPI executemany per chunk, pyodbc fast_executemany on SQL Server)
+    or 'auto' (fast_executemany on SQL Server, executemany elsewhere). Returns the number of rows loaded.
+
+    Like to_sql(if_exists='replace'), 'replace' with no rows leaves an empty target: the empty
+    frame's columns are swapped in, or the target's rows are deleted when no columns are known.
+    """
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode {mode}; expected one of {MODES}.")
+    if mode == 'merge' and not key_columns:
+        raise ValueError("Merge mode requires key_columns.")
+    strategy = _resolve_strategy(engine, strategy)
+    staging_name = f"{table_name}__staging"
+    preparer = engine.dialect.identifier_preparer
+
+    start_time = time.perf_counter()
+    total = 0
+    columns = None
+    empty_frame = None
+    with engine.begin() as conn:
+        _drop_table(conn, staging_name)
+    for chunk in _iter_chunks(data):
+        if chunk.empty:
+            if empty_frame is None and len(chunk.columns):
+                empty_frame = chunk.head(0)
+            continue
+        if columns is None:
+            columns = list(chunk.columns)
+        with stage('db_write', rows=len(chunk)), engine.begin() as conn:
+            chunk.to_sql(staging_name, con=conn, if_exists='append', index=False,
+                         **_to_sql_kwargs(engine, strategy, len(chunk.columns), chunksize))
+        total += len(chunk)
+
+    if columns is None:
+        logger.warning(f"No rows to load into {table_name}.")
+        if mode != 'replace':
+            return 0
+        if empty_frame is None:
+            with engine.begin() as conn:
+                if inspect(conn).has_table(table_name):
+                    conn.execute(text(f"DELETE FROM {preparer.quote(table_name)}"))
+            return 0
+        # Swap in an empty table with the input's columns, as to_sql(if_exists='replace') would
+        columns = list(empty_frame.columns)
+        with engine.begin() as conn:
+            empty_frame.to_sql(staging_name, con=conn, if_exists='replace', index=False)
+
+    with engine.begin() as conn:
+        target_exists = inspect(conn).has_table(table_name)
+        if mode == 'replace' or not target_exists:
+            backup_name = f"{table_name}__old"
+            _drop_table(conn, backup_name)
+            if target_exists:
+                _rename_table(conn, table_name, backup_name)
+            _rename_table(conn, staging_name, table_name)
+            _drop_table(conn, backup_name)
+        else:
+            target, staging = preparer.quote(table_name), preparer.quote(staging_name)
+            column_list = ', '.join(preparer.quote(column) for column in columns)
+            if mode == 'merge':
+                # Index the staged keys so the EXISTS probe is a lookup rather than a scan
+                key_list = ', '.join(preparer.quote(key) for key in key_columns)
+                conn.execute(text(f"CREATE INDEX {preparer.quote(staging_name + '__keys')} ON {staging} ({key_list})"))
+                match = ' AND '.join(f"{staging}.{preparer.quote(key)} = {target}.{preparer.quote(key)}" for key in key_columns)
+                conn.execute(text(f"DELETE FROM {target} WHERE EXISTS (SELECT 1 FROM {staging} WHERE {match})"))
+            conn.execute(text(f"INSERT INTO {target} ({column_list}) SELECT {column_list} FROM {staging}"))
+            _drop_table(conn, staging_name)
+
+    elapsed = time.perf_counter() - start_time
+    logger.info(f"Bulk loaded {total} rows into {table_name} ({mode}, {strategy}) "
+                f"in {elapsed:.2f}s ({total / elapsed:,.0f} rows/sec).")
+    return total
@@ -1,27 +1,217 @@
+import argparse
+import json
+import logging
 import os
+import sys
+import time
+
 import pandas as pd
-from sqlalchemy import create_engine
-# from ingestion.data_ingestion import get_database_connection
-from database_setup import get_database_connection
- # Import the connection function from dbsetup.py
-
-# Load your JSON file into pandas DataFrame
-file_path = 'C:/Users/RNaveen/Documents/LLM-Data-Engineer-Assignment/data/input/amazon_reviews.json'  # Change this to your actual file path
-
-# Ingest the data from the JSON file into the DataFrame
-try:
-    df = pd.read_json(file_path)
-    print("Data loaded successfully from JSON file.")
-except Exception as e:
-    print(f"Error loading JSON data: {e}")
-
-# Connect to the database using the engine from dbsetup.py
-try:
-    engine = get_database_connection()
-    print("Database connection established successfully.")
-    
-    # Ingest the data into your database (adjust the table name as needed)
-    df.to_sql('product_reviews', con=engine, if_exists='replace', index=False)
-    print("Data ingestion successful!")
-except Exception as e:
-    print(f"Error during ingestion: {e}")
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from ingestion.bulk_loader import bulk_load
+from ingestion.database_setup import get_database_connection
+from monitoring.metrics import peak_rss_bytes, stage
+
+logger = logging.getLogger()
+
+DEFAULT_INPUT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'input', 'amazon_reviews.json'))
+DEFAULT_TABLE = 'product_reviews'
+DEFAULT_CHUNK_SIZE = 50000
+DATE_FORMAT = '%d-%m-%Y'
+
+# Type of every column of the review export. Low-cardinality and per-product columns are
+# categorical, counts are nullable integers of a fixed width (the same in every chunk, so the
+# table created from the first chunk fits the rest), dates are parsed.
+# upc stays text: as a float it loses digits.
+REVIEW_SCHEMA = {
+    'report_date': 'date', 'online_store': 'category', 'upc': 'text', 'retailer_product_code': 'category',
+    'brand': 'category', 'category': 'category', 'sub_category': 'category', 'product_description': 'category',
+    'review_date': 'date', 'review_rating': 'Int8', 'review_title': 'text', 'review_text': 'text',
+    'is_competitor': 'Int8', 'manufacturer': 'category', 'market': 'category', 'matched_keywords': 'text',
+    'time_of_publication': 'text', 'url': 'text', 'review_type': 'category', 'parent_review': 'category',
+    'manufacturers_response': 'text', 'dimension1': 'category', 'dimension2': 'category', 'dimension3': 'category',
+    'dimension4': 'category', 'dimension5': 'category', 'dimension6': 'category', 'dimension7': 'category',
+    'dimension8': 'category', 'verified_purchase': 'bool', 'helpful_review_count': 'Int32', 'review_hash_id': 'text',
+}
+# Empty in the export and read by nothing downstream; dropped before any conversion
+UNUSED_COLUMNS = ('matched_keywords', 'time_of_publication', 'manufacturers_response', 'dimension4', 'dimension5', 'dimension6')
+DEFAULT_COLUMNS = tuple(column for column in REVIEW_SCHEMA if column not in UNUSED_COLUMNS)
+
+_CSV_DTYPES = {'category': 'category', 'text': 'object', 'bool': 'object', 'date': 'object', 'Int8': 'float64', 'Int32': 'float64'}
+
+
+def apply_schema(chunk, columns=DEFAULT_COLUMNS):
+    """
+    Keep `columns` and convert them to their REVIEW_SCHEMA types. Columns the chunk lacks are skipped.
+    """
+    chunk = chunk[[column for column in columns if column in chunk.columns]]
+    converted = {}
+    for column in chunk.columns:
+        kind = REVIEW_SCHEMA.get(column, 'text')
+        values = chunk[column]
+        if kind == 'category':
+            converted[column] = values if isinstance(values.dtype, pd.CategoricalDtype) else values.astype('category')
+        elif kind in ('Int8', 'Int32'):
+            converted[column] = pd.to_numeric(values, errors='coerce').astype(kind)
+        elif kind == 'bool':
+            lowered = values.astype(str).str.lower()
+            converted[column] = lowered.map({'true': True, 'false': False, '1': True, '0': False}).astype('boolean')
+        elif kind == 'date':
+            converted[column] = pd.to_datetime(values, format=DATE_FORMAT, errors='coerce')
+        else:
+            converted[column] = values.astype(object).where(values.notna(), None)
+    return pd.DataFrame(converted)
+
+
+def _iter_json_array(path, block_size=1 << 20):
+    """
+    Yield the objects of a top-level JSON array one by one, reading `block_size` characters at a time.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        buffer, position, started, eof = '', 0, False, False
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if position == len(buffer) or not eof and len(buffer) - position < block_size // 2:
+                # Refill before decoding, so an object is never cut at the end of the buffer
+                if eof and position == len(buffer):
+                    raise ValueError(f"{path} ends before its JSON array is closed.")
+                block = f.read(block_size)
+                eof = not block
+                buffer, position = buffer[position:] + block, 0
+                continue
+            if not started:
+                if buffer[position] != '[':
+                    raise ValueError(f"{path} is not a JSON array.")
+                started, position = True, position + 1
+            elif buffer[position] == ']':
+                return
+            else:
+                try:
+                    obj, position = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                    # An object longer than half a block; read more and retry
+                    block = f.read(block_size)
+                    eof = not block
+                    buffer, position = buffer[position:] + block, 0
+                    continue
+                yield obj
+
+
+def _json_is_array(path):
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        while True:
+            # Read in blocks: an array export can be a single line
+            block = f.read(4096)
+            if not block or block.strip():
+                return block.lstrip().startswith('[')
+
+
+def _iter_json_lines(path):
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _record_chunks(records, columns, chunk_size):
+    """
+    Group parsed JSON records into DataFrames of `columns`, column by column. Values of categorical
+    columns are shared between rows, so repeated strings are held once per chunk.
+    """
+    categorical = {column for column in columns if REVIEW_SCHEMA.get(column) == 'category'}
+    data, seen, size = {column: [] for column in columns}, {column: {} for column in categorical}, 0
+    for record in records:
+        for column in columns:
+            value = record.get(column)
+            if column in categorical:
+                value = seen[column].setdefault(value, value)
+            data[column].append(value)
+        size += 1
+        if size == chunk_size:
+            yield pd.DataFrame(data, dtype=object)
+            data, seen, size = {column: [] for column in columns}, {column: {} for column in categorical}, 0
+    if size:
+        yield pd.DataFrame(data, dtype=object)
+
+
+def read_review_chunks(path, chunk_size=DEFAULT_CHUNK_SIZE, columns=DEFAULT_COLUMNS):
+    """
+    Stream a review export (.csv, JSON Lines, or a JSON array) as typed DataFrame chunks.
+
+    CSV chunks are read with only `columns` and categorical dtypes; JSON records are parsed one at a
+    time and only `columns` are kept. Every chunk then goes through apply_schema.
+    """
+    if path.endswith('.csv'):
+        dtypes = {column: _CSV_DTYPES[REVIEW_SCHEMA.get(column, 'text')] for column in columns}
+        raw_chunks = pd.read_csv(path, usecols=lambda name: name in columns, dtype=dtypes, encoding='utf-8-sig',
+                                 chunksize=chunk_size)
+    else:
+        records = _iter_json_array(path) if _json_is_array(path) else _iter_json_lines(path)
+        raw_chunks = _record_chunks(records, columns, chunk_size)
+
+    for chunk in raw_chunks:
+        with stage('ingest_parse', rows=len(chunk)):
+            typed = apply_schema(chunk, columns)
+        yield typed
+
+
+def ingest_reviews(path=DEFAULT_INPUT, table_name=DEFAULT_TABLE, engine=None, chunk_size=DEFAULT_CHUNK_SIZE,
+                   columns=DEFAULT_COLUMNS, mode='replace'):
+    """
+    Stream a review export into `table_name` chunk by chunk, so memory is bounded by one chunk.
+    Returns {'rows', 'seconds', 'rows_per_sec', 'peak_rss_mib'}.
+    """
+    engine = engine or get_database_connection(role='write')
+    start_time = time.perf_counter()
+    rows = bulk_load(read_review_chunks(path, chunk_size, columns), table_name, engine, mode=mode)
+    return _report('streaming', rows, time.perf_counter() - start_time)
+
+
+def ingest_reviews_eager(path=DEFAULT_INPUT, table_name=DEFAULT_TABLE, engine=None):
+    """
+    The original loader: read the whole export with inferred dtypes, then write it in one call.
+    Kept as the baseline for ingest_reviews.
+    """
+    engine = engine or get_database_connection(role='write')
+    start_time = time.perf_counter()
+    if path.endswith('.csv'):
+        df = pd.read_csv(path, encoding='utf-8-sig')
+    else:
+        df = pd.read_json(path, lines=not _json_is_array(path))
+    rows = bulk_load(df, table_name, engine, mode='replace')
+    return _report('eager', rows, time.perf_counter() - start_time)
+
+
+def _report(label, rows, seconds):
+    peak = peak_rss_bytes()
+    stats = {'rows': rows, 'seconds': seconds, 'rows_per_sec': rows / seconds if seconds > 0 else 0.0,
+             'peak_rss_mib': peak / 2 ** 20 if peak is not None else None}
+    logger.info(f"Ingested {rows} reviews ({label}) in {seconds:.2f}s ({stats['rows_per_sec']:,.0f} rows/sec), "
+                f"peak RSS {stats['peak_rss_mib'] or 0:,.0f} MiB.")
+    return stats
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Load a review export (.csv, .jsonl or a .json array) into the database.")
+    parser.add_argument('--input', default=DEFAULT_INPUT)
+    parser.add_argument('--table', default=DEFAULT_TABLE)
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--eager', action='store_true', help="Use the original whole-file loader")
+    parser.add_argument('--json', action='store_true', help="Print the stats as JSON on the last line")
+    args = parser.parse_args()
+    try:
+        if args.eager:
+            stats = ingest_reviews_eager(args.input, args.table)
+        else:
+            stats = ingest_reviews(args.input, args.table, chunk_size=args.chunk_size)
+    except Exception as e:
+        logger.error(f"Error during ingestion: {e}")
+        sys.exit(1)
+    if args.json:
+        print(json.dumps(stats))
@@ -1,16 +1,206 @@
+import json
+import os
+import threading
+import time
+
 from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+
+# Defaults for the SQL Server instance; override with environment variables or a JSON config file
+# (path in LLM_DB_CONFIG) holding any of the keys below plus optional "url", "async_url" and "roles".
+DEFAULT_CONFIG = {
+    'server': 'CEI3233',  # Replace with your SQL Server instance name
+    'database': 'LLM_Assignment_DB',
+    'driver': 'ODBC Driver 17 for SQL Server',
+}
+
+# Pool settings per role: many short reads on the query path, few long-running bulk writers
+DEFAULT_ROLE_SETTINGS = {
+    'read': {'pool_size': 10, 'max_overflow': 20, 'pool_timeout': 30, 'pool_recycle': 1800, 'pool_pre_ping': True},
+    'write': {'pool_size': 2, 'max_overflow': 2, 'pool_timeout': 60, 'pool_recycle': 1800, 'pool_pre_ping': True},
+}
+
+ENV_OVERRIDES = {
+    'LLM_DB_URL': 'url',
+    'LLM_DB_ASYNC_URL': 'async_url',
+    'LLM_DB_SERVER': 'server',
+    'LLM_DB_NAME': 'database',
+    'LLM_DB_DRIVER': 'driver',
+}
+
+# Engines are created once per process and role, and shared by every caller
+_engines = {}
+_async_engines = {}
+_engines_lock = threading.Lock()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records checkouts, time spent waiting for a connection and timeouts.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+        self.checkouts += 1
+        return connection
+
+
+def load_database_config(config_path=None):
+    """
+    Merge the defaults, the JSON config file (config_path or LLM_DB_CONFIG) and LLM_DB_* environment variables.
+    """
+    config = dict(DEFAULT_CONFIG)
+    config['roles'] = {role: dict(settings) for role, settings in DEFAULT_ROLE_SETTINGS.items()}
+
+    config_path = config_path or os.environ.get('LLM_DB_CONFIG')
+    if config_path:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            file_config = json.load(f)
+        for role, settings in file_config.pop('roles', {}).items():
+            config['roles'].setdefault(role, {}).update(settings)
+        config.update(file_config)
+
+    for env_name, key in ENV_OVERRIDES.items():
+        if os.environ.get(env_name):
+            config[key] = os.environ[env_name]
+    for role, settings in config['roles'].items():
+        # e.g. LLM_DB_READ_URL, LLM_DB_WRITE_POOL_SIZE
+        prefix = f"LLM_DB_{role.upper()}_"
+        if os.environ.get(prefix + 'URL'):
+            settings['url'] = os.environ[prefix + 'URL']
+        for key in ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle'):
+            if os.environ.get(prefix + key.upper()):
+                settings[key] = int(os.environ[prefix + key.upper()])
+    return config
+
+
+def build_connection_url(config, role='read'):
+    """
+    Connection URL for a role: the role's own url, then the shared url, then SQL Server with Windows Authentication.
+    """
+    settings = config['roles'].get(role, {})
+    if settings.get('url'):
+        return settings['url']
+    if config.get('url'):
+        return config['url']
+    return f"mssql+pyodbc://@{config['server']}/{config['database']}?driver={config['driver']}&Trusted_Connection=yes"
+
+
+def _engine_options(url, settings):
+    url = make_url(url)
+    options = {}
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # In-memory SQLite uses a per-thread singleton connection; pool sizing does not apply
+        return options
+    options['poolclass'] = InstrumentedQueuePool
+    for key in ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping'):
+        if key in settings:
+            options[key] = settings[key]
+    if url.get_backend_name() == 'mssql' and settings.get('fast_executemany', True):
+        options['fast_executemany'] = True
+    return options
+
+
+def get_engine(role='read', config_path=None):
+    """
+    Return the process-wide engine for `role` ('read' or 'write'), creating it on first use.
+    """
+    engine = _engines.get(role)
+    if engine is not None:
+        return engine
+    with _engines_lock:
+        if role not in _engines:
+            config = load_database_config(config_path)
+            if role not in config['roles']:
+                raise ValueError(f"Unknown database role {role}; expected one of {sorted(config['roles'])}.")
+            url = build_connection_url(config, role)
+            _engines[role] = create_engine(url, **_engine_options(url, config['roles'][role]))
+        return _engines[role]
+
+
+def get_async_engine(role='read', config_path=None):
+    """
+    Return the process-wide asyncio engine for `role`. Uses async_url when configured, otherwise the
+    sync URL with its async driver (aioodbc for SQL Server, aiosqlite for SQLite).
+    """
+    engine = _async_engines.get(role)
+    if engine is not None:
+        return engine
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    with _engines_lock:
+        if role not in _async_engines:
+            config = load_database_config(config_path)
+            url = make_url(config.get('async_url') or build_connection_url(config, role))
+            async_drivers = {'mssql': 'aioodbc', 'sqlite': 'aiosqlite'}
+            if not config.get('async_url') and url.get_backend_name() in async_drivers:
+                url = url.set(drivername=f"{url.get_backend_name()}+{async_drivers[url.get_backend_name()]}")
+            settings = dict(config['roles'].get(role, {}))
+            options = {key: value for key, value in settings.items()
+                       if key in ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping')}
+            if url.get_backend_name() == 'sqlite':
+                options = {'pool_pre_ping': settings.get('pool_pre_ping', True)}
+            _async_engines[role] = create_async_engine(url, **options)
+        return _async_engines[role]
+
+
+def get_pool_metrics():
+    """
+    Pool checkout and wait statistics for every engine created in this process, keyed by role.
+    """
+    metrics = {}
+    for role, engine in list(_engines.items()):
+        pool = engine.pool
+        stats = {'status': pool.status()}
+        if isinstance(pool, InstrumentedQueuePool):
+            stats.update({
+                'size': pool.size(),
+                'checked_out': pool.checkedout(),
+                'overflow': pool.overflow(),
+                'checkouts': pool.checkouts,
+                'timeouts': pool.timeouts,
+                'wait_seconds_total': pool.wait_seconds_total,
+                'wait_seconds_max': pool.wait_seconds_max,
+                'wait_seconds_avg': pool.wait_seconds_total / pool.checkouts if pool.checkouts else 0.0,
+            })
+        metrics[role] = stats
+    return metrics
+
+
+def dispose_engines():
+    """
+    Close every pooled connection and forget the cached engines (e.g. after forking workers).
+    Async engines are only forgotten; await their dispose() from the event loop that used them.
+    """
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+        _async_engines.clear()
 
-def get_database_connection():
-    # Define the database connection string for Windows Authentication
-    server = 'CEI3233'  # Replace with your SQL Server instance name
-    database = 'LLM_Assignment_DB'
-    driver = 'ODBC Driver 17 for SQL Server'
-    connection_string = f"mssql+pyodbc://@{server}/{database}?driver={driver}&Trusted_Connection=yes"
 
-    # Create the SQLAlchemy engine
-    engine = create_engine(connection_string)
-    return engine
+def get_database_connection(role='read'):
+    # Shared, pooled engine; configure it through LLM_DB_* environment variables or LLM_DB_CONFIG
+    return get_engine(role)
 
 def test_connection(engine):
     try:
@@ -26,3 +216,4 @@ def test_connection(engine):
 if __name__ == '__main__':
     engine = get_database_connection()
     test_connection(engine)
+    print(get_pool_metrics())
@@ -1,11 +1,44 @@
+import atexit
+import itertools
 import logging
 import logging.config
+import logging.handlers
+import queue
+import reprlib
+import threading
+import time
 
-def setup_logging(default_level=logging.INFO):
+from monitoring.metrics import count
+
+DEFAULT_LOG_FILE = 'project_log.log'
+# Size-based rotation of the log file: 10 MiB per file, 5 old files kept
+DEFAULT_MAX_BYTES = 10 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+
+_listener = None
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that enqueues the record as is. The stock handler merges the message and its
+    args in the calling thread; here that, and any lazy payload's __str__, runs on the listener
+    thread. Arguments must therefore not be mutated after the logging call.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+def setup_logging(default_level=logging.INFO, log_file=DEFAULT_LOG_FILE, queued=True,
+                  max_bytes=DEFAULT_MAX_BYTES, backup_count=DEFAULT_BACKUP_COUNT):
     """
     Set up the logging configuration.
     :param default_level: Default logging level, defaults to INFO.
+    :param log_file: File for the detailed log, rotated once it reaches `max_bytes`.
+    :param queued: Hand records to a background thread that formats and writes them, so logging
+        calls only enqueue. Set it to False for the synchronous handlers.
     """
+    global _listener
     logging_config = {
         'version': 1,
         'disable_existing_loggers': False,
@@ -25,8 +58,11 @@ def setup_logging(default_level=logging.INFO):
             },
             'file': {
                 'level': default_level,
-                'class': 'logging.FileHandler',
-                'filename': 'project_log.log',  # This file will store logs
+                'class': 'logging.handlers.RotatingFileHandler',
+                'filename': log_file,  # This file will store logs
+                'maxBytes': max_bytes,
+                'backupCount': backup_count,
+                'encoding': 'utf-8',
                 'formatter': 'detailed',
             },
         },
@@ -38,7 +74,126 @@ def setup_logging(default_level=logging.INFO):
             },
         },
     }
-    
+
+    stop_logging()
     logging.config.dictConfig(logging_config)
+    if queued:
+        root = logging.getLogger()
+        handlers = list(root.handlers)
+        for handler in handlers:
+            root.removeHandler(handler)
+        log_queue = queue.SimpleQueue()
+        root.addHandler(DeferredQueueHandler(log_queue))
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
     logging.info("Logging setup complete.")
+    return _listener
+
+
+def stop_logging():
+    """
+    Write out every queued record and stop the background listener. Registered to run at exit.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+atexit.register(stop_logging)
+
+
+class SampledLogger:
+    """
+    Logger for per-request messages. It keeps one call in `sample_every` and at most
+    `max_per_second` records per second, with a burst of the same size. The checks run before a
+    LogRecord is created, so a dropped call costs a counter increment. Dropped calls are counted
+    in the `log_records_suppressed_total` metric.
+
+        request_log = get_sampled_logger('retrieval.requests', sample_every=100, max_per_second=10)
+        request_log.info("Generating embedding for prompt: %s", LazyRepr(prompt))
+    """
+
+    def __init__(self, logger, sample_every=1, max_per_second=None):
+        self.logger = logger
+        self.sample_every = max(int(sample_every), 1)
+        self.max_per_second = max_per_second
+        self._calls = itertools.count()
+        self._tokens = float(max_per_second or 0)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _allow(self):
+        if self.sample_every > 1 and next(self._calls) % self.sample_every:
+            return False
+        if self.max_per_second is None:
+            return True
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.max_per_second, self._tokens + (now - self._updated) * self.max_per_second)
+            self._updated = now
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+    def log(self, level, msg, *args, **kwargs):
+        if not self.logger.isEnabledFor(level):
+            return
+        if not self._allow():
+            count('log_records_suppressed', logger=self.logger.name)
+            return
+        kwargs.setdefault('stacklevel', 3)  # Report the caller of debug()/info(), not this module
+        self.logger.log(level, msg, *args, **kwargs)
+
+    def debug(self, msg, *args, **kwargs):
+        self.log(logging.DEBUG, msg, *args, **kwargs)
+
+    def info(self, msg, *args, **kwargs):
+        self.log(logging.INFO, msg, *args, **kwargs)
+
+    def warning(self, msg, *args, **kwargs):
+        self.log(logging.WARNING, msg, *args, **kwargs)
+
+
+_sampled_loggers = {}
+
+
+def get_sampled_logger(name, sample_every=1, max_per_second=None):
+    """
+    Return the process-wide SampledLogger for `name`, created with these limits on first use.
+    """
+    sampled = _sampled_loggers.get(name)
+    if sampled is None:
+        sampled = _sampled_loggers.setdefault(name, SampledLogger(logging.getLogger(name), sample_every, max_per_second))
+    return sampled
+
+
+_payload_repr = reprlib.Repr()
+_payload_repr.maxlist = _payload_repr.maxtuple = _payload_repr.maxdict = 4
+_payload_repr.maxstring = _payload_repr.maxother = 200
+
+
+class LazyRepr:
+    """
+    Log argument that renders a truncated repr of `value` only when a record is actually written,
+    e.g. logger.info("First few entries: %s", LazyRepr(data[:5])). Long lists such as embedding
+    vectors are cut to a few items.
+    """
+
+    __slots__ = ('value', 'max_length')
+
+    def __init__(self, value, max_length=500):
+        self.value = value
+        self.max_length = max_length
 
+    def __str__(self):
+        if isinstance(self.value, str):
+            text = self.value
+        elif hasattr(self.value, 'shape') and hasattr(self.value, 'dtype'):
+            text = f"<{type(self.value).__name__} shape={tuple(self.value.shape)} dtype={self.value.dtype}>"
+        else:
+            text = _payload_repr.repr(self.value)
+        return text if len(text) <= self.max_length else f"{text[:self.max_length]}... ({len(text)} chars)"
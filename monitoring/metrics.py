@@ -0,0 +1,391 @@
+import asyncio
+import atexit
+import bisect
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# Set LLM_METRICS_ENABLED=0 to turn every instrument into a no-op
+ENABLED_ENV = 'LLM_METRICS_ENABLED'
+# When set, the Prometheus text exposition is written to this path at interpreter exit
+FILE_ENV = 'LLM_METRICS_FILE'
+
+# Histogram bucket upper bounds. Latencies in seconds, 50us to 60s; sizes in items, 1 to 1M
+LATENCY_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(key):
+    if not key:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in key) + '}'
+
+
+class Counter:
+    """
+    Monotonic total per label set (rows processed, cache hits, errors).
+    """
+
+    kind = 'counter'
+
+    def __init__(self, name, description=''):
+        self.name = name
+        self.description = description
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(_label_key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+    def snapshot(self):
+        with self._lock:
+            return [{'labels': dict(key), 'value': value} for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """
+    Last (or largest, with set_max) value per label set, e.g. peak RSS or resident index size.
+    """
+
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def set_max(self, value, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            if value > self._values.get(key, float('-inf')):
+                self._values[key] = value
+
+
+class Histogram:
+    """
+    Fixed-bucket distribution per label set, with p50/p99 estimated by interpolating within buckets.
+
+    observe() is a bisect and three additions under a lock, so it stays cheap on hot paths.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, description='', buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0, 0.0]
+            series[0][index] += 1
+            series[1] += 1
+            series[2] += value
+
+    def quantile(self, q, **labels):
+        series = self._series.get(_label_key(labels))
+        return self._quantile(series, q) if series else None
+
+    def _quantile(self, series, q):
+        counts, count, _ = series
+        rank = q * count
+        cumulative = 0
+        for i, bucket_count in enumerate(counts):
+            if bucket_count and cumulative + bucket_count >= rank:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - cumulative) / bucket_count
+            cumulative += bucket_count
+        return self.buckets[-1]
+
+    def samples(self):
+        with self._lock:
+            series = {key: ([*counts], count, total) for key, (counts, count, total) in self._series.items()}
+        samples = []
+        for key, (counts, count, total) in series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", key + (('le', repr(float(bound))),), cumulative))
+            samples.append((f"{self.name}_bucket", key + (('le', '+Inf'),), count))
+            samples.append((f"{self.name}_count", key, count))
+            samples.append((f"{self.name}_sum", key, total))
+        return samples
+
+    def snapshot(self):
+        with self._lock:
+            series = {key: ([*counts], count, total) for key, (counts, count, total) in self._series.items()}
+        return [{'labels': dict(key), 'count': count, 'sum': total, 'mean': total / count if count else 0.0,
+                 'p50': self._quantile((counts, count, total), 0.5), 'p99': self._quantile((counts, count, total), 0.99)}
+                for key, (counts, count, total) in series.items()]
+
+
+class MetricsRegistry:
+    """
+    Process-wide set of named instruments. Requesting an existing name returns the same instrument.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, description, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, description, **kwargs)
+        if not isinstance(metric, cls) or (cls is Counter and isinstance(metric, Gauge)):
+            raise ValueError(f"Metric {name} is already registered as a {metric.kind}.")
+        return metric
+
+    def counter(self, name, description=''):
+        return self._get(Counter, name, description)
+
+    def gauge(self, name, description=''):
+        return self._get(Gauge, name, description)
+
+    def histogram(self, name, description='', buckets=LATENCY_BUCKETS):
+        return self._get(Histogram, name, description, buckets=buckets)
+
+    def to_prometheus(self):
+        """
+        Prometheus text exposition format (version 0.0.4) of every instrument.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        lines = []
+        for name, metric in metrics:
+            if metric.description:
+                lines.append(f"# HELP {name} {metric.description}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for sample_name, key, value in metric.samples():
+                lines.append(f"{sample_name}{_format_labels(key)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def to_json(self):
+        """
+        Structured snapshot: {metric name: {'type', 'description', 'series': [...]}}.
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.items())
+        return {name: {'type': metric.kind, 'description': metric.description, 'series': metric.snapshot()}
+                for name, metric in metrics}
+
+    def write_prometheus(self, path):
+        """
+        Atomically write the exposition to `path`, e.g. for node_exporter's textfile collector.
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
+
+    def write_json(self, path):
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'timestamp': time.time(), 'pid': os.getpid(), 'metrics': self.to_json()}, f, indent=2)
+        os.replace(tmp_path, path)
+
+    def reset(self):
+        with self._lock:
+            self._metrics.clear()
+
+
+REGISTRY = MetricsRegistry()
+
+
+_enabled = os.environ.get(ENABLED_ENV, '1').lower() not in ('0', 'false', 'no')
+
+
+def enabled():
+    return _enabled
+
+
+def set_enabled(flag):
+    """
+    Turn instrumentation on or off for this process (overrides LLM_METRICS_ENABLED).
+    """
+    global _enabled
+    _enabled = bool(flag)
+
+
+def peak_rss_bytes():
+    """
+    Peak resident set size of this process so far, or None where the platform does not report it.
+    """
+    try:
+        # VmHWM belongs to this process image; ru_maxrss on Linux carries over the parent's peak across fork/exec
+        with open('/proc/self/status', 'rb') as f:
+            for line in f:
+                if line.startswith(b'VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _memory_status():
+    """
+    (current RSS, peak RSS) of this process in bytes from /proc/self/status, or None without procfs.
+    """
+    rss = hwm = None
+    try:
+        with open('/proc/self/status', 'rb') as f:
+            for line in f:
+                if line.startswith(b'VmRSS:'):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith(b'VmHWM:'):
+                    hwm = int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return (rss, hwm) if rss is not None and hwm is not None else None
+
+
+class timed:
+    """
+    Time a block or function into the `<name>_seconds` histogram.
+
+        with timed('similarity_search', backend='exact'):
+            ...
+
+        @timed('encode_batch')
+        def encode_batch(...): ...
+    """
+
+    __slots__ = ('name', 'labels', '_start')
+
+    def __init__(self, name, **labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        if _enabled:
+            REGISTRY.histogram(f"{self.name}_seconds", f"Duration of {self.name}").observe(time.perf_counter() - self._start, **self.labels)
+        return False
+
+    def __call__(self, func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timed(self.name, **self.labels):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(self.name, **self.labels):
+                return func(*args, **kwargs)
+        return wrapper
+
+
+class stage:
+    """
+    Instrument a batch pipeline stage. On exit it records the stage duration, adds `rows` to
+    `stage_rows_total`, the batch size to `stage_batch_size`, sets `stage_rows_per_second`
+    and raises `stage_peak_rss_bytes` and `stage_rss_growth_bytes`, all labelled with the stage
+    name. `rows` can also be set on the returned object inside the block once it is known.
+
+    The peak is the stage's own: the process high-water mark when the stage raised it, otherwise
+    the larger of the RSS at entry and at exit (a lower bound). Memory metrics need /proc.
+
+        with stage('cleaning', rows=len(df)):
+            ...
+    """
+
+    __slots__ = ('name', 'rows', '_start', '_memory')
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self._memory = _memory_status() if _enabled else None
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if not _enabled:
+            return False
+        elapsed = time.perf_counter() - self._start
+        REGISTRY.histogram('stage_seconds', "Duration of one pipeline stage call").observe(elapsed, stage=self.name)
+        if exc_type is not None:
+            REGISTRY.counter('stage_errors_total', "Stage calls that raised").inc(stage=self.name)
+        if self.rows is not None:
+            REGISTRY.counter('stage_rows_total', "Rows processed per stage").inc(self.rows, stage=self.name)
+            REGISTRY.histogram('stage_batch_size', "Rows per stage call", SIZE_BUCKETS).observe(self.rows, stage=self.name)
+            if elapsed > 0:
+                REGISTRY.gauge('stage_rows_per_second', "Throughput of the last stage call").set(self.rows / elapsed, stage=self.name)
+        memory = _memory_status() if self._memory is not None else None
+        if memory is not None:
+            (start_rss, start_hwm), (end_rss, end_hwm) = self._memory, memory
+            peak = end_hwm if end_hwm > start_hwm else max(start_rss, end_rss)
+            REGISTRY.gauge('stage_peak_rss_bytes', "Peak RSS during the stage").set_max(peak, stage=self.name)
+            REGISTRY.gauge('stage_rss_growth_bytes', "Peak RSS during the stage above the RSS at its start").set_max(
+                peak - start_rss, stage=self.name)
+        return False
+
+
+def count(name, amount=1, **labels):
+    """
+    Add to the `<name>_total` counter, e.g. count('cache_hits', cache='hydrator').
+    """
+    if _enabled:
+        REGISTRY.counter(f"{name}_total").inc(amount, **labels)
+
+
+def observe(name, value, buckets=SIZE_BUCKETS, **labels):
+    """
+    Record a value in the `<name>` histogram, e.g. observe('query_batch_size', len(batch)).
+    """
+    if _enabled:
+        REGISTRY.histogram(name, buckets=buckets).observe(value, **labels)
+
+
+def _write_metrics_file():
+    path = os.environ.get(FILE_ENV)
+    if path and REGISTRY._metrics:
+        if path.endswith('.json'):
+            REGISTRY.write_json(path)
+        else:
+            REGISTRY.write_prometheus(path)
+
+
+atexit.register(_write_metrics_file)
@@ -0,0 +1,302 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pandas as pd
+
+logger = logging.getLogger()
+
+SUCCESS_FILE = '_SUCCESS'
+# Fingerprint of the inputs and parameters the checkpointed parts of a stage were computed from
+FINGERPRINT_FILE = '_FINGERPRINT'
+
+
+def _timed_call(func, chunk, *side_inputs, **params):
+    """
+    Run a chunk function and return (output, seconds), so worker time is reported per stage.
+    """
+    start = time.perf_counter()
+    return func(chunk, *side_inputs, **params), time.perf_counter() - start
+
+
+def _param_state(value):
+    """
+    A parameter as it enters a fingerprint: paths of existing files also carry their size and mtime.
+    """
+    if isinstance(value, str) and os.path.isfile(value):
+        info = os.stat(value)
+        return [value, info.st_size, info.st_mtime_ns]
+    return value
+
+
+class Stage:
+    """
+    One node of the pipeline DAG.
+
+    kind='source': func(**params) yields DataFrame chunks.
+    kind='chunk': func(chunk, *side_inputs, **params) maps one upstream chunk to one output chunk.
+        Chunks are independent, so they run `workers` at a time in a process (or thread) pool while
+        downstream stages consume earlier results.
+    kind='table': func(chunks, *side_inputs, **params) consumes the whole upstream stream and returns
+        a DataFrame (checkpointed as one Parquet file) or a dict of stats (sinks such as DB loads).
+
+    `input` is the upstream stage whose chunks are streamed in; `side_inputs` are table stages
+    whose checkpointed DataFrames are passed as extra arguments. `params` are part of the stage's
+    fingerprint, so changing them (or a file they name) recomputes the stage.
+    """
+
+    def __init__(self, name, func, kind='chunk', input=None, side_inputs=(), workers=1, executor='process', params=None):
+        if kind not in ('source', 'chunk', 'table'):
+            raise ValueError(f"Unknown stage kind {kind}.")
+        if (kind == 'source') != (input is None):
+            raise ValueError(f"Stage {name}: only source stages have no input.")
+        self.name = name
+        self.func = func
+        self.kind = kind
+        self.input = input
+        self.side_inputs = tuple(side_inputs)
+        self.workers = workers
+        self.executor = executor
+        self.params = params or {}
+
+    @property
+    def upstream(self):
+        return ([self.input] if self.input else []) + list(self.side_inputs)
+
+
+class PipelineRunner:
+    """
+    Run a DAG of stages with per-stage Parquet checkpoints under `run_dir`.
+
+    Source and chunk stages write one Parquet part per chunk as it is produced; table stages write
+    their result once. A finished stage gets a _SUCCESS marker with its row count and timings, and
+    a rerun reads finished stages (and finished parts of an interrupted chunk stage) from disk
+    instead of recomputing them. Checkpoints carry a fingerprint of the stage's function, params
+    (input files by size and mtime) and upstream fingerprints; a mismatch discards the stage and
+    everything downstream of it. Chunk stages are chained through generators with at most
+    `max_in_flight` chunks submitted per stage, so every pool stays busy and memory stays bounded.
+    """
+
+    def __init__(self, stages, run_dir, max_in_flight=None):
+        self.stages = {stage.name: stage for stage in stages}
+        for stage in stages:
+            missing = [name for name in stage.upstream if name not in self.stages]
+            if missing:
+                raise ValueError(f"Stage {stage.name} depends on unknown stages {missing}.")
+            if any(self.stages[name].kind != 'table' for name in stage.side_inputs):
+                raise ValueError(f"Stage {stage.name}: side inputs must be table stages.")
+        self.order = self._topological_order()
+        self.fingerprints = self._fingerprints()
+        self.run_dir = run_dir
+        self.max_in_flight = max_in_flight
+        self.report = {}
+        self._side_values = {}
+
+    def _topological_order(self):
+        order, state = [], {}
+
+        def visit(name):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Pipeline has a cycle through {name}.")
+            state[name] = 'visiting'
+            for upstream in self.stages[name].upstream:
+                visit(upstream)
+            state[name] = 'done'
+            order.append(name)
+
+        for name in self.stages:
+            visit(name)
+        return order
+
+    def _fingerprints(self):
+        fingerprints = {}
+        for name in self.order:
+            stage = self.stages[name]
+            state = {
+                'name': name, 'kind': stage.kind, 'func': f"{stage.func.__module__}.{stage.func.__qualname__}",
+                'params': {key: _param_state(value) for key, value in sorted(stage.params.items())},
+                'upstream': [fingerprints[upstream] for upstream in stage.upstream],
+            }
+            fingerprints[name] = hashlib.sha1(json.dumps(state, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+        return fingerprints
+
+    def _stored_fingerprint(self, name):
+        path = os.path.join(self._stage_dir(name), FINGERPRINT_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding='utf-8') as f:
+            return f.read().strip()
+
+    def _open_stage_dir(self, name):
+        os.makedirs(self._stage_dir(name), exist_ok=True)
+        with open(os.path.join(self._stage_dir(name), FINGERPRINT_FILE), 'w', encoding='utf-8') as f:
+            f.write(self.fingerprints[name])
+
+    def _drop_stale(self):
+        """
+        Invalidate every stage whose checkpoint was computed from other inputs or params.
+        """
+        for name in self.order:
+            if os.path.isdir(self._stage_dir(name)) and self._stored_fingerprint(name) != self.fingerprints[name]:
+                logger.info(f"Checkpoint of {name} does not match its inputs; invalidated stages {sorted(self.invalidate(name))}.")
+
+    def _stage_dir(self, name):
+        return os.path.join(self.run_dir, name)
+
+    def _part_path(self, name, index):
+        return os.path.join(self._stage_dir(name), f"part-{index:05d}.parquet")
+
+    def is_complete(self, name):
+        path = os.path.join(self._stage_dir(name), SUCCESS_FILE)
+        if not os.path.exists(path):
+            return False
+        with open(path, encoding='utf-8') as f:
+            return json.load(f).get('fingerprint') == self.fingerprints[name]
+
+    def invalidate(self, name):
+        """
+        Drop the checkpoint of `name` and of every stage downstream of it.
+        """
+        stale = {name}
+        for stage_name in self.order:
+            if any(upstream in stale for upstream in self.stages[stage_name].upstream):
+                stale.add(stage_name)
+        for stage_name in stale:
+            shutil.rmtree(self._stage_dir(stage_name), ignore_errors=True)
+        return stale
+
+    def _write_part(self, path, frame):
+        tmp_path = path + '.tmp'
+        frame.to_parquet(tmp_path, index=False, compression='zstd')
+        os.replace(tmp_path, path)
+
+    def _mark_complete(self, name, summary):
+        with open(os.path.join(self._stage_dir(name), SUCCESS_FILE), 'w', encoding='utf-8') as f:
+            json.dump(dict(summary, fingerprint=self.fingerprints[name]), f, indent=2, default=str)
+
+    def _side_value(self, name):
+        if name not in self._side_values:
+            self._side_values[name] = pd.read_parquet(os.path.join(self._stage_dir(name), 'result.parquet'))
+        return self._side_values[name]
+
+    def stream(self, name):
+        """
+        Yield the output chunks of a source or chunk stage, computing and checkpointing what is missing.
+        """
+        stage = self.stages[name]
+        if self.is_complete(name):
+            index = 0
+            while os.path.exists(self._part_path(name, index)):
+                yield pd.read_parquet(self._part_path(name, index))
+                index += 1
+            return
+
+        self._open_stage_dir(name)
+        stats = {'rows': 0, 'chunks': 0, 'resumed_chunks': 0, 'worker_seconds': 0.0}
+        start_time = time.perf_counter()
+
+        def finish(index, output, seconds):
+            self._write_part(self._part_path(name, index), output)
+            stats['rows'] += len(output)
+            stats['chunks'] += 1
+            stats['worker_seconds'] += seconds
+            return output
+
+        if stage.kind == 'source':
+            # A source is re-read from the start; parts already on disk only skip the write
+            produce_start = time.perf_counter()
+            for index, chunk in enumerate(stage.func(**stage.params)):
+                if os.path.exists(self._part_path(name, index)):
+                    stats['resumed_chunks'] += 1
+                    stats['rows'] += len(chunk)
+                    stats['chunks'] += 1
+                else:
+                    finish(index, chunk, time.perf_counter() - produce_start)
+                yield chunk
+                produce_start = time.perf_counter()
+        else:
+            side_inputs = [self._side_value(side) for side in stage.side_inputs]
+            pool_class = ProcessPoolExecutor if stage.executor == 'process' else ThreadPoolExecutor
+            max_in_flight = self.max_in_flight or 2 * stage.workers
+            with pool_class(max_workers=stage.workers) as pool:
+                pending = deque()
+                for index, chunk in enumerate(self.stream(stage.input)):
+                    part_path = self._part_path(name, index)
+                    if os.path.exists(part_path):
+                        stats['resumed_chunks'] += 1
+                        pending.append((index, None, part_path))
+                    else:
+                        pending.append((index, pool.submit(_timed_call, stage.func, chunk, *side_inputs, **stage.params), None))
+                    while len(pending) > max_in_flight:
+                        yield self._collect(pending.popleft(), finish, stats)
+                while pending:
+                    yield self._collect(pending.popleft(), finish, stats)
+
+        stats['wall_seconds'] = time.perf_counter() - start_time
+        self._mark_complete(name, stats)
+        self.report[name] = stats
+
+    @staticmethod
+    def _collect(entry, finish, stats):
+        index, future, part_path = entry
+        if future is None:
+            output = pd.read_parquet(part_path)
+            stats['rows'] += len(output)
+            stats['chunks'] += 1
+            return output
+        output, seconds = future.result()
+        return finish(index, output, seconds)
+
+    def _run_table(self, name):
+        stage = self.stages[name]
+        self._open_stage_dir(name)
+        start_time = time.perf_counter()
+        result = stage.func(self.stream(stage.input), *[self._side_value(side) for side in stage.side_inputs], **stage.params)
+        summary = {'wall_seconds': time.perf_counter() - start_time}
+        if isinstance(result, pd.DataFrame):
+            self._write_part(os.path.join(self._stage_dir(name), 'result.parquet'), result)
+            summary['rows'] = len(result)
+        elif isinstance(result, dict):
+            summary.update(result)
+        self._mark_complete(name, summary)
+        self.report[name] = summary
+
+    def run(self, rerun=()):
+        """
+        Run every stage that is not checkpointed yet and return {stage: summary}. Stages named in
+        `rerun` (and everything downstream of them) are recomputed.
+        """
+        for name in rerun:
+            logger.info(f"Invalidated stages {sorted(self.invalidate(name))}.")
+        self._drop_stale()
+        start_time = time.perf_counter()
+        for name in self.order:
+            stage = self.stages[name]
+            if self.is_complete(name):
+                continue
+            # Streaming stages run as a side effect of their consumers; only drain the ones nobody consumes
+            consumed = any(other.input == name for other in self.stages.values())
+            if stage.kind == 'table':
+                self._run_table(name)
+            elif not consumed:
+                for _ in self.stream(name):
+                    pass
+        for name in self.order:
+            if name not in self.report:
+                with open(os.path.join(self._stage_dir(name), SUCCESS_FILE), encoding='utf-8') as f:
+                    self.report[name] = dict(json.load(f), checkpointed=True)
+        total = time.perf_counter() - start_time
+        for name in self.order:
+            summary = self.report[name]
+            note = ' (from checkpoint)' if summary.get('checkpointed') else ''
+            logger.info(f"Stage {name}: {summary.get('wall_seconds', 0.0):.2f}s wall, "
+                        f"{summary.get('worker_seconds', 0.0):.2f}s in workers, {summary.get('rows', '-')} rows{note}.")
+        logger.info(f"Pipeline finished in {total:.2f}s.")
+        return self.report
@@ -0,0 +1,152 @@
+import argparse
+import logging
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from pipeline.dag import PipelineRunner, Stage
+from vectorization.vector_store import DEFAULT_STORE_PATH
+
+logger = logging.getLogger()
+
+DEFAULT_INPUT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'input', 'amazon_reviews.csv'))
+DEFAULT_RUN_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'pipeline_run'))
+DEFAULT_CHUNK_SIZE = 50000
+# review_rating is on a fixed 1-5 scale, so chunks are normalized with the same bounds
+RATING_RANGE = (1, 5)
+
+_worker_scorer = None
+
+
+def read_reviews(path=DEFAULT_INPUT, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Stream raw reviews from a CSV or Parquet file in DataFrame chunks.
+    """
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq
+
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def clean_chunk(chunk):
+    """
+    Drop fully empty rows and add cleaned_review_text, like text_cleaning and preprocess_data.
+    """
+    from preprocessing.cleaning_engine import clean_texts
+
+    chunk = chunk.dropna(how='all')
+    chunk = chunk.assign(cleaned_review_text=clean_texts(chunk['review_text'].fillna('').astype(str)))
+    return chunk.reset_index(drop=True)
+
+
+def sentiment_chunk(chunk):
+    """
+    Add sentiment_score and normalized_rating (feature_engineering's features) to a cleaned chunk.
+    """
+    global _worker_scorer
+    from preprocessing.sentiment import LexiconSentimentScorer
+
+    if _worker_scorer is None:
+        # Chunks already run one per core; the scorer must not start a pool of its own
+        _worker_scorer = LexiconSentimentScorer(n_workers=1)
+    low, high = RATING_RANGE
+    return chunk.assign(sentiment_score=_worker_scorer.score_series(chunk['cleaned_review_text']).to_numpy(),
+                        normalized_rating=(chunk['review_rating'] - low) / (high - low))
+
+
+def load_reviews(chunks):
+    """
+    Replace processed_product_reviews with the featurized chunks, streamed through bulk_load.
+    """
+    from ingestion.bulk_loader import bulk_load
+    from ingestion.database_setup import get_database_connection
+
+    return {'rows': bulk_load(chunks, 'processed_product_reviews', get_database_connection(role='write'), mode='replace')}
+
+
+def dedupe(chunks):
+    """
+    Near-duplicate mapping for the cleaned reviews, saved to review_duplicates and checkpointed.
+    """
+    from preprocessing.dedupe import dedupe_reviews, save_duplicate_mapping
+
+    mapping, _ = dedupe_reviews(chunk[['review_hash_id', 'cleaned_review_text']] for chunk in chunks)
+    save_duplicate_mapping(mapping)
+    return mapping
+
+
+def embed_chunk(chunk, mapping):
+    """
+    Embeddings of the canonical reviews in a chunk, with the content hashes the vector store keeps.
+    """
+    from vectorization.embeddings_model import content_hash, encode_batch
+
+    duplicates = mapping.loc[mapping['review_hash_id'] != mapping['canonical_review_hash_id'], 'review_hash_id']
+    chunk = chunk.loc[~chunk['review_hash_id'].astype(str).isin(duplicates), ['review_hash_id', 'cleaned_review_text']]
+    texts = chunk['cleaned_review_text'].tolist()
+    embeddings = encode_batch(texts) if texts else np.zeros((0, 0), dtype=np.float32)
+    return pd.DataFrame({'review_hash_id': chunk['review_hash_id'].astype(str).to_numpy(),
+                         'content_hash': [content_hash(text) for text in texts],
+                         'embedding': list(embeddings)})
+
+
+def store_embeddings(chunks, store_path=DEFAULT_STORE_PATH):
+    """
+    Write the embedded chunks to a fresh vector store at `store_path`.
+    """
+    from vectorization.embeddings_model import MODEL_NAME
+    from vectorization.vector_store import VectorStore
+
+    store, total = None, 0
+    for chunk in chunks:
+        if chunk.empty:
+            continue
+        embeddings = np.vstack(chunk['embedding'].to_numpy()).astype(np.float32)
+        if store is None:
+            store = VectorStore.create(store_path, model_name=MODEL_NAME, dim=embeddings.shape[1], overwrite=True)
+        store.append(chunk['review_hash_id'].tolist(), embeddings, content_hashes=chunk['content_hash'].tolist())
+        total += len(chunk)
+    return {'rows': total}
+
+
+def build_review_pipeline(input_path=DEFAULT_INPUT, chunk_size=DEFAULT_CHUNK_SIZE, workers=None, store_path=DEFAULT_STORE_PATH):
+    """
+    Stages of the review pipeline: ingest -> clean -> sentiment -> {load, dedupe}; dedupe + sentiment -> embed -> store.
+    """
+    workers = workers or os.cpu_count() or 1
+    return [
+        Stage('ingest', read_reviews, kind='source', params={'path': input_path, 'chunk_size': chunk_size}),
+        Stage('clean', clean_chunk, input='ingest', workers=workers),
+        Stage('sentiment', sentiment_chunk, input='clean', workers=workers),
+        Stage('load', load_reviews, kind='table', input='sentiment'),
+        Stage('dedupe', dedupe, kind='table', input='sentiment'),
+        # The model releases the GIL and uses every core itself; one thread keeps it loaded once
+        Stage('embed', embed_chunk, input='sentiment', side_inputs=('dedupe',), workers=1, executor='thread'),
+        Stage('store', store_embeddings, kind='table', input='embed', params={'store_path': store_path}),
+    ]
+
+
+def run_review_pipeline(input_path=DEFAULT_INPUT, run_dir=DEFAULT_RUN_DIR, chunk_size=DEFAULT_CHUNK_SIZE, workers=None, rerun=(),
+                        store_path=DEFAULT_STORE_PATH):
+    runner = PipelineRunner(build_review_pipeline(input_path, chunk_size, workers, store_path), run_dir)
+    return runner.run(rerun)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Run the review pipeline end to end with resumable Parquet checkpoints.")
+    parser.add_argument('--input', default=DEFAULT_INPUT, help="Raw reviews as .csv or .parquet")
+    parser.add_argument('--run-dir', default=DEFAULT_RUN_DIR, help="Checkpoint directory; rerunning with it resumes")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--rerun', nargs='*', default=[], help="Stages to recompute, with everything downstream")
+    parser.add_argument('--store-path', default=DEFAULT_STORE_PATH, help="Vector store the embeddings are written to")
+    args = parser.parse_args()
+    run_review_pipeline(args.input, args.run_dir, args.chunk_size, args.workers, args.rerun, args.store_path)
@@ -0,0 +1,51 @@
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+# Compiled once at import: everything except ASCII letters, digits and whitespace
+_NON_ALNUM = re.compile(r'[^A-Za-z0-9\s]+')
+
+# Inputs smaller than this are cleaned in-process; pool start-up costs more than it saves
+PARALLEL_THRESHOLD = 200000
+
+
+def clean_text_fast(text):
+    """
+    Single-pass equivalent of text_cleaning.clean_text.
+
+    str.split() splits on the same Unicode whitespace as the regex \\s, so splitting and
+    re-joining collapses runs of whitespace and strips the ends in one step.
+    """
+    return ' '.join(_NON_ALNUM.sub('', text).split()).lower()
+
+
+def clean_texts(texts):
+    """
+    Clean a sequence of values, passing through anything that is not a string (e.g. NaN).
+    """
+    return [clean_text_fast(text) if isinstance(text, str) else text for text in texts]
+
+
+def clean_texts_parallel(texts, n_workers=None, chunk_size=50000):
+    """
+    Clean a list of values, sharding it across a process pool by chunk when it is large.
+    Output order matches input order.
+    """
+    texts = list(texts)
+    n_workers = n_workers or os.cpu_count() or 1
+    if n_workers == 1 or len(texts) < PARALLEL_THRESHOLD:
+        return clean_texts(texts)
+
+    chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+    cleaned = []
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        for chunk in executor.map(clean_texts, chunks):
+            cleaned.extend(chunk)
+    return cleaned
+
+
+def clean_series(series, n_workers=None, chunk_size=50000):
+    """
+    Clean a pandas Series of review text and return a new Series with the same index.
+    """
+    return series.__class__(clean_texts_parallel(series.tolist(), n_workers, chunk_size), index=series.index, name=series.name)
@@ -0,0 +1,225 @@
+import logging
+import os
+import sys
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import inspect, text
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from ingestion.bulk_loader import bulk_load
+from ingestion.database_setup import get_database_connection
+from monitoring.metrics import stage
+
+logger = logging.getLogger()
+
+DUPLICATES_TABLE = 'review_duplicates'
+NUM_PERM = 128
+# 16 bands of 8 rows: pairs above ~0.7 Jaccard usually share a band; candidates are then verified
+BANDS = 16
+SHINGLE_SIZE = 3
+DEFAULT_THRESHOLD = 0.8
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+# Rows of shingle hashes permuted at once; bounds the (NUM_PERM x rows) uint64 work array
+_SIGNATURE_BATCH_SHINGLES = 20000
+
+
+def _permutations(num_perm=NUM_PERM, seed=1):
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, (1 << 32) - 1, num_perm, dtype=np.uint64)
+    b = rng.integers(0, (1 << 32) - 1, num_perm, dtype=np.uint64)
+    return a, b
+
+
+def shingles(cleaned_text, size=SHINGLE_SIZE):
+    """
+    Word n-grams of a cleaned review; texts shorter than `size` words give one shingle.
+    """
+    words = cleaned_text.split()
+    if len(words) <= size:
+        return [' '.join(words)]
+    return [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def minhash_signatures(texts, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE, seed=1):
+    """
+    (len(texts), num_perm) uint32 MinHash signatures of the texts' word shingles.
+
+    Shingles are hashed with crc32 and permuted with (a * x + b) mod (2^61 - 1), all texts of
+    a batch at once, then reduced to per-text minima with np.minimum.reduceat.
+    """
+    a, b = _permutations(num_perm, seed)
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    start = 0
+    while start < len(texts):
+        hashes, offsets, count = [], [], 0
+        stop = start
+        while stop < len(texts) and (count == 0 or count < _SIGNATURE_BATCH_SHINGLES):
+            offsets.append(count)
+            text_hashes = [zlib.crc32(shingle.encode('utf-8')) for shingle in shingles(str(texts[stop]), shingle_size)]
+            hashes.extend(text_hashes)
+            count += len(text_hashes)
+            stop += 1
+        values = np.asarray(hashes, dtype=np.uint64)
+        permuted = ((a[:, None] * values[None, :] + b[:, None]) % _MERSENNE_PRIME) & _MAX_HASH
+        signatures[start:stop] = np.minimum.reduceat(permuted, offsets, axis=1).T
+        start = stop
+    return signatures
+
+
+def _chunk_signatures(review_ids, texts):
+    return review_ids, minhash_signatures(texts)
+
+
+class NearDuplicateIndex:
+    """
+    Streaming LSH over MinHash signatures that assigns every review to a canonical review.
+
+    Each signature is cut into `bands`; two reviews are candidates when any band matches
+    exactly. A review joins the first candidate canonical whose estimated Jaccard similarity
+    (fraction of equal signature values) is at least `threshold`, and otherwise becomes a new
+    canonical. Only canonical signatures are kept, so memory grows with the unique reviews.
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, num_perm=NUM_PERM, bands=BANDS):
+        if num_perm % bands:
+            raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands}).")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.buckets = [{} for _ in range(bands)]
+        self.canonical_ids = []
+        self.canonical_signatures = []
+        self.cluster_sizes = []
+
+    def add(self, review_ids, signatures):
+        """
+        Assign each review to a cluster and return their canonical review ids, in input order.
+        """
+        band_keys = signatures.reshape(len(signatures), self.bands, self.rows_per_band)
+        canonicals = []
+        for review_id, signature, keys in zip(review_ids, signatures, band_keys):
+            keys = [key.tobytes() for key in keys]
+            cluster = None
+            checked = set()
+            for band, key in enumerate(keys):
+                candidate = self.buckets[band].get(key)
+                if candidate is None or candidate in checked:
+                    continue
+                checked.add(candidate)
+                if np.mean(self.canonical_signatures[candidate] == signature) >= self.threshold:
+                    cluster = candidate
+                    break
+            if cluster is None:
+                cluster = len(self.canonical_ids)
+                self.canonical_ids.append(review_id)
+                self.canonical_signatures.append(signature)
+                self.cluster_sizes.append(0)
+                for band, key in enumerate(keys):
+                    self.buckets[band].setdefault(key, cluster)
+            self.cluster_sizes[cluster] += 1
+            canonicals.append(self.canonical_ids[cluster])
+        return canonicals
+
+    def stats(self):
+        sizes = np.asarray(self.cluster_sizes, dtype=np.int64)
+        total = int(sizes.sum())
+        duplicated = sizes[sizes > 1]
+        return {'reviews': total, 'canonical': len(sizes), 'duplicates': total - len(sizes),
+                'clusters_with_duplicates': len(duplicated), 'largest_cluster': int(sizes.max()) if len(sizes) else 0,
+                'mean_duplicated_cluster_size': float(duplicated.mean()) if len(duplicated) else 0.0,
+                'embeddings_saved_fraction': (total - len(sizes)) / total if total else 0.0}
+
+
+def iter_cleaned_reviews(chunk_size=50000):
+    engine = get_database_connection()
+    query = 'SELECT review_hash_id, cleaned_review_text FROM processed_product_reviews'
+    with engine.connect().execution_options(stream_results=True) as conn:
+        for chunk in pd.read_sql(query, con=conn, chunksize=chunk_size):
+            yield chunk
+
+
+def dedupe_reviews(chunks=None, threshold=DEFAULT_THRESHOLD, n_workers=None, chunk_size=50000, batch_size=10000):
+    """
+    Map every review to its canonical near-duplicate and return (mapping DataFrame, stats).
+
+    `chunks` yields DataFrames with review_hash_id and cleaned_review_text (default: streamed
+    from processed_product_reviews). Signatures are computed in `batch_size` batches in a process
+    pool, with a bounded number of batches in flight; clusters are assigned in input order.
+    """
+    if chunks is None:
+        chunks = iter_cleaned_reviews(chunk_size)
+    n_workers = n_workers or os.cpu_count() or 1
+    index = NearDuplicateIndex(threshold)
+    mappings = []
+    start_time = time.perf_counter()
+
+    def assign(review_ids, signatures):
+        with stage('dedupe_assign', rows=len(review_ids)):
+            canonicals = index.add(review_ids, signatures)
+        mappings.append(pd.DataFrame({'review_hash_id': review_ids, 'canonical_review_hash_id': canonicals}))
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        pending = deque()
+        for chunk in chunks:
+            review_ids = chunk['review_hash_id'].astype(str).tolist()
+            texts = chunk['cleaned_review_text'].fillna('').astype(str).tolist()
+            for start in range(0, len(texts), batch_size):
+                pending.append(executor.submit(_chunk_signatures, review_ids[start:start + batch_size], texts[start:start + batch_size]))
+                while len(pending) > 2 * n_workers:
+                    assign(*pending.popleft().result())
+        while pending:
+            assign(*pending.popleft().result())
+
+    mapping = pd.concat(mappings, ignore_index=True) if mappings else pd.DataFrame(columns=['review_hash_id', 'canonical_review_hash_id'])
+    sizes = mapping.groupby('canonical_review_hash_id')['review_hash_id'].transform('size') if len(mapping) else []
+    mapping['cluster_size'] = sizes
+    stats = index.stats()
+    stats['seconds'] = time.perf_counter() - start_time
+    logger.info(f"Deduplicated {stats['reviews']} reviews into {stats['canonical']} canonicals "
+                f"({stats['clusters_with_duplicates']} clusters with duplicates, largest {stats['largest_cluster']}); "
+                f"skipping {stats['duplicates']} embeddings ({stats['embeddings_saved_fraction']:.1%}) "
+                f"in {stats['seconds']:.1f}s.")
+    return mapping, stats
+
+
+def save_duplicate_mapping(mapping, engine=None):
+    """
+    Replace the review_duplicates table (review_hash_id -> canonical_review_hash_id, cluster_size).
+    """
+    engine = engine or get_database_connection(role='write')
+    bulk_load(mapping, DUPLICATES_TABLE, engine, mode='replace')
+
+
+def cluster_members(canonical_ids):
+    """
+    {canonical review id: [member review ids]} for the given canonicals, from review_duplicates.
+    Canonicals without recorded duplicates (or without a review_duplicates table) map to themselves.
+    """
+    members = {canonical_id: [] for canonical_id in canonical_ids}
+    if not members:
+        return members
+    engine = get_database_connection()
+    if not inspect(engine).has_table(DUPLICATES_TABLE):
+        return {canonical_id: [canonical_id] for canonical_id in members}
+    placeholders = ', '.join(f":id{i}" for i in range(len(members)))
+    query = text(f"SELECT review_hash_id, canonical_review_hash_id FROM {DUPLICATES_TABLE} "
+                 f"WHERE canonical_review_hash_id IN ({placeholders})")
+    with engine.connect() as conn:
+        result = conn.execute(query, {f"id{i}": canonical_id for i, canonical_id in enumerate(members)})
+        for review_id, canonical_id in result:
+            members[canonical_id].append(review_id)
+    return {canonical_id: ids or [canonical_id] for canonical_id, ids in members.items()}
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    mapping, _ = dedupe_reviews()
+    save_duplicate_mapping(mapping)
@@ -1,35 +1,33 @@
 import sys
 import os
 import pandas as pd
-from text_cleaning import clean_text
-from textblob import TextBlob
 from sklearn.preprocessing import MinMaxScaler
 
 # Add the root directory to sys.path to resolve 'ingestion' module
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
 
+from preprocessing.cleaning_engine import clean_series
+from preprocessing.sentiment import get_sentiment_scorer
 from ingestion.database_setup import get_database_connection
+from monitoring.metrics import stage
+from ingestion.bulk_loader import bulk_load
+from preprocessing.dedupe import dedupe_reviews, save_duplicate_mapping
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger()
 
-def feature_engineering(df):
+def feature_engineering(df, sentiment_backend='lexicon'):
     """
     Function to create additional features, such as sentiment score.
+    sentiment_backend is 'lexicon' (fast, vectorized) or 'textblob' (reference).
     """
-    def get_sentiment(text):
-        try:
-            # Return the polarity score from TextBlob (ranges from -1 to 1)
-            return TextBlob(text).sentiment.polarity
-        except Exception as e:
-            logger.error(f"Error calculating sentiment: {e}")
-            return None
-
     try:
-        # Create sentiment score from the cleaned review text
-        df['sentiment_score'] = df['cleaned_review_text'].apply(get_sentiment)
+        # Create sentiment score (polarity from -1 to 1) from the cleaned review text
+        scorer = get_sentiment_scorer(sentiment_backend)
+        with stage('sentiment', rows=len(df)):
+            df['sentiment_score'] = scorer.score_series(df['cleaned_review_text'])
     except Exception as e:
         logger.error(f"Error adding sentiment scores: {e}")
 
@@ -51,7 +49,8 @@ def preprocess_data():
 
         # Step 2: Clean the text column (if not already cleaned in previous steps)
         logger.info("Cleaning text data...")
-        df['cleaned_review_text'] = df['review_text'].apply(clean_text)  # Assuming 'review_text' column exists
+        with stage('cleaning', rows=len(df)):
+            df['cleaned_review_text'] = clean_series(df['review_text'])  # Assuming 'review_text' column exists
         logger.info("Text cleaning completed.")
 
         # Step 3: Feature engineering (e.g., sentiment score, normalized rating)
@@ -61,9 +60,15 @@ def preprocess_data():
 
         # Step 4: Save the preprocessed data back to the database
         logger.info("Saving preprocessed data to the database...")
-        engine = get_database_connection()  # Assuming you have a method to get the database connection
-        df.to_sql('processed_product_reviews', con=engine, if_exists='replace', index=False)
+        engine = get_database_connection(role='write')  # Assuming you have a method to get the database connection
+        bulk_load(df, 'processed_product_reviews', engine, mode='replace')
         logger.info("Data preprocessing successful and saved to the database.")
+
+        # Step 5: Group near-duplicate reviews so only one copy per cluster is embedded
+        logger.info("Detecting near-duplicate reviews...")
+        mapping, _ = dedupe_reviews([df[['review_hash_id', 'cleaned_review_text']]])
+        save_duplicate_mapping(mapping, engine)
+        logger.info("Near-duplicate mapping saved to the database.")
     
     except Exception as e:
         logger.error(f"Error during preprocessing: {e}")
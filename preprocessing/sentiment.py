@@ -0,0 +1,270 @@
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger()
+
+# Inputs with fewer distinct uncached texts than this are scored in-process
+PARALLEL_THRESHOLD = 100000
+
+
+def _text_key(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).digest()
+
+
+class SentimentCache:
+    """
+    Bounded LRU cache from a hash of the review text to its polarity.
+    """
+
+    def __init__(self, max_size=1000000):
+        self.max_size = max_size
+        self._scores = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        score = self._scores.get(key)
+        if score is None:
+            self.misses += 1
+            return None
+        self._scores.move_to_end(key)
+        self.hits += 1
+        return score
+
+    def put(self, key, score):
+        self._scores[key] = score
+        self._scores.move_to_end(key)
+        while len(self._scores) > self.max_size:
+            self._scores.popitem(last=False)
+
+    def __len__(self):
+        return len(self._scores)
+
+
+class SentimentScorer:
+    """
+    Base class for sentiment backends. Subclasses implement _score_unique, which scores a list
+    of distinct strings; score() handles deduplication, caching and missing values.
+    """
+
+    name = None
+
+    def __init__(self, cache_size=1000000):
+        self.cache = SentimentCache(cache_size) if cache_size else None
+
+    def _score_unique(self, texts):
+        raise NotImplementedError
+
+    def score(self, texts):
+        """
+        Return a float64 numpy array with one polarity in [-1, 1] per input (NaN for non-strings).
+        """
+        texts = list(texts)
+        scores = np.full(len(texts), np.nan)
+        positions = {}
+        for i, text in enumerate(texts):
+            if isinstance(text, str):
+                positions.setdefault(text, []).append(i)
+
+        # Each distinct text is looked up (and scored) once, however often it repeats
+        pending, pending_keys = [], []
+        for text, rows in positions.items():
+            key = _text_key(text)
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                scores[rows] = cached
+            else:
+                pending.append(text)
+                pending_keys.append(key)
+
+        if pending:
+            for text, key, score in zip(pending, pending_keys, self._score_unique(pending)):
+                scores[positions[text]] = score
+                if self.cache is not None:
+                    self.cache.put(key, float(score))
+        return scores
+
+    def score_series(self, series):
+        return pd.Series(self.score(series.tolist()), index=series.index, name=series.name)
+
+
+class TextBlobSentimentScorer(SentimentScorer):
+    """
+    Reference backend: TextBlob's PatternAnalyzer polarity, one TextBlob per text.
+    """
+
+    name = 'textblob'
+
+    def _score_unique(self, texts):
+        from textblob import TextBlob
+        return [TextBlob(text).sentiment.polarity for text in texts]
+
+
+def load_textblob_lexicon():
+    """
+    Return (polarity, intensity, is_modifier, negations) from TextBlob's bundled pattern lexicon.
+    """
+    from textblob.en import sentiment as pattern_sentiment
+
+    polarity, intensity, is_modifier = {}, {}, {}
+    for word, senses in pattern_sentiment.items():
+        p, _, i = senses[None]
+        polarity[word] = p
+        intensity[word] = i
+        is_modifier[word] = any(pos in senses for pos in pattern_sentiment.modifiers)
+    return polarity, intensity, is_modifier, frozenset(pattern_sentiment.negations)
+
+
+def _shift(values, periods, fill):
+    """
+    np.roll without wrap-around.
+    """
+    shifted = np.empty_like(values)
+    if periods > 0:
+        shifted[:periods] = fill
+        shifted[periods:] = values[:-periods]
+    else:
+        shifted[periods:] = fill
+        shifted[:periods] = values[-periods:]
+    return shifted
+
+
+class LexiconSentimentScorer(SentimentScorer):
+    """
+    Fast backend that reproduces TextBlob's pattern algorithm with vectorized lookups.
+
+    All texts are tokenized once and the tokens factorized, so the lexicon is consulted once per
+    distinct token. Assessments follow PatternAnalyzer: a known modifier ("very") merges with the
+    next known word and scales its polarity by the modifier's intensity, a preceding negation
+    ("not") flips the assessment to -0.5x, and polarity is the mean over assessments. Modifiers
+    and negations are carried across at most one intervening short word, so a few long-range
+    constructions score slightly differently from TextBlob.
+    """
+
+    name = 'lexicon'
+
+    def __init__(self, lexicon=None, cache_size=1000000, n_workers=None):
+        super().__init__(cache_size)
+        self.lexicon = lexicon or load_textblob_lexicon()
+        self.n_workers = n_workers
+
+    def _score_unique(self, texts):
+        n_workers = self.n_workers or os.cpu_count() or 1
+        if n_workers == 1 or len(texts) < PARALLEL_THRESHOLD:
+            return score_texts(texts, self.lexicon)
+
+        chunk_size = -(-len(texts) // n_workers)
+        chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(self.lexicon,)) as executor:
+            return np.concatenate(list(executor.map(_score_in_worker, chunks)))
+
+
+_worker_lexicon = None
+
+
+def _init_worker(lexicon):
+    global _worker_lexicon
+    _worker_lexicon = lexicon
+
+
+def _score_in_worker(texts):
+    return score_texts(texts, _worker_lexicon)
+
+
+def score_texts(texts, lexicon):
+    """
+    Vectorized pattern-style polarity for a list of strings.
+    """
+    polarity_map, intensity_map, modifier_map, negations = lexicon
+    tokens_per_text = [text.lower().split() for text in texts]
+    lengths = np.fromiter((len(tokens) for tokens in tokens_per_text), dtype=np.int64, count=len(texts))
+    doc = np.repeat(np.arange(len(texts)), lengths)
+    if not len(doc):
+        return np.zeros(len(texts))
+
+    codes, vocab = pd.factorize(pd.Series([token for tokens in tokens_per_text for token in tokens]))
+    vocab = vocab.tolist()
+    polarity = np.array([polarity_map.get(word, np.nan) for word in vocab])[codes]
+    intensity = np.array([intensity_map.get(word, 1.0) for word in vocab])[codes]
+    modifier = np.array([modifier_map.get(word, False) for word in vocab])[codes]
+    negation = np.array([word in negations for word in vocab])[codes]
+    short = np.array([len(word) <= 1 for word in vocab])[codes]
+    small = np.array([len(word) <= 2 for word in vocab])[codes]
+
+    known = ~np.isnan(polarity)
+    same_doc_1 = _shift(doc, 1, -1) == doc
+    same_doc_2 = _shift(doc, 2, -1) == doc
+
+    # Known word merges into the chain of the known modifier right before it, or two tokens
+    # back when the word in between is short and unknown ("really is good")
+    known_modifier = known & modifier
+    merge_1 = known & same_doc_1 & _shift(known_modifier, 1, False)
+    merge_2 = known & same_doc_2 & ~merge_1 & _shift(~known & small, 1, False) & _shift(known_modifier, 2, False)
+    start = known & ~merge_1 & ~merge_2
+
+    # Negation right before the chain start, or before one single-character word ("not a good")
+    negated_1 = same_doc_1 & _shift(negation, 1, False)
+    negated_2 = same_doc_2 & _shift(~known & short, 1, False) & _shift(negation, 2, False)
+    negated_start = start & (negated_1 | negated_2)
+
+    # A merged word is scaled by the intensity of the word it merges into (inverted after a negation)
+    into_intensity = np.where(merge_1, _shift(intensity, 1, 1.0), _shift(intensity, 2, 1.0))
+    into_negated = np.where(merge_1, _shift(negated_start, 1, False), _shift(negated_start, 2, False))
+    into_intensity = np.where(into_negated, 1.0 / into_intensity, into_intensity)
+    value = np.where(merge_1 | merge_2, np.clip(polarity * into_intensity, -1.0, 1.0), polarity)
+
+    # The chain's polarity is the value at its last word
+    chain_end = known & ~_shift(merge_1, -1, False) & ~_shift(merge_2, -2, False)
+    chain_id = np.cumsum(start) - 1
+    chain_negated = negated_start[start][chain_id[chain_end]]
+    assessment = np.where(chain_negated, value[chain_end] * -0.5, value[chain_end])
+
+    assessment_doc = doc[chain_end]
+    totals = np.bincount(assessment_doc, weights=assessment, minlength=len(texts))
+    counts = np.bincount(assessment_doc, minlength=len(texts))
+    return np.divide(totals, counts, out=np.zeros(len(texts)), where=counts > 0)
+
+
+SENTIMENT_BACKENDS = {
+    'lexicon': LexiconSentimentScorer,
+    'textblob': TextBlobSentimentScorer,
+}
+
+# One scorer per backend per process, so the lexicon and cache are reused across calls
+_scorers = {}
+
+
+def get_sentiment_scorer(backend='lexicon'):
+    """
+    Return the process-wide scorer for `backend` ('lexicon' or 'textblob').
+    """
+    if backend not in SENTIMENT_BACKENDS:
+        raise ValueError(f"Unknown sentiment backend {backend}; expected one of {sorted(SENTIMENT_BACKENDS)}.")
+    if backend not in _scorers:
+        _scorers[backend] = SENTIMENT_BACKENDS[backend]()
+    return _scorers[backend]
+
+
+def parity_report(texts, scorer=None, reference=None):
+    """
+    Compare a scorer against the TextBlob reference: mean absolute error, share of texts
+    within 0.01, sign agreement and Pearson correlation.
+    """
+    scorer = scorer or LexiconSentimentScorer(cache_size=0)
+    reference = reference or TextBlobSentimentScorer(cache_size=0)
+    texts = [text for text in texts if isinstance(text, str)]
+    fast = scorer.score(texts)
+    expected = reference.score(texts)
+    return {
+        'n': len(texts),
+        'mae': float(np.mean(np.abs(fast - expected))),
+        'within_0_01': float(np.mean(np.abs(fast - expected) <= 0.01)),
+        'sign_agreement': float(np.mean(np.sign(fast) == np.sign(expected))),
+        'pearson': float(np.corrcoef(fast, expected)[0, 1]) if len(texts) > 1 else 1.0,
+    }
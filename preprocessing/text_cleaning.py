@@ -1,8 +1,15 @@
 import csv
+import os
 import re
 import statistics
+import sys
+import tempfile
 from collections import Counter
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from preprocessing.cleaning_engine import clean_text_fast
+
 # Function to clean text data
 def clean_text(text):
     # Remove special characters and extra spaces
@@ -43,59 +50,136 @@ def fill_numeric_missing_values(data, column):
 def is_row_empty(row):
     return all(is_empty_or_nan(value) for value in row.values())
 
-# Read the existing CSV data
-input_csv = 'C:/Users/RNaveen/Documents/LLM-Data-Engineer-Assignment/data/input/amazon_reviews.csv'
-output_csv = 'C:/Users/RNaveen/Documents/LLM-Data-Engineer-Assignment/data/processed/cleaned_data.csv'
+# Bounded-memory frequency counter (Misra-Gries). Counts are exact while a column has at most
+# `capacity` distinct values, so the mode matches Counter.most_common for categorical columns;
+# for free-text columns memory stays capped and the most frequent value is approximated.
+class BoundedCounter:
+    def __init__(self, capacity=100000):
+        self.capacity = capacity
+        self.counts = {}
 
-# Open the input CSV file and read its contents with the correct encoding (UTF-8)
-with open(input_csv, 'r', encoding='utf-8') as infile:
-    reader = csv.DictReader(infile)
-    
-    # Get the headers (fieldnames)
-    fieldnames = reader.fieldnames
-    print("Headers:", fieldnames)  # Debug print to show headers
-
-    # Process the data (clean the text for relevant fields)
-    data = []
-    for row in reader:
-        print("Original Row:", row)  # Debug print to show the row before processing
-        
-        # Skip rows that are completely empty or NaN
-        if is_row_empty(row):
-            print("Skipping row due to being empty:", row)  # Debug print to show why a row is skipped
-            continue
-        
-        cleaned_row = row.copy()  # Copy the row to avoid modifying it directly while iterating
-        
-        # Clean text in each relevant field (assuming you want to clean all string fields)
-        for key, value in cleaned_row.items():
-            if isinstance(value, str):  # Check if the value is a string
-                cleaned_row[key] = clean_text(value)  # Clean the text
-        
-        data.append(cleaned_row)
-
-    # Ensure that there is data to process and remove columns where all values are empty or NaN
-    if data:
-        # Impute missing values in relevant columns
-        for column in fieldnames:
-            if column in data[0]:  # Ensure the column exists in the data
-                if all(is_empty_or_nan(row[column]) for row in data):  # If column is completely empty
-                    continue
-                if isinstance(data[0][column], str):  # Categorical column (fill with mode)
-                    fill_missing_values(data, column)
-                elif isinstance(data[0][column], (int, float)):  # Numeric column (fill with mean)
-                    fill_numeric_missing_values(data, column)
-
-        # Write the processed data to a new CSV file with the correct encoding (UTF-8)
-        with open(output_csv, 'w', newline='', encoding='utf-8') as outfile:
-            writer = csv.DictWriter(outfile, fieldnames=fieldnames)
-
-            # Write the header to the output file
-            writer.writeheader()
-            
-            # Write the processed data rows to the output file
-            writer.writerows(data)
-
-        print(f"CSV data has been cleaned and saved to {output_csv}.")
+    def add(self, value):
+        if value in self.counts:
+            self.counts[value] += 1
+        elif len(self.counts) < self.capacity:
+            self.counts[value] = 1
+        else:
+            # Decrement every counter and drop those that reach zero
+            self.counts = {key: count - 1 for key, count in self.counts.items() if count > 1}
+
+    def most_common_value(self):
+        # Like Counter.most_common(1), ties go to the value seen first
+        if not self.counts:
+            return None
+        return max(self.counts, key=self.counts.get)
+
+# Per-column statistics gathered in one streaming pass: mode for categorical columns, mean for numeric ones
+class ColumnStats:
+    def __init__(self, fieldnames, numeric_columns=(), max_distinct=100000):
+        self.fieldnames = fieldnames
+        self.numeric_columns = set(numeric_columns)
+        self.counters = {column: BoundedCounter(max_distinct) for column in fieldnames if column not in self.numeric_columns}
+        self.sums = {column: 0.0 for column in self.numeric_columns}
+        self.counts = {column: 0 for column in self.numeric_columns}
+
+    def update(self, row):
+        for column in self.fieldnames:
+            value = row.get(column)
+            if is_empty_or_nan(value):
+                continue
+            if column in self.numeric_columns:
+                self.sums[column] += float(value)
+                self.counts[column] += 1
+            else:
+                self.counters[column].add(value)
+
+    def fill_values(self):
+        """
+        Value to impute for each column; columns with no values at all are left out (not imputed).
+        """
+        fill = {}
+        for column, counter in self.counters.items():
+            if counter.counts:
+                fill[column] = counter.most_common_value()
+        for column in self.numeric_columns:
+            if self.counts[column]:
+                fill[column] = self.sums[column] / self.counts[column]
+        return fill
+
+# Function to clean every string field of a row
+def clean_row(row):
+    return {key: clean_text_fast(value) if isinstance(value, str) else value for key, value in row.items()}
+
+# Function to fill missing values in a row from precomputed per-column fill values
+def impute_row(row, fill_values):
+    for column, value in fill_values.items():
+        if is_empty_or_nan(row.get(column)):
+            row[column] = value
+    return row
+
+def _write_in_chunks(writer, rows, chunk_size):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            writer.writerows(chunk)
+            chunk = []
+    if chunk:
+        writer.writerows(chunk)
+
+# Two-pass streaming cleaner with constant memory: pass one cleans rows, spills them to a temporary
+# file and gathers column stats; pass two imputes and writes the output in chunks.
+def clean_csv_streaming(input_csv, output_csv, chunk_size=10000, numeric_columns=(), max_distinct=100000):
+    with open(input_csv, 'r', encoding='utf-8', newline='') as infile:
+        reader = csv.DictReader(infile)
+        fieldnames = reader.fieldnames
+        if fieldnames is None:
+            # Empty input: no header, so nothing to clean
+            return 0
+        stats = ColumnStats(fieldnames, numeric_columns, max_distinct)
+
+        spill = tempfile.NamedTemporaryFile('w', encoding='utf-8', newline='', suffix='.csv', delete=False,
+                                            dir=os.path.dirname(os.path.abspath(output_csv)))
+        try:
+            with spill:
+                spill_writer = csv.DictWriter(spill, fieldnames=fieldnames, extrasaction='ignore')
+                spill_writer.writeheader()
+
+                def cleaned_rows():
+                    for row in reader:
+                        # Skip rows that are completely empty or NaN
+                        if is_row_empty(row):
+                            continue
+                        cleaned_row = clean_row(row)
+                        stats.update(cleaned_row)
+                        yield cleaned_row
+
+                _write_in_chunks(spill_writer, cleaned_rows(), chunk_size)
+
+            fill_values = stats.fill_values()
+            total = 0
+            with open(spill.name, 'r', encoding='utf-8', newline='') as spilled, \
+                    open(output_csv, 'w', newline='', encoding='utf-8') as outfile:
+                writer = csv.DictWriter(outfile, fieldnames=fieldnames, extrasaction='ignore')
+                writer.writeheader()
+
+                def imputed_rows():
+                    nonlocal total
+                    for row in csv.DictReader(spilled):
+                        total += 1
+                        yield impute_row(row, fill_values)
+
+                _write_in_chunks(writer, imputed_rows(), chunk_size)
+        finally:
+            os.remove(spill.name)
+    return total
+
+if __name__ == '__main__':
+    input_csv = 'C:/Users/RNaveen/Documents/LLM-Data-Engineer-Assignment/data/input/amazon_reviews.csv'
+    output_csv = 'C:/Users/RNaveen/Documents/LLM-Data-Engineer-Assignment/data/processed/cleaned_data.csv'
+
+    total = clean_csv_streaming(input_csv, output_csv)
+    if total:
+        print(f"CSV data has been cleaned and saved to {output_csv} ({total} rows).")
     else:
         print("No valid data found to write.")
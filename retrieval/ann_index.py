@@ -0,0 +1,381 @@
+import json
+import logging
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from vectorization.vector_store import DEFAULT_STORE_PATH, open_vector_store
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger()
+
+DEFAULT_INDEX_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'index', 'review_embeddings.ivfpq.npz'))
+
+# Indexes that have already been built or loaded in this process, keyed by path
+_resident_indexes = {}
+
+
+def _normalize(vectors):
+    """
+    L2-normalize rows so that inner product equals cosine similarity.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _kmeans(data, n_clusters, n_iter=20, seed=0):
+    """
+    Plain Lloyd's k-means on float32 data. Returns (centroids, assignments).
+    """
+    rng = np.random.default_rng(seed)
+    n_clusters = min(n_clusters, len(data))
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    assignments = np.zeros(len(data), dtype=np.int64)
+    for _ in range(n_iter):
+        # ||x - c||^2 = ||x||^2 - 2 x.c + ||c||^2; ||x||^2 is constant per row
+        distances = (centroids ** 2).sum(axis=1) - 2.0 * data @ centroids.T
+        assignments = distances.argmin(axis=1)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, data)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters with random points
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = data[rng.integers(len(data), size=len(empty))]
+    return centroids.astype(np.float32), assignments
+
+
+class IVFPQIndex:
+    """
+    Inverted-file index with product-quantized residuals for cosine similarity search.
+
+    Vectors are normalized, assigned to the nearest of `nlist` coarse centroids and the
+    residual is compressed into `m` one-byte codes. A query scans only the `nprobe`
+    closest lists and, when the float vectors are available, re-ranks the best
+    `rerank_k` candidates exactly.
+    """
+
+    def __init__(self, nlist=None, m=48, nprobe=8, rerank_k=100, n_iter=20, seed=0):
+        self.nlist = nlist
+        self.m = m
+        self.nprobe = nprobe
+        self.rerank_k = rerank_k
+        self.n_iter = n_iter
+        self.seed = seed
+        self.dim = None
+        self.centroids = None
+        self.codebooks = None
+        self.list_rows = []
+        self.list_codes = []
+        self.review_ids = np.array([], dtype=object)
+        self.vectors = None
+        # When set, re-ranking reads rows from this vector store instead of a private copy
+        self.vector_store_path = None
+        self.deleted = np.zeros(0, dtype=bool)
+        # Filtered searches matching at most this many rows skip the IVF lists and scan exactly
+        self.exact_filter_rows = 20000
+
+    @property
+    def ntotal(self):
+        return int(len(self.review_ids) - self.deleted.sum())
+
+    def train(self, vectors):
+        """
+        Learn the coarse centroids and the PQ codebooks from a sample of vectors.
+        """
+        self.dim = vectors.shape[1]
+        if self.dim % self.m != 0:
+            raise ValueError(f"Embedding dimension {self.dim} is not divisible by m={self.m}.")
+        if self.nlist is None:
+            self.nlist = max(1, int(4 * np.sqrt(len(vectors))))
+
+        rng = np.random.default_rng(self.seed)
+        sample_rows = np.sort(rng.choice(len(vectors), min(len(vectors), 256 * self.nlist), replace=False))
+        sample = _normalize(vectors[sample_rows])
+
+        self.centroids, assignments = _kmeans(sample, self.nlist, self.n_iter, self.seed)
+        self.nlist = len(self.centroids)
+        residuals = sample - self.centroids[assignments]
+
+        sub_dim = self.dim // self.m
+        n_codes = min(256, len(sample))
+        self.codebooks = np.zeros((self.m, n_codes, sub_dim), dtype=np.float32)
+        for j in range(self.m):
+            sub = np.ascontiguousarray(residuals[:, j * sub_dim:(j + 1) * sub_dim])
+            self.codebooks[j], _ = _kmeans(sub, n_codes, self.n_iter, self.seed + j)
+
+        self.list_rows = [np.zeros(0, dtype=np.int64) for _ in range(self.nlist)]
+        self.list_codes = [np.zeros((0, self.m), dtype=np.uint8) for _ in range(self.nlist)]
+        logger.info(f"Trained IVF-PQ index: nlist={self.nlist}, m={self.m}, dim={self.dim}.")
+
+    def _encode(self, data):
+        """
+        Return (list assignment, PQ codes) for normalized vectors.
+        """
+        assignments = (data @ self.centroids.T).argmax(axis=1)
+        residuals = data - self.centroids[assignments]
+        sub_dim = self.dim // self.m
+        codes = np.empty((len(data), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            sub = residuals[:, j * sub_dim:(j + 1) * sub_dim]
+            book = self.codebooks[j]
+            distances = (book ** 2).sum(axis=1) - 2.0 * sub @ book.T
+            codes[:, j] = distances.argmin(axis=1)
+        return assignments, codes
+
+    def add(self, vectors, review_ids, keep_vectors=True):
+        """
+        Encode and append vectors to the index under the given review ids.
+        """
+        if self.centroids is None:
+            raise ValueError("Index must be trained before adding vectors.")
+        data = _normalize(vectors)
+        start = len(self.review_ids)
+        rows = np.arange(start, start + len(data), dtype=np.int64)
+        assignments, codes = self._encode(data)
+        for list_no in np.unique(assignments):
+            mask = assignments == list_no
+            self.list_rows[list_no] = np.concatenate([self.list_rows[list_no], rows[mask]])
+            self.list_codes[list_no] = np.concatenate([self.list_codes[list_no], codes[mask]])
+
+        self.review_ids = np.concatenate([self.review_ids, np.asarray(review_ids, dtype=object)])
+        self.deleted = np.concatenate([self.deleted, np.zeros(len(data), dtype=bool)])
+        if keep_vectors:
+            self.vectors = data if self.vectors is None else np.vstack([self.vectors, data])
+        return rows
+
+    def search(self, query, top_n=5, nprobe=None, rerank_k=None, rows=None):
+        """
+        Return (review_ids, scores) of the approximate top_n neighbours of a single query.
+
+        `rows` optionally restricts the search to sorted index rows (e.g. from a metadata filter).
+        Up to `exact_filter_rows` of them are scored exactly from the float vectors; otherwise rows
+        outside the filter are dropped before PQ scoring, and lists beyond `nprobe` are probed in
+        centroid order until at least top_n allowed candidates are found.
+        """
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        rerank_k = self.rerank_k if rerank_k is None else rerank_k
+        q = _normalize(np.asarray(query).reshape(1, -1))[0]
+
+        allowed = None
+        if rows is not None:
+            rows = rows[~self.deleted[rows]]
+            if self.vectors is not None and len(rows) <= self.exact_filter_rows:
+                # A selective filter is cheaper to scan exactly than to traverse, and loses no recall
+                scores = _normalize(self.vectors[rows]) @ q if len(rows) else np.zeros(0, dtype=np.float32)
+                order = np.argsort(-scores)[:top_n]
+                return self.review_ids[rows[order]].tolist(), scores[order]
+            allowed = np.zeros(len(self.review_ids), dtype=bool)
+            allowed[rows] = True
+
+        coarse = self.centroids @ q
+        if allowed is not None:
+            probe = np.argsort(-coarse)
+        else:
+            probe = np.argpartition(-coarse, nprobe - 1)[:nprobe] if nprobe < self.nlist else np.arange(self.nlist)
+
+        sub_dim = self.dim // self.m
+        # Lookup table of q_j . codeword for every sub-space j and code
+        lut = np.einsum('jkd,jd->jk', self.codebooks, q.reshape(self.m, sub_dim))
+        sub_index = np.arange(self.m)
+
+        candidate_rows, candidate_scores = [], []
+        n_candidates = 0
+        for probed, list_no in enumerate(probe):
+            if allowed is not None and probed >= nprobe and n_candidates >= top_n:
+                break
+            rows, codes = self.list_rows[list_no], self.list_codes[list_no]
+            if allowed is not None:
+                keep = allowed[rows]
+                rows, codes = rows[keep], codes[keep]
+            if not len(rows):
+                continue
+            scores = coarse[list_no] + lut[sub_index, codes].sum(axis=1)
+            candidate_rows.append(rows)
+            candidate_scores.append(scores)
+            n_candidates += len(rows)
+        if not candidate_rows:
+            return [], np.array([], dtype=np.float32)
+
+        rows = np.concatenate(candidate_rows)
+        scores = np.concatenate(candidate_scores)
+        live = ~self.deleted[rows]
+        rows, scores = rows[live], scores[live]
+
+        keep = max(top_n, rerank_k) if self.vectors is not None and rerank_k else top_n
+        if len(rows) > keep:
+            best = np.argpartition(-scores, keep - 1)[:keep]
+            rows, scores = rows[best], scores[best]
+        if self.vectors is not None and rerank_k:
+            rows = np.sort(rows)  # Sequential reads when the vectors are memory-mapped
+            scores = _normalize(self.vectors[rows]) @ q
+
+        order = np.argsort(-scores)[:top_n]
+        return self.review_ids[rows[order]].tolist(), scores[order]
+
+    def attach_vector_store(self, store_path=DEFAULT_STORE_PATH):
+        """
+        Re-rank from the memory-mapped vector store. Index rows must match store rows.
+        """
+        store = open_vector_store(store_path)
+        if len(store) < len(self.review_ids):
+            raise ValueError(f"Vector store at {store_path} has fewer rows than the index.")
+        self.vectors = store.vectors
+        self.vector_store_path = store_path
+
+    def remove(self, review_ids):
+        """
+        Tombstone the given review ids so they are skipped by search.
+        """
+        targets = set(review_ids)
+        mask = np.fromiter((rid in targets for rid in self.review_ids), dtype=bool, count=len(self.review_ids))
+        self.deleted |= mask
+        return int(mask.sum())
+
+    def save(self, path=DEFAULT_INDEX_PATH):
+        """
+        Persist the index to a single .npz file.
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        list_sizes = np.array([len(rows) for rows in self.list_rows], dtype=np.int64)
+        params = {'nlist': self.nlist, 'm': self.m, 'nprobe': self.nprobe, 'rerank_k': self.rerank_k,
+                  'n_iter': self.n_iter, 'seed': self.seed, 'dim': self.dim,
+                  'vector_store_path': self.vector_store_path}
+        arrays = {
+            'params': np.array(json.dumps(params)),
+            'centroids': self.centroids,
+            'codebooks': self.codebooks,
+            'list_sizes': list_sizes,
+            'rows': np.concatenate(self.list_rows) if self.list_rows else np.zeros(0, dtype=np.int64),
+            'codes': np.concatenate(self.list_codes) if self.list_codes else np.zeros((0, self.m), dtype=np.uint8),
+            'review_ids': np.array([str(rid) for rid in self.review_ids]),
+            'deleted': self.deleted,
+        }
+        if self.vectors is not None and self.vector_store_path is None:
+            arrays['vectors'] = self.vectors
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+        logger.info(f"Saved IVF-PQ index with {self.ntotal} vectors to {path}.")
+
+    @classmethod
+    def load(cls, path=DEFAULT_INDEX_PATH):
+        """
+        Load an index previously written with save().
+        """
+        with np.load(path, allow_pickle=False) as archive:
+            params = json.loads(str(archive['params']))
+            index = cls(nlist=params['nlist'], m=params['m'], nprobe=params['nprobe'],
+                        rerank_k=params['rerank_k'], n_iter=params['n_iter'], seed=params['seed'])
+            index.dim = params['dim']
+            index.centroids = archive['centroids']
+            index.codebooks = archive['codebooks']
+            offsets = np.concatenate([[0], np.cumsum(archive['list_sizes'])])
+            rows, codes = archive['rows'], archive['codes']
+            index.list_rows = [rows[offsets[i]:offsets[i + 1]] for i in range(index.nlist)]
+            index.list_codes = [codes[offsets[i]:offsets[i + 1]] for i in range(index.nlist)]
+            index.review_ids = archive['review_ids'].astype(object)
+            index.deleted = archive['deleted']
+            index.vectors = archive['vectors'] if 'vectors' in archive.files else None
+        if params.get('vector_store_path'):
+            index.attach_vector_store(params['vector_store_path'])
+        logger.info(f"Loaded IVF-PQ index with {index.ntotal} vectors from {path}.")
+        return index
+
+
+def load_embeddings_from_db():
+    """
+    Read every (review_id, embedding) pair from review_embeddings_table in one pass.
+    """
+    from sqlalchemy import text
+
+    from ingestion.database_setup import get_database_connection
+
+    engine = get_database_connection()
+    query = text("SELECT review_id, review_embeddings FROM review_embeddings_table")
+    review_ids, embeddings = [], []
+    with engine.connect() as conn:
+        for row in conn.execute(query):
+            review_ids.append(row[0])
+            embeddings.append(json.loads(row[1]))
+    return review_ids, np.asarray(embeddings, dtype=np.float32)
+
+
+def build_index_from_db(path=DEFAULT_INDEX_PATH, **index_params):
+    """
+    Build an IVF-PQ index over review_embeddings_table and save it to disk.
+    """
+    review_ids, embeddings = load_embeddings_from_db()
+    if not len(review_ids):
+        raise ValueError("No embeddings found in review_embeddings table.")
+    index = IVFPQIndex(**index_params)
+    index.train(embeddings)
+    index.add(embeddings, review_ids)
+    if path:
+        index.save(path)
+    return index
+
+
+def build_index_from_store(store_path=DEFAULT_STORE_PATH, path=DEFAULT_INDEX_PATH, block_size=100000, **index_params):
+    """
+    Build an IVF-PQ index over a binary vector store. The store stays memory-mapped for re-ranking.
+    """
+    store = open_vector_store(store_path)
+    if len(store) == 0:
+        raise ValueError(f"No embeddings found in the vector store at {store_path}.")
+    index = IVFPQIndex(**index_params)
+    index.train(store.vectors)
+    for start in range(0, len(store), block_size):
+        index.add(store.vectors[start:start + block_size], store.ids[start:start + block_size], keep_vectors=False)
+    # Superseded and tombstoned rows stay in the index so its rows line up with the store
+    index.deleted = ~store.live_mask()
+    index.attach_vector_store(store_path)
+    if path:
+        index.save(path)
+    return index
+
+
+def get_ann_index(path=DEFAULT_INDEX_PATH, rebuild=False, **index_params):
+    """
+    Return the process-resident index for `path`, loading or building it on first use.
+    """
+    if not rebuild and path in _resident_indexes:
+        return _resident_indexes[path]
+    if not rebuild and os.path.exists(path):
+        index = IVFPQIndex.load(path)
+    else:
+        index = build_index_from_db(path, **index_params)
+    _resident_indexes[path] = index
+    return index
+
+
+def recall_at_k(index, embeddings, review_ids, queries, k=5, nprobe=None, rerank_k=None):
+    """
+    Mean recall@k of the index against exact brute-force cosine search over `embeddings`.
+    """
+    from retrieval.query_api import brute_force_top_n
+
+    recalls = []
+    for query in queries:
+        expected = set(brute_force_top_n(query, embeddings, review_ids, top_n=k))
+        found, _ = index.search(query, top_n=k, nprobe=nprobe, rerank_k=rerank_k)
+        recalls.append(len(expected.intersection(found)) / len(expected))
+    return float(np.mean(recalls)) if recalls else 0.0
+
+
+if __name__ == '__main__':
+    index = get_ann_index(rebuild=True)
+    review_ids, embeddings = load_embeddings_from_db()
+    rng = np.random.default_rng(0)
+    queries = embeddings[rng.choice(len(embeddings), min(100, len(embeddings)), replace=False)]
+    for nprobe in (1, 4, 8, 16):
+        for rerank_k in (0, 100):
+            recall = recall_at_k(index, embeddings, review_ids, queries, k=5, nprobe=nprobe, rerank_k=rerank_k)
+            logger.info(f"nprobe={nprobe} rerank_k={rerank_k}: recall@5={recall:.3f}")
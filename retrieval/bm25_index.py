@@ -0,0 +1,414 @@
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from preprocessing.cleaning_engine import clean_text_fast
+
+logger = logging.getLogger()
+
+DEFAULT_BM25_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'index', 'bm25'))
+
+HEADER_FILE = 'header.json'
+DELETED_FILE = 'deleted.txt'
+INDEX_VERSION = 1
+MAX_TF = np.iinfo(np.uint16).max
+
+# BM25 indexes already loaded in this process, keyed by path
+_resident_indexes = {}
+
+
+def tokenize(text):
+    """
+    Terms of an already cleaned review (lowercase ASCII letters and digits, single spaces).
+    """
+    return text.split()
+
+
+def text_hash(text):
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _segment_postings(texts):
+    """
+    (terms, term_offsets, docs, tfs, doc_lengths) for a batch of texts, docs numbered from 0.
+    Postings are grouped by term (terms sorted) and each group is in doc order.
+    """
+    term_list, doc_list, tf_list = [], [], []
+    doc_lengths = np.empty(len(texts), dtype=np.uint32)
+    for doc, text in enumerate(texts):
+        tokens = tokenize(text)
+        doc_lengths[doc] = len(tokens)
+        counts = Counter(tokens)
+        term_list.extend(counts)
+        tf_list.extend(counts.values())
+        doc_list.extend([doc] * len(counts))
+    if not term_list:
+        return (np.zeros(0, dtype=str), np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int64),
+                np.zeros(0, dtype=np.uint16), doc_lengths)
+    terms, term_ids = np.unique(np.array(term_list, dtype=str), return_inverse=True)
+    order = np.argsort(term_ids, kind='stable')
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(term_ids, minlength=len(terms)))])
+    docs = np.asarray(doc_list, dtype=np.int64)[order]
+    tfs = np.minimum(np.asarray(tf_list, dtype=np.int64)[order], MAX_TF).astype(np.uint16)
+    return terms, offsets, docs, tfs, doc_lengths
+
+
+def _merge_postings(parts):
+    """
+    Merge (terms, offsets, docs, tfs) parts whose docs are disjoint and increasing from part to part.
+    """
+    terms = np.unique(np.concatenate([part[0] for part in parts])) if parts else np.zeros(0, dtype=str)
+    term_ids = [np.repeat(np.searchsorted(terms, part_terms), np.diff(offsets)) for part_terms, offsets, _, _ in parts]
+    term_ids = np.concatenate(term_ids) if term_ids else np.zeros(0, dtype=np.int64)
+    # A stable sort on the term keeps every posting list in doc order
+    order = np.argsort(term_ids, kind='stable')
+    docs = np.concatenate([part[2] for part in parts])[order] if parts else np.zeros(0, dtype=np.int64)
+    tfs = np.concatenate([part[3] for part in parts])[order] if parts else np.zeros(0, dtype=np.uint16)
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(term_ids, minlength=len(terms)))])
+    return terms, offsets.astype(np.int64), docs.astype(np.int64), tfs
+
+
+def _delta_encode(docs, offsets):
+    deltas = np.diff(docs, prepend=0)
+    starts = offsets[:-1][np.diff(offsets) > 0]
+    deltas[starts] = docs[starts]
+    return deltas.astype(np.uint32)
+
+
+def _delta_decode(deltas, offsets):
+    sums = np.cumsum(deltas, dtype=np.int64)
+    lengths = np.diff(offsets)
+    starts = offsets[:-1]
+    base = np.where(starts > 0, sums[np.maximum(starts - 1, 0)] if len(sums) else 0, 0)
+    return sums - np.repeat(base, lengths)
+
+
+class BM25Index:
+    """
+    Segmented inverted index over cleaned review text with BM25 scoring.
+
+    Each add() writes an immutable segment (`seg_00000.npz`): the segment's sorted terms, CSR
+    offsets into its posting lists, delta-encoded doc numbers, uint16 term frequencies, doc
+    lengths, review ids and text hashes, zlib-compressed. Doc numbers are global and grow with
+    every segment, so loading concatenates segments into one CSR posting array per term.
+    Re-adding a review id supersedes its earlier doc and delete() records doc numbers in
+    `deleted.txt`; as in Lucene, superseded and deleted docs still count toward document
+    frequencies and the average length until compact() rewrites the index as one segment.
+
+    search() is term-at-a-time MaxScore: query terms are scored in decreasing order of their
+    maximum possible contribution, and once the k-th best score exceeds what the remaining terms
+    could add to an unseen document, those terms are only looked up for existing candidates.
+    """
+
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self.k1 = header['k1']
+        self.b = header['b']
+        self.review_ids = np.zeros(0, dtype=object)
+        self.hashes = np.zeros(0, dtype=object)
+        self.doc_lengths = np.zeros(0, dtype=np.uint32)
+        self.deleted = np.zeros(0, dtype=bool)
+        self.terms = np.zeros(0, dtype=str)
+        self.term_offsets = np.zeros(1, dtype=np.int64)
+        self.docs = np.zeros(0, dtype=np.int64)
+        self.tfs = np.zeros(0, dtype=np.uint16)
+        self._refresh()
+
+    def __len__(self):
+        return int((~self.deleted).sum())
+
+    @classmethod
+    def create(cls, path=DEFAULT_BM25_PATH, k1=1.2, b=0.75, overwrite=False):
+        """
+        Create an empty index at `path`.
+        """
+        if os.path.exists(os.path.join(path, HEADER_FILE)):
+            if not overwrite:
+                raise FileExistsError(f"A BM25 index already exists at {path}.")
+            for name in os.listdir(path):
+                if name.startswith('seg_') or name == DELETED_FILE:
+                    os.remove(os.path.join(path, name))
+        os.makedirs(path, exist_ok=True)
+        open(os.path.join(path, DELETED_FILE), 'w', encoding='utf-8').close()
+        index = cls(path, {'version': INDEX_VERSION, 'k1': k1, 'b': b, 'segments': [], 'next_segment': 0})
+        index._write_header()
+        return index
+
+    @classmethod
+    def open(cls, path=DEFAULT_BM25_PATH):
+        """
+        Load every segment of the index at `path` into memory.
+        """
+        start_time = time.perf_counter()
+        with open(os.path.join(path, HEADER_FILE), 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        if header.get('version') != INDEX_VERSION:
+            raise ValueError(f"Unsupported BM25 index version {header.get('version')} at {path}.")
+        index = cls(path, header)
+        parts, review_ids, hashes, doc_lengths = [], [], [], []
+        base = 0
+        for name in header['segments']:
+            with np.load(os.path.join(path, name), allow_pickle=False) as segment:
+                offsets = segment['term_offsets']
+                parts.append((segment['terms'], offsets, _delta_decode(segment['docs'], offsets) + base, segment['tfs']))
+                review_ids.append(segment['review_ids'].astype(object))
+                hashes.append(segment['hashes'].astype(object))
+                doc_lengths.append(segment['doc_lengths'])
+                base += len(segment['doc_lengths'])
+        if parts:
+            index.terms, index.term_offsets, index.docs, index.tfs = _merge_postings(parts)
+            index.review_ids = np.concatenate(review_ids)
+            index.hashes = np.concatenate(hashes)
+            index.doc_lengths = np.concatenate(doc_lengths)
+        with open(os.path.join(path, DELETED_FILE), 'r', encoding='utf-8') as f:
+            deleted_docs = np.array([int(line) for line in f if line.strip()], dtype=np.int64)
+        index.deleted = np.zeros(len(index.review_ids), dtype=bool)
+        index.deleted[deleted_docs] = True
+        index._refresh()
+        logger.info(f"Loaded BM25 index with {len(index)} reviews and {len(index.terms)} terms from {path} "
+                    f"in {time.perf_counter() - start_time:.2f}s.")
+        return index
+
+    def _write_header(self):
+        tmp_path = os.path.join(self.path, HEADER_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.header, f)
+        os.replace(tmp_path, os.path.join(self.path, HEADER_FILE))
+
+    def _refresh(self):
+        """
+        Recompute the lookups and per-doc / per-term statistics that depend on the whole corpus.
+        """
+        n_docs = len(self.review_ids)
+        # Later docs supersede earlier ones with the same review id
+        last_doc = {review_id: doc for doc, review_id in enumerate(self.review_ids)}
+        superseded = np.ones(n_docs, dtype=bool)
+        superseded[list(last_doc.values())] = False
+        self.deleted = self.deleted | superseded if len(self.deleted) == n_docs else superseded
+        self.id_to_doc = {review_id: doc for review_id, doc in last_doc.items() if not self.deleted[doc]}
+        self.term_to_id = {term: i for i, term in enumerate(self.terms.tolist())}
+
+        self.n_docs = n_docs
+        self.avg_doc_length = float(self.doc_lengths.mean()) if n_docs else 0.0
+        # BM25 length normalization k1 * (1 - b + b * dl / avgdl), per doc
+        self.norms = (self.k1 * (1 - self.b + self.b * self.doc_lengths / max(self.avg_doc_length, 1e-9))).astype(np.float32)
+        # Highest tf component of each term over its postings: the MaxScore upper bound before idf
+        if len(self.docs):
+            parts = self._tf_part(self.tfs, self.docs)
+            self.max_tf_part = np.maximum.reduceat(parts, self.term_offsets[:-1])
+        else:
+            self.max_tf_part = np.zeros(len(self.terms), dtype=np.float32)
+
+    def _tf_part(self, tfs, docs):
+        tfs = tfs.astype(np.float32)
+        return tfs * (self.k1 + 1) / (tfs + self.norms[docs])
+
+    def _idf(self, term_ids):
+        doc_freq = np.diff(self.term_offsets)[term_ids]
+        return np.log1p((self.n_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+
+    def add(self, review_ids, texts, content_hashes=None, merge=True):
+        """
+        Index cleaned texts under `review_ids` as a new segment; earlier docs for the same ids are superseded.
+        With merge=False the segment is only written to disk (for bulk builds that reopen the index at the end).
+        """
+        if not len(review_ids):
+            return 0
+        texts = ['' if not isinstance(text, str) else text for text in texts]
+        content_hashes = content_hashes or [text_hash(text) for text in texts]
+        terms, offsets, docs, tfs, doc_lengths = _segment_postings(texts)
+
+        name = f"seg_{self.header['next_segment']:05d}.npz"
+        with open(os.path.join(self.path, name), 'wb') as f:
+            np.savez_compressed(f, terms=terms, term_offsets=offsets, docs=_delta_encode(docs, offsets), tfs=tfs,
+                                doc_lengths=doc_lengths, review_ids=np.array([str(rid) for rid in review_ids]),
+                                hashes=np.array(content_hashes, dtype=str))
+        self.header['segments'].append(name)
+        self.header['next_segment'] += 1
+        self._write_header()
+
+        if merge:
+            base = len(self.review_ids)
+            self.terms, self.term_offsets, self.docs, self.tfs = _merge_postings([
+                (self.terms, self.term_offsets, self.docs, self.tfs), (terms, offsets, docs + base, tfs)])
+            self.review_ids = np.concatenate([self.review_ids, np.asarray([str(rid) for rid in review_ids], dtype=object)])
+            self.hashes = np.concatenate([self.hashes, np.asarray(content_hashes, dtype=object)])
+            self.doc_lengths = np.concatenate([self.doc_lengths, doc_lengths])
+            self.deleted = np.concatenate([self.deleted, np.zeros(len(review_ids), dtype=bool)])
+            self._refresh()
+        return len(review_ids)
+
+    def delete(self, review_ids):
+        """
+        Remove reviews from search results. Returns how many live reviews were deleted.
+        """
+        docs = [self.id_to_doc.pop(review_id) for review_id in review_ids if review_id in self.id_to_doc]
+        if docs:
+            self.deleted[docs] = True
+            with open(os.path.join(self.path, DELETED_FILE), 'a', encoding='utf-8') as f:
+                f.writelines(f"{doc}\n" for doc in docs)
+        return len(docs)
+
+    def live_hashes(self):
+        """
+        Map of live review id to the hash of the text it was indexed with.
+        """
+        return {review_id: self.hashes[doc] for review_id, doc in self.id_to_doc.items()}
+
+    def compact(self):
+        """
+        Rewrite the index as a single segment without superseded or deleted docs.
+        """
+        live = np.flatnonzero(~self.deleted)
+        new_doc = np.full(len(self.review_ids), -1, dtype=np.int64)
+        new_doc[live] = np.arange(len(live))
+        keep = ~self.deleted[self.docs]
+        term_ids = np.repeat(np.arange(len(self.terms)), np.diff(self.term_offsets))[keep]
+        counts = np.bincount(term_ids, minlength=len(self.terms))
+        used = counts > 0
+        terms = self.terms[used]
+        offsets = np.concatenate([[0], np.cumsum(counts[used])]).astype(np.int64)
+        docs, tfs = new_doc[self.docs[keep]], self.tfs[keep]
+
+        old_segments = list(self.header['segments'])
+        name = f"seg_{self.header['next_segment']:05d}.npz"
+        with open(os.path.join(self.path, name), 'wb') as f:
+            np.savez_compressed(f, terms=terms, term_offsets=offsets, docs=_delta_encode(docs, offsets), tfs=tfs,
+                                doc_lengths=self.doc_lengths[live], review_ids=np.array(self.review_ids[live].tolist(), dtype=str),
+                                hashes=np.array(self.hashes[live].tolist(), dtype=str))
+        self.header['segments'] = [name]
+        self.header['next_segment'] += 1
+        self._write_header()
+        open(os.path.join(self.path, DELETED_FILE), 'w', encoding='utf-8').close()
+        for old in old_segments:
+            os.remove(os.path.join(self.path, old))
+
+        self.terms, self.term_offsets, self.docs, self.tfs = terms, offsets, docs, tfs
+        self.review_ids, self.hashes = self.review_ids[live], self.hashes[live]
+        self.doc_lengths = self.doc_lengths[live]
+        self.deleted = np.zeros(len(live), dtype=bool)
+        self._refresh()
+        logger.info(f"Compacted BM25 index at {self.path} to {len(live)} reviews in one segment.")
+
+    def search(self, query, top_k=10, rows=None, prune=True):
+        """
+        Return (review_ids, scores) of the top_k reviews by BM25 for a raw query string.
+        `rows` optionally restricts the search to doc numbers (e.g. from a metadata filter);
+        prune=False scores every posting of every query term (for benchmarking MaxScore).
+        """
+        query_terms = Counter(term for term in tokenize(clean_text_fast(query)) if term in self.term_to_id)
+        if not query_terms or top_k <= 0:
+            return [], np.zeros(0, dtype=np.float32)
+        allowed = ~self.deleted
+        if rows is not None:
+            allowed = np.zeros(len(self.review_ids), dtype=bool)
+            allowed[rows] = True
+            allowed &= ~self.deleted
+
+        term_ids = np.array([self.term_to_id[term] for term in query_terms], dtype=np.int64)
+        weights = self._idf(term_ids) * np.array(list(query_terms.values()), dtype=np.float32)
+        upper_bounds = weights * self.max_tf_part[term_ids]
+        order = np.argsort(-upper_bounds, kind='stable')
+        # remaining[i]: the most that terms order[i:] can add to any one doc
+        remaining = np.concatenate([np.cumsum(upper_bounds[order][::-1])[::-1], [0.0]])
+
+        cand_docs = np.zeros(0, dtype=np.int64)
+        cand_scores = np.zeros(0, dtype=np.float32)
+        threshold = -np.inf
+        for i, term_position in enumerate(order):
+            start, stop = self.term_offsets[term_ids[term_position]], self.term_offsets[term_ids[term_position] + 1]
+            docs, tfs = self.docs[start:stop], self.tfs[start:stop]
+            weight = weights[term_position]
+            if prune and len(cand_docs) >= top_k and remaining[i] < threshold:
+                # No unseen doc can reach the top_k any more: only look this term up for the candidates
+                positions = np.minimum(np.searchsorted(docs, cand_docs), len(docs) - 1)
+                hit = docs[positions] == cand_docs
+                cand_scores[hit] += weight * self._tf_part(tfs[positions[hit]], cand_docs[hit])
+            else:
+                keep = allowed[docs]
+                docs, tfs = docs[keep], tfs[keep]
+                scores = weight * self._tf_part(tfs, docs)
+                all_docs = np.concatenate([cand_docs, docs])
+                cand_docs, inverse = np.unique(all_docs, return_inverse=True)
+                cand_scores = np.bincount(inverse, weights=np.concatenate([cand_scores, scores]),
+                                          minlength=len(cand_docs)).astype(np.float32)
+            if prune and len(cand_docs) >= top_k:
+                threshold = np.partition(cand_scores, len(cand_scores) - top_k)[len(cand_scores) - top_k]
+                # Drop candidates that cannot reach the k-th score even with every remaining term
+                viable = cand_scores + remaining[i + 1] >= threshold
+                cand_docs, cand_scores = cand_docs[viable], cand_scores[viable]
+
+        top = np.argsort(-cand_scores, kind='stable')[:top_k]
+        return self.review_ids[cand_docs[top]].tolist(), cand_scores[top]
+
+
+def build_bm25_index(path=DEFAULT_BM25_PATH, chunk_size=50000, k1=1.2, b=0.75, chunks=None):
+    """
+    Stream cleaned_review_text from processed_product_reviews (or `chunks` of DataFrames with
+    review_hash_id and cleaned_review_text) into a new index, one segment per chunk, then compact it.
+    """
+    if chunks is None:
+        from vectorization.embeddings_model import iter_review_chunks
+        chunks = iter_review_chunks(chunk_size)
+    start_time = time.perf_counter()
+    index = BM25Index.create(path, k1=k1, b=b, overwrite=True)
+    total = 0
+    for chunk in chunks:
+        total += index.add(chunk['review_hash_id'].astype(str).tolist(), chunk['cleaned_review_text'].tolist(), merge=False)
+    index = BM25Index.open(path)
+    if len(index.header['segments']) > 1:
+        index.compact()
+    logger.info(f"Built BM25 index over {total} reviews in {time.perf_counter() - start_time:.1f}s.")
+    return index
+
+
+def update_bm25_index(path=DEFAULT_BM25_PATH, chunk_size=50000, chunks=None):
+    """
+    Index only new or changed reviews and delete reviews that are no longer in processed_product_reviews.
+    """
+    if chunks is None:
+        from vectorization.embeddings_model import iter_review_chunks
+        chunks = iter_review_chunks(chunk_size)
+    if not os.path.exists(os.path.join(path, HEADER_FILE)):
+        return build_bm25_index(path, chunk_size, chunks=chunks)
+    index = BM25Index.open(path)
+    stored_hashes = index.live_hashes()
+    seen = set()
+    updated = 0
+    for chunk in chunks:
+        review_ids = chunk['review_hash_id'].astype(str).tolist()
+        texts = chunk['cleaned_review_text'].fillna('').astype(str).tolist()
+        hashes = [text_hash(text) for text in texts]
+        seen.update(review_ids)
+        pending = [i for i, (review_id, h) in enumerate(zip(review_ids, hashes)) if stored_hashes.get(review_id) != h]
+        if pending:
+            updated += index.add([review_ids[i] for i in pending], [texts[i] for i in pending], [hashes[i] for i in pending])
+    deleted = index.delete([review_id for review_id in stored_hashes if review_id not in seen])
+    logger.info(f"Incremental BM25 update: indexed {updated} reviews, deleted {deleted}.")
+    return index
+
+
+def get_bm25_index(path=DEFAULT_BM25_PATH):
+    """
+    Return the process-resident BM25 index for `path`, reloading it when the index on disk changes.
+    """
+    mtime = max(os.path.getmtime(os.path.join(path, name)) for name in (HEADER_FILE, DELETED_FILE))
+    entry = _resident_indexes.get(path)
+    if entry is None or entry[0] != mtime:
+        entry = (mtime, BM25Index.open(path))
+        _resident_indexes[path] = entry
+    return entry[1]
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    update_bm25_index()
@@ -0,0 +1,252 @@
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from vectorization.vector_store import DEFAULT_STORE_PATH, open_vector_store
+
+logger = logging.getLogger()
+
+DEFAULT_BLOCK_SIZE = 65536
+# Prebuilt normalized matrix, kept next to the vector store it was built from
+PREBUILT_MATRIX_FILE = 'exact_normalized.npy'
+PREBUILT_META_FILE = 'exact_normalized.meta.npz'
+
+# Exact indexes already loaded in this process, keyed by store path
+_resident_indexes = {}
+
+
+def _normalize(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def _top_k(scores, k):
+    """
+    Column indices of the k largest scores per row, best first.
+    """
+    k = min(k, scores.shape[1])
+    if k == 0:
+        return np.zeros((scores.shape[0], 0), dtype=np.int64)
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1, kind='stable')
+    return np.take_along_axis(top, order, axis=1)
+
+
+def _dot_scores(queries, block):
+    return queries @ np.asarray(block, dtype=np.float32).T
+
+
+def block_top_k(queries, matrix, top_k, block_size=DEFAULT_BLOCK_SIZE, rows=None, score_block=_dot_scores):
+    """
+    Exact top_k (row numbers, scores) of normalized `queries` against a normalized matrix.
+
+    The matrix is scanned `block_size` rows at a time: each block is scored with one matmul,
+    reduced to its own top_k with argpartition and merged into the running top_k, so memory
+    stays at O(queries x block_size). `rows` restricts the scan to a subset of row numbers.
+    `score_block(queries, block)` returns higher-is-better scores for a block of matrix rows;
+    other indexes pass their own (e.g. over quantized codes) to reuse the scan and merge.
+    """
+    n_queries = len(queries)
+    best_rows = np.zeros((n_queries, 0), dtype=np.int64)
+    best_scores = np.zeros((n_queries, 0), dtype=np.float32)
+    total = len(matrix) if rows is None else len(rows)
+    for start in range(0, total, block_size):
+        if rows is None:
+            block_rows = np.arange(start, min(start + block_size, total))
+            block = matrix[start:start + block_size]
+        else:
+            block_rows = rows[start:start + block_size]
+            block = matrix[block_rows]
+        scores = score_block(queries, block)
+        top = _top_k(scores, top_k)
+        candidate_rows = np.concatenate([best_rows, block_rows[top]], axis=1)
+        candidate_scores = np.concatenate([best_scores, np.take_along_axis(scores, top, axis=1)], axis=1)
+        keep = _top_k(candidate_scores, top_k)
+        best_rows = np.take_along_axis(candidate_rows, keep, axis=1)
+        best_scores = np.take_along_axis(candidate_scores, keep, axis=1)
+    return best_rows, best_scores
+
+
+class ExactSearchIndex:
+    """
+    Exact cosine search over a pre-normalized, contiguous float32 corpus matrix.
+
+    The corpus is normalized once at load time, so a query batch costs one BLAS matmul per block
+    plus an argpartition, instead of re-normalizing the corpus and fully sorting every score.
+    Scores are float32 cosine similarities; rankings match the sklearn path except between
+    reviews whose scores tie to within float32 rounding.
+    """
+
+    def __init__(self, review_ids, vectors, normalized=False, block_size=DEFAULT_BLOCK_SIZE):
+        self.review_ids = np.asarray(review_ids, dtype=object)
+        self.matrix = np.ascontiguousarray(vectors if normalized else _normalize(vectors), dtype=np.float32)
+        self.block_size = block_size
+
+    def __len__(self):
+        return len(self.review_ids)
+
+    @classmethod
+    def from_vector_store(cls, store_path=DEFAULT_STORE_PATH, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Build the index from the live rows of a vector store, normalizing block by block.
+        """
+        store = open_vector_store(store_path)
+        live_rows = np.flatnonzero(store.live_mask())
+        matrix = np.empty((len(live_rows), store.dim), dtype=np.float32)
+        for start in range(0, len(live_rows), block_size):
+            matrix[start:start + block_size] = _normalize(store.vectors[live_rows[start:start + block_size]])
+        index = cls([store.ids[row] for row in live_rows], matrix, normalized=True, block_size=block_size)
+        index.store_signature = store.signature()
+        index.live_rows = live_rows
+        return index
+
+    def save(self, store_path=DEFAULT_STORE_PATH):
+        """
+        Write the normalized matrix next to the store, so later processes memory-map it instead of
+        re-normalizing the corpus at startup. Only valid for an index built by from_vector_store.
+        """
+        matrix_path = os.path.join(store_path, PREBUILT_MATRIX_FILE)
+        with open(matrix_path + '.tmp', 'wb') as f:
+            np.save(f, self.matrix)
+        os.replace(matrix_path + '.tmp', matrix_path)
+        meta_path = os.path.join(store_path, PREBUILT_META_FILE)
+        with open(meta_path + '.tmp', 'wb') as f:
+            np.savez(f, live_rows=self.live_rows, signature=np.array(self.store_signature, dtype=np.int64))
+        os.replace(meta_path + '.tmp', meta_path)
+        logger.info(f"Saved prebuilt exact index with {len(self)} vectors to {matrix_path}.")
+
+    @classmethod
+    def load(cls, store_path=DEFAULT_STORE_PATH, block_size=DEFAULT_BLOCK_SIZE):
+        """
+        Memory-map the prebuilt matrix of a store, or return None when there is none or the store
+        has changed since it was built.
+        """
+        meta_path = os.path.join(store_path, PREBUILT_META_FILE)
+        if not os.path.exists(meta_path):
+            return None
+        store = open_vector_store(store_path)
+        with np.load(meta_path, allow_pickle=False) as archive:
+            live_rows, signature = archive['live_rows'], tuple(archive['signature'].tolist())
+        if signature != store.signature():
+            logger.info(f"Prebuilt exact index in {store_path} is stale; rebuilding in memory.")
+            return None
+        matrix = np.load(os.path.join(store_path, PREBUILT_MATRIX_FILE), mmap_mode='r')
+        index = cls([store.ids[row] for row in live_rows], matrix, normalized=True, block_size=block_size)
+        index.store_signature = signature
+        index.live_rows = live_rows
+        return index
+
+    def search(self, queries, top_k=5, rows=None):
+        """
+        Return (review_ids, scores) for a single query vector or a (n, dim) batch.
+        A single query gives a list of ids and a 1-D score array; a batch gives one list per query.
+        """
+        queries = np.asarray(queries, dtype=np.float32)
+        single = queries.ndim == 1
+        best_rows, best_scores = block_top_k(_normalize(np.atleast_2d(queries)), self.matrix, top_k, self.block_size, rows)
+        ids = [self.review_ids[row].tolist() for row in best_rows]
+        return (ids[0], best_scores[0]) if single else (ids, best_scores)
+
+
+_worker_shards = {}
+
+
+def _search_shard(store_path, signature, start, stop, queries, top_k, block_size):
+    """
+    Exact top_k over store rows [start, stop), run in a worker process. The normalized shard is
+    cached in the worker for the store `signature`, so repeated searches only pay for the matmul;
+    shards of an older signature are dropped.
+    """
+    key = (store_path, signature, start, stop)
+    if key not in _worker_shards:
+        for stale in [cached for cached in _worker_shards if cached[0] == store_path and cached[1] != signature]:
+            del _worker_shards[stale]
+        store = open_vector_store(store_path)
+        live_rows = np.flatnonzero(store.live_mask()[start:stop]) + start
+        _worker_shards[key] = (live_rows, _normalize(store.vectors[live_rows]))
+    live_rows, matrix = _worker_shards[key]
+    shard_rows, scores = block_top_k(queries, matrix, top_k, block_size)
+    return live_rows[shard_rows] if len(live_rows) else shard_rows, scores
+
+
+class ShardedExactSearch:
+    """
+    Exact search over a vector store split into row ranges, one per worker process.
+
+    Each worker memory-maps the store, keeps its normalized shard resident and returns a per-shard
+    top_k; the parent merges them. Use it when the corpus is too large to scan on one core.
+    Shards are recomputed when the store's signature changes (rows appended or tombstoned).
+    """
+
+    def __init__(self, store_path=DEFAULT_STORE_PATH, n_workers=None, block_size=DEFAULT_BLOCK_SIZE):
+        self.store_path = store_path
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self.block_size = block_size
+        self._refresh()
+        self.executor = ProcessPoolExecutor(max_workers=self.n_workers)
+
+    def _refresh(self):
+        self.store = open_vector_store(self.store_path)
+        self.signature = self.store.signature()
+        shard_size = max(1, -(-len(self.store) // self.n_workers))
+        self.shards = [(start, min(start + shard_size, len(self.store))) for start in range(0, len(self.store), shard_size)]
+
+    def search(self, queries, top_k=5):
+        queries = np.asarray(queries, dtype=np.float32)
+        single = queries.ndim == 1
+        if open_vector_store(self.store_path).signature() != self.signature:
+            self._refresh()
+        normalized = _normalize(np.atleast_2d(queries))
+        if not self.shards:
+            ids, scores = [[] for _ in normalized], np.zeros((len(normalized), 0), dtype=np.float32)
+            return (ids[0], scores[0]) if single else (ids, scores)
+        futures = [self.executor.submit(_search_shard, self.store_path, self.signature, start, stop, normalized, top_k, self.block_size)
+                   for start, stop in self.shards]
+        results = [future.result() for future in futures]
+        rows = np.concatenate([shard_rows for shard_rows, _ in results], axis=1)
+        scores = np.concatenate([shard_scores for _, shard_scores in results], axis=1)
+        keep = _top_k(scores, top_k)
+        rows, scores = np.take_along_axis(rows, keep, axis=1), np.take_along_axis(scores, keep, axis=1)
+        ids = [[self.store.ids[row] for row in query_rows] for query_rows in rows]
+        return (ids[0], scores[0]) if single else (ids, scores)
+
+    def close(self):
+        self.executor.shutdown()
+
+
+def get_exact_index(store_path=DEFAULT_STORE_PATH):
+    """
+    Return the process-resident exact index for a vector store, reloading it if the store changed.
+    """
+    index = _resident_indexes.get(store_path)
+    if index is None or index.store_signature != open_vector_store(store_path).signature():
+        index = ExactSearchIndex.load(store_path) or ExactSearchIndex.from_vector_store(store_path)
+        _resident_indexes[store_path] = index
+        logger.info(f"Loaded exact search index with {len(index)} vectors from {store_path}.")
+    return index
+
+
+def prebuild_exact_index(store_path=DEFAULT_STORE_PATH):
+    """
+    Normalize a vector store once and save the result for get_exact_index to memory-map.
+    """
+    index = ExactSearchIndex.from_vector_store(store_path)
+    index.save(store_path)
+    return index
+
+
+if __name__ == '__main__':
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Prebuild the normalized exact-search matrix of a vector store.")
+    parser.add_argument('--store-path', default=DEFAULT_STORE_PATH)
+    args = parser.parse_args()
+    prebuild_exact_index(args.store_path)
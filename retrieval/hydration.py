@@ -0,0 +1,281 @@
+import logging
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from monitoring.metrics import count, stage
+
+logger = logging.getLogger()
+
+DEFAULT_DOC_STORE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'index', 'reviews.parquet'))
+ID_COLUMN = 'review_hash_id'
+SOURCE_TABLE = 'processed_product_reviews'
+DEFAULT_CACHE_SIZE = 10000
+# Small row groups keep a point lookup from decoding many unrelated rows
+ROW_GROUP_SIZE = 4096
+
+_hydrators = {}
+_hydrators_lock = threading.Lock()
+
+
+def _id_index_path(path):
+    return f"{path}.ids.npz"
+
+
+def build_review_doc_store(path=DEFAULT_DOC_STORE_PATH, chunk_size=50000, chunks=None):
+    """
+    Stream processed_product_reviews (or `chunks` of DataFrames) into a Parquet file with small row
+    groups, plus a sorted review_hash_id -> row sidecar for point lookups.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if chunks is None:
+        import pandas as pd
+        from sqlalchemy import text
+
+        from ingestion.database_setup import get_database_connection
+
+        engine = get_database_connection()
+        query = text(f"SELECT * FROM {SOURCE_TABLE}")
+        chunks = pd.read_sql(query, engine, chunksize=chunk_size)
+
+    start_time = time.perf_counter()
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = path + '.tmp'
+    writer, schema = None, None
+    ids = []
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                # Columns that are all null in the first chunk may hold text later
+                schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type) else field for field in schema])
+                writer = pq.ParquetWriter(tmp_path, schema, compression='zstd')
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False, safe=False), row_group_size=ROW_GROUP_SIZE)
+            ids.extend(chunk[ID_COLUMN].astype(str).tolist())
+    finally:
+        if writer is not None:
+            writer.close()
+    if writer is None:
+        raise ValueError(f"No reviews found to write to {path}.")
+
+    ids = np.array(ids, dtype=str)
+    # Keep the last row of a repeated id, like the other stores
+    order = np.argsort(ids[::-1], kind='stable')
+    sorted_ids, first = np.unique(ids[::-1][order], return_index=True)
+    rows = len(ids) - 1 - order[first]
+    with open(_id_index_path(path) + '.tmp', 'wb') as f:
+        np.savez(f, ids=sorted_ids, rows=rows.astype(np.int64))
+    os.replace(tmp_path, path)
+    os.replace(_id_index_path(path) + '.tmp', _id_index_path(path))
+    logger.info(f"Wrote {len(sorted_ids)} reviews to {path} in {time.perf_counter() - start_time:.1f}s.")
+    return path
+
+
+class ReviewHydrator:
+    """
+    Fetch review fields by review_hash_id, from the Parquet doc store when it exists and otherwise
+    from processed_product_reviews in batched IN (...) reads.
+
+    Results are projected to the requested columns and kept in a bounded LRU cache keyed by
+    review id, so repeated hits are served from memory. A cached review only answers requests
+    for columns it already holds; missing columns are fetched and merged into the entry.
+    """
+
+    def __init__(self, doc_store_path=DEFAULT_DOC_STORE_PATH, cache_size=DEFAULT_CACHE_SIZE, batch_size=500):
+        self.doc_store_path = doc_store_path if doc_store_path and os.path.exists(doc_store_path) else None
+        self.cache_size = cache_size
+        self.batch_size = batch_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._reader_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._parquet = None
+        self._row_group_starts = None
+        self._id_index = None
+        self._columns = None
+
+    @property
+    def columns(self):
+        """
+        Every column that can be requested.
+        """
+        if self._columns is None:
+            if self.doc_store_path:
+                self._open_doc_store()
+                self._columns = list(self._parquet.schema_arrow.names)
+            else:
+                from sqlalchemy import inspect
+
+                from ingestion.database_setup import get_database_connection
+
+                engine = get_database_connection()
+                self._columns = [column['name'] for column in inspect(engine).get_columns(SOURCE_TABLE)]
+        return self._columns
+
+    def _open_doc_store(self):
+        if self._parquet is None:
+            import pyarrow.parquet as pq
+
+            self._parquet = pq.ParquetFile(self.doc_store_path, memory_map=True)
+            metadata = self._parquet.metadata
+            self._row_group_starts = np.cumsum([0] + [metadata.row_group(i).num_rows for i in range(metadata.num_row_groups)])
+            with np.load(_id_index_path(self.doc_store_path), allow_pickle=False) as archive:
+                self._id_index = (archive['ids'], archive['rows'])
+
+    def _resolve_columns(self, columns):
+        if columns is None:
+            return list(self.columns)
+        unknown = set(columns) - set(self.columns)
+        if unknown:
+            raise ValueError(f"Unknown review columns {sorted(unknown)}.")
+        return list(dict.fromkeys([ID_COLUMN, *columns]))
+
+    def _lookup(self, review_ids, columns):
+        """
+        (cached records by id, ids to fetch) for `review_ids`.
+        """
+        records, missing = {}, []
+        with self._lock:
+            for review_id in dict.fromkeys(review_ids):
+                entry = self._cache.get(review_id)
+                if entry is not None and all(column in entry for column in columns):
+                    self._cache.move_to_end(review_id)
+                    records[review_id] = {column: entry[column] for column in columns}
+                    self.hits += 1
+                else:
+                    missing.append(review_id)
+                    self.misses += 1
+
+        count('cache_requests', len(records), cache='hydration', result='hit')
+        count('cache_requests', len(missing), cache='hydration', result='miss')
+        return records, missing
+
+    def _store(self, records, fetched):
+        with self._lock:
+            for review_id, record in fetched.items():
+                entry = self._cache.setdefault(review_id, {})
+                entry.update(record)
+                self._cache.move_to_end(review_id)
+                records[review_id] = record
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def get(self, review_ids, columns=None):
+        """
+        Records (dicts of the requested columns) for `review_ids`, in request order.
+        Ids that are not found are skipped.
+        """
+        columns = self._resolve_columns(columns)
+        records, missing = self._lookup(review_ids, columns)
+        if missing:
+            with stage('hydration_fetch', rows=len(missing)):
+                fetched = self._fetch_from_doc_store(missing, columns) if self.doc_store_path else self._fetch_from_db(missing, columns)
+            self._store(records, fetched)
+        return [records[review_id] for review_id in review_ids if review_id in records]
+
+    async def get_async(self, review_ids, columns=None):
+        """
+        Async variant of get. Database reads go through the asyncio engine; doc store reads
+        (memory-mapped Parquet) run in the default executor.
+        """
+        import asyncio
+
+        if self.doc_store_path:
+            return await asyncio.get_running_loop().run_in_executor(None, self.get, review_ids, columns)
+        columns = await asyncio.get_running_loop().run_in_executor(None, self._resolve_columns, columns)
+        records, missing = self._lookup(review_ids, columns)
+        if missing:
+            with stage('hydration_fetch', rows=len(missing)):
+                fetched = await self._fetch_from_db_async(missing, columns)
+            self._store(records, fetched)
+        return [records[review_id] for review_id in review_ids if review_id in records]
+
+    def _fetch_from_doc_store(self, review_ids, columns):
+        self._open_doc_store()
+        sorted_ids, id_rows = self._id_index
+        wanted = np.array(review_ids, dtype=str)
+        positions = np.minimum(np.searchsorted(sorted_ids, wanted), len(sorted_ids) - 1)
+        found = sorted_ids[positions] == wanted
+        rows = id_rows[positions[found]]
+        found_ids = wanted[found]
+        row_groups = np.searchsorted(self._row_group_starts, rows, side='right') - 1
+
+        fetched = {}
+        for row_group in np.unique(row_groups):
+            in_group = row_groups == row_group
+            with self._reader_lock:
+                table = self._parquet.read_row_group(int(row_group), columns=columns)
+            local_rows = rows[in_group] - self._row_group_starts[row_group]
+            for review_id, record in zip(found_ids[in_group], table.take(local_rows).to_pylist()):
+                fetched[str(review_id)] = record
+        return fetched
+
+    def _batched_queries(self, dialect, review_ids, columns):
+        """
+        (statement, params) per batch of `batch_size` ids.
+        """
+        from sqlalchemy import text
+
+        preparer = dialect.identifier_preparer
+        column_list = ', '.join(preparer.quote(column) for column in columns)
+        for start in range(0, len(review_ids), self.batch_size):
+            batch = review_ids[start:start + self.batch_size]
+            placeholders = ', '.join(f":id{i}" for i in range(len(batch)))
+            query = text(f"SELECT {column_list} FROM {SOURCE_TABLE} WHERE {ID_COLUMN} IN ({placeholders})")
+            yield query, {f"id{i}": review_id for i, review_id in enumerate(batch)}
+
+    def _fetch_from_db(self, review_ids, columns):
+        from ingestion.database_setup import get_database_connection
+
+        engine = get_database_connection()
+        fetched = {}
+        with engine.connect() as conn:
+            for query, params in self._batched_queries(engine.dialect, review_ids, columns):
+                for row in conn.execute(query, params).mappings():
+                    fetched[str(row[ID_COLUMN])] = dict(row)
+        return fetched
+
+    async def _fetch_from_db_async(self, review_ids, columns):
+        from ingestion.database_setup import get_async_engine
+
+        engine = get_async_engine()
+        fetched = {}
+        async with engine.connect() as conn:
+            for query, params in self._batched_queries(engine.dialect, review_ids, columns):
+                result = await conn.execute(query, params)
+                for row in result.mappings():
+                    fetched[str(row[ID_COLUMN])] = dict(row)
+        return fetched
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'size': len(self._cache), 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'backend': 'parquet' if self.doc_store_path else 'database'}
+
+
+def get_review_hydrator(doc_store_path=DEFAULT_DOC_STORE_PATH, cache_size=DEFAULT_CACHE_SIZE):
+    """
+    Return the process-wide hydrator for `doc_store_path`, created on first use.
+    """
+    hydrator = _hydrators.get(doc_store_path)
+    if hydrator is not None:
+        return hydrator
+    with _hydrators_lock:
+        if doc_store_path not in _hydrators:
+            _hydrators[doc_store_path] = ReviewHydrator(doc_store_path, cache_size)
+        return _hydrators[doc_store_path]
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    build_review_doc_store()
@@ -0,0 +1,423 @@
+import logging
+import os
+import sys
+import weakref
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+logger = logging.getLogger()
+
+DEFAULT_METADATA_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'index', 'review_metadata.npz'))
+
+# Filterable review columns. Categorical values match case-insensitively; dates compare as days.
+CATEGORICAL_COLUMNS = ('brand', 'category', 'sub_category', 'online_store', 'verified_purchase')
+NUMERIC_COLUMNS = ('review_rating',)
+DATE_COLUMNS = ('review_date',)
+ID_COLUMN = 'review_hash_id'
+# Canonical review of each near-duplicate cluster (review_duplicates); only canonicals are embedded
+CANONICAL_COLUMN = 'canonical_review_hash_id'
+
+RANGE_OPERATORS = {'gt', 'gte', 'lt', 'lte'}
+POINT_OPERATORS = {'eq', 'in'}
+
+# Metadata indexes already loaded in this process, keyed by path, and their row alignments
+_resident_metadata = {}
+_aligned_metadata = {}
+
+
+def _category_key(value):
+    return str(value).strip().lower()
+
+
+def _to_days(values):
+    """
+    Days since the epoch as float64, NaN where the date is missing or unparseable.
+    review_date is stored day-first (dd-mm-yyyy).
+    """
+    import pandas as pd
+
+    values = pd.Series(values, dtype=object)
+    text = values.astype(str)
+    # ISO dates (filter values such as '2019-03-01', or timestamps) must not be read day-first
+    iso = text.str.match(r'\d{4}-\d{2}-\d{2}').to_numpy(dtype=bool)
+    dates = pd.Series(pd.NaT, index=values.index, dtype='datetime64[ns]')
+    if iso.any():
+        dates[iso] = pd.to_datetime(text[iso].str[:10], format='%Y-%m-%d', errors='coerce')
+    if not iso.all():
+        dates[~iso] = pd.to_datetime(values[~iso], dayfirst=True, errors='coerce')
+    days = (dates - pd.Timestamp('1970-01-01')).dt.days
+    return days.to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _sorted_union(parts, n_rows, presorted=False):
+    """
+    Sorted union of disjoint row arrays: a sort when they are small, a mask when they cover much of the corpus.
+    """
+    if presorted and len(parts) == 1:
+        return parts[0]
+    total = sum(len(part) for part in parts)
+    if total * 16 < n_rows:
+        return np.sort(np.concatenate(parts)) if parts else np.zeros(0, dtype=np.int64)
+    mask = np.zeros(n_rows, dtype=bool)
+    for part in parts:
+        mask[part] = True
+    return np.flatnonzero(mask)
+
+
+def _filter_value(column, value):
+    if column in DATE_COLUMNS:
+        # Parsed like the stored dates, so '02-01-2019' is 2 January
+        days = _to_days([value])[0]
+        if np.isnan(days):
+            raise ValueError(f"Cannot parse {value!r} as a date for {column}.")
+        return float(days)
+    if column in NUMERIC_COLUMNS:
+        return float(value)
+    return _category_key(value)
+
+
+class _CategoricalTerm:
+    def __init__(self, index, column, values):
+        self.codes = index.codes[column]
+        vocab = index.vocab[column]
+        positions = np.minimum(np.searchsorted(vocab, values), max(len(vocab) - 1, 0))
+        found = vocab[positions] == values if len(vocab) else np.zeros(len(values), dtype=bool)
+        self.value_codes = np.unique(positions[found])
+        self.order, self.offsets = index.postings[column]
+
+    def count(self):
+        return int((self.offsets[self.value_codes + 1] - self.offsets[self.value_codes]).sum())
+
+    def rows(self):
+        # Each posting list is already sorted; a single value needs no merge
+        parts = [self.order[self.offsets[code]:self.offsets[code + 1]] for code in self.value_codes]
+        return _sorted_union(parts, len(self.codes), presorted=True)
+
+    def matches(self, rows):
+        return np.isin(self.codes[rows], self.value_codes)
+
+
+class _NumericTerm:
+    def __init__(self, index, column, intervals):
+        # intervals: (low, high, low_inclusive, high_inclusive); None means unbounded
+        self.values = index.values[column]
+        self.order, self.sorted_values = index.postings[column]
+        self.intervals = intervals
+
+    def _bounds(self, interval):
+        low, high, low_inclusive, high_inclusive = interval
+        start = 0 if low is None else np.searchsorted(self.sorted_values, low, side='left' if low_inclusive else 'right')
+        stop = len(self.sorted_values) if high is None else np.searchsorted(self.sorted_values, high, side='right' if high_inclusive else 'left')
+        return start, max(start, stop)
+
+    def count(self):
+        return int(sum(stop - start for start, stop in map(self._bounds, self.intervals)))
+
+    def rows(self):
+        return _sorted_union([self.order[start:stop] for start, stop in map(self._bounds, self.intervals)], len(self.values))
+
+    def matches(self, rows):
+        values = self.values[rows]
+        mask = np.zeros(len(rows), dtype=bool)
+        for low, high, low_inclusive, high_inclusive in self.intervals:
+            match = ~np.isnan(values)
+            if low is not None:
+                match &= values >= low if low_inclusive else values > low
+            if high is not None:
+                match &= values <= high if high_inclusive else values < high
+            mask |= match
+        return mask
+
+
+class MetadataIndex:
+    """
+    Per-column posting lists over review metadata, aligned to the rows of a vector index.
+
+    Categorical columns keep a CSR posting list per value (row numbers grouped by value code,
+    each group sorted); numeric and date columns keep their rows sorted by value, so a range
+    is two binary searches. A filter is evaluated by materializing the rows of its most
+    selective term and checking the remaining terms on those rows only, so its cost grows with
+    the number of matching rows rather than with the corpus size.
+
+    Filters are dicts of column -> condition, ANDed together:
+      {'brand': 'Dove', 'category': ['Foods', 'Personal Care'],
+       'review_rating': {'gte': 4}, 'review_date': {'gte': '2019-01-01', 'lt': '2020-01-01'},
+       'verified_purchase': True}
+    A scalar means equality, a list means any of, and a dict takes eq, in, gt, gte, lt and lte.
+
+    Rows describe every review, near-duplicates included; `canonical_ids` holds each review's
+    canonical, so a filter can match a canonical through any member of its cluster.
+    """
+
+    def __init__(self, review_ids, vocab, codes, values, canonical_ids=None):
+        self.review_ids = np.asarray(review_ids, dtype=object)
+        self.canonical_ids = self.review_ids if canonical_ids is None else np.asarray(canonical_ids, dtype=object)
+        self.vocab = vocab
+        self.codes = codes
+        self.values = values
+        self.postings = {}
+        for column, column_codes in codes.items():
+            order = np.argsort(column_codes, kind='stable')
+            counts = np.bincount(column_codes[column_codes >= 0], minlength=len(vocab[column]))
+            # Missing values (code -1) sort first and belong to no posting list
+            offsets = np.concatenate([[0], np.cumsum(counts)]) + int((column_codes < 0).sum())
+            self.postings[column] = (order, offsets)
+        for column, column_values in values.items():
+            order = np.argsort(column_values, kind='stable')  # NaN sorts last
+            present = int((~np.isnan(column_values)).sum())
+            self.postings[column] = (order[:present], column_values[order[:present]])
+
+    def __len__(self):
+        return len(self.review_ids)
+
+    @classmethod
+    def from_frame(cls, df, id_column=ID_COLUMN):
+        """
+        Build the index from a DataFrame holding the id column and any of the filterable columns,
+        plus canonical_review_hash_id when near-duplicates have been mapped.
+        """
+        import pandas as pd
+
+        vocab, codes, values = {}, {}, {}
+        for column in CATEGORICAL_COLUMNS:
+            if column in df.columns:
+                keys = df[column].map(_category_key, na_action='ignore')
+                column_vocab = np.array(sorted(keys.dropna().unique()), dtype=str)
+                column_codes = np.full(len(df), -1, dtype=np.int32)
+                present = keys.notna().to_numpy()
+                column_codes[present] = np.searchsorted(column_vocab, keys[present].to_numpy(dtype=str))
+                vocab[column], codes[column] = column_vocab, column_codes
+        for column in NUMERIC_COLUMNS:
+            if column in df.columns:
+                values[column] = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+        for column in DATE_COLUMNS:
+            if column in df.columns:
+                values[column] = _to_days(df[column])
+        review_ids = df[id_column].astype(str).to_numpy()
+        canonical_ids = None
+        if CANONICAL_COLUMN in df.columns:
+            canonical_ids = df[CANONICAL_COLUMN].where(df[CANONICAL_COLUMN].notna(), df[id_column]).astype(str).to_numpy()
+        return cls(review_ids, vocab, codes, values, canonical_ids)
+
+    def aligned_to(self, review_ids):
+        """
+        AlignedMetadata selecting positions in `review_ids`. A review that is not in `review_ids`
+        itself stands for its canonical, so the canonical matches when any member of its cluster
+        does. Indexed reviews without metadata never match a filter.
+        """
+        import pandas as pd
+
+        id_positions = pd.Index(np.asarray(review_ids, dtype=object))
+        targets = id_positions.get_indexer(self.review_ids)
+        missing = targets < 0
+        targets[missing] = id_positions.get_indexer(self.canonical_ids[missing])
+        return AlignedMetadata(self, targets)
+
+    def matches(self, filters, review_ids):
+        """
+        Boolean array: whether each of `review_ids` itself matches `filters` (all True without filters).
+        """
+        import pandas as pd
+
+        rows = self.select(filters)
+        if rows is None:
+            return np.ones(len(review_ids), dtype=bool)
+        positions = pd.Index(self.review_ids).get_indexer(np.asarray(review_ids, dtype=object))
+        return (positions >= 0) & np.isin(positions, rows)
+
+    def _terms(self, filters):
+        terms = []
+        for column, condition in filters.items():
+            if column not in self.codes and column not in self.values:
+                raise ValueError(f"Cannot filter on {column}; expected one of {sorted(list(self.codes) + list(self.values))}.")
+            if not isinstance(condition, dict):
+                condition = {'in': condition} if isinstance(condition, (list, tuple, set)) else {'eq': condition}
+            if not condition:
+                raise ValueError(f"Empty filter condition for {column}.")
+            unknown = set(condition) - RANGE_OPERATORS - POINT_OPERATORS
+            if unknown:
+                raise ValueError(f"Unknown filter operators {sorted(unknown)} for {column}.")
+
+            points = [condition['eq']] if 'eq' in condition else []
+            points += list(condition.get('in', []))
+            if 'eq' in condition or 'in' in condition:
+                points = sorted({_filter_value(column, value) for value in points})
+                if column in self.codes:
+                    terms.append(_CategoricalTerm(self, column, np.array(points, dtype=str)))
+                else:
+                    terms.append(_NumericTerm(self, column, [(value, value, True, True) for value in points]))
+
+            if RANGE_OPERATORS & set(condition):
+                if column in self.codes:
+                    raise ValueError(f"Range filters are not supported on categorical column {column}.")
+                low = condition.get('gte', condition.get('gt'))
+                high = condition.get('lte', condition.get('lt'))
+                terms.append(_NumericTerm(self, column, [(
+                    None if low is None else _filter_value(column, low),
+                    None if high is None else _filter_value(column, high),
+                    'gte' in condition, 'lte' in condition)]))
+        return terms
+
+    def select(self, filters):
+        """
+        Sorted row numbers matching every condition in `filters`, or None when there are no filters.
+        """
+        if not filters:
+            return None
+        terms = self._terms(filters)
+        terms.sort(key=lambda term: term.count())
+        rows = terms[0].rows()
+        for term in terms[1:]:
+            if not len(rows):
+                break
+            rows = rows[term.matches(rows)]
+        return rows.astype(np.int64, copy=False)
+
+    def mask(self, filters):
+        """
+        Boolean mask over rows matching `filters` (all True when there are no filters).
+        """
+        rows = self.select(filters)
+        if rows is None:
+            return np.ones(len(self), dtype=bool)
+        mask = np.zeros(len(self), dtype=bool)
+        mask[rows] = True
+        return mask
+
+    def save(self, path=DEFAULT_METADATA_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        arrays = {'review_ids': np.array([str(rid) for rid in self.review_ids])}
+        if self.canonical_ids is not self.review_ids:
+            arrays['canonical_ids'] = np.array([str(rid) for rid in self.canonical_ids])
+        for column in self.codes:
+            arrays[f"vocab__{column}"] = self.vocab[column]
+            arrays[f"codes__{column}"] = self.codes[column]
+        for column in self.values:
+            arrays[f"values__{column}"] = self.values[column]
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+        logger.info(f"Saved metadata index for {len(self)} reviews to {path}.")
+
+    @classmethod
+    def load(cls, path=DEFAULT_METADATA_PATH):
+        vocab, codes, values = {}, {}, {}
+        with np.load(path, allow_pickle=False) as archive:
+            for name in archive.files:
+                kind, _, column = name.partition('__')
+                if kind == 'vocab':
+                    vocab[column] = archive[name]
+                elif kind == 'codes':
+                    codes[column] = archive[name]
+                elif kind == 'values':
+                    values[column] = archive[name]
+            review_ids = archive['review_ids'].astype(object)
+            canonical_ids = archive['canonical_ids'].astype(object) if 'canonical_ids' in archive.files else None
+        logger.info(f"Loaded metadata index for {len(review_ids)} reviews from {path}.")
+        return cls(review_ids, vocab, codes, values, canonical_ids)
+
+
+class AlignedMetadata:
+    """
+    A MetadataIndex viewed through the rows of a vector index: `targets[j]` is the row that
+    metadata row j counts towards, or -1 when its review is not indexed.
+    """
+
+    def __init__(self, metadata, targets):
+        self.metadata = metadata
+        self.targets = targets
+
+    def select(self, filters):
+        """
+        Sorted rows of the vector index with at least one review matching `filters`, or None when there are no filters.
+        """
+        rows = self.metadata.select(filters)
+        if rows is None:
+            return None
+        targets = self.targets[rows]
+        return np.unique(targets[targets >= 0]).astype(np.int64, copy=False)
+
+
+def load_review_metadata(source=None, chunk_size=100000):
+    """
+    Read the id and filterable columns from a CSV file, or from processed_product_reviews when `source` is None.
+    From the database, each review's canonical is joined in from review_duplicates when that table exists.
+    """
+    import pandas as pd
+
+    columns = [ID_COLUMN, *CATEGORICAL_COLUMNS, *NUMERIC_COLUMNS, *DATE_COLUMNS]
+    if source is not None:
+        chunks = pd.read_csv(source, usecols=lambda name: name in columns, encoding='utf-8-sig', chunksize=chunk_size)
+    else:
+        from sqlalchemy import inspect, text
+
+        from ingestion.database_setup import get_database_connection
+        from preprocessing.dedupe import DUPLICATES_TABLE
+
+        engine = get_database_connection()
+        query = f"SELECT {', '.join(columns)} FROM processed_product_reviews"
+        if inspect(engine).has_table(DUPLICATES_TABLE):
+            query = (f"SELECT {', '.join(f'p.{column}' for column in columns)}, d.{CANONICAL_COLUMN} "
+                     f"FROM processed_product_reviews p LEFT JOIN {DUPLICATES_TABLE} d ON d.{ID_COLUMN} = p.{ID_COLUMN}")
+        chunks = pd.read_sql(text(query), engine, chunksize=chunk_size)
+    return pd.concat(chunks, ignore_index=True)
+
+
+def build_metadata_index(source=None, path=DEFAULT_METADATA_PATH, mapping=None):
+    """
+    Build the metadata index from `source` (see load_review_metadata) and save it next to the vector indexes.
+    `mapping` (review_hash_id -> canonical_review_hash_id, as from dedupe_reviews) overrides the joined canonicals.
+    """
+    df = load_review_metadata(source)
+    if mapping is not None:
+        df = df.drop(columns=[CANONICAL_COLUMN], errors='ignore').assign(**{ID_COLUMN: df[ID_COLUMN].astype(str)})
+        df = df.merge(mapping[[ID_COLUMN, CANONICAL_COLUMN]].astype(str), on=ID_COLUMN, how='left')
+    index = MetadataIndex.from_frame(df.drop_duplicates(ID_COLUMN, keep='last'))
+    if path:
+        index.save(path)
+    return index
+
+
+def get_metadata_index(path=DEFAULT_METADATA_PATH):
+    """
+    Return the process-resident metadata index, reloading it when the file on disk changes.
+    """
+    mtime = os.path.getmtime(path)
+    entry = _resident_metadata.get(path)
+    if entry is None or entry[0] != mtime:
+        entry = (mtime, MetadataIndex.load(path))
+        _resident_metadata[path] = entry
+    return entry[1]
+
+
+def select_rows(filters, review_ids, path=DEFAULT_METADATA_PATH):
+    """
+    Sorted positions in `review_ids` whose metadata, or that of a near-duplicate they stand for,
+    matches `filters`; None when there are no filters. The alignment to `review_ids` is computed
+    once and reused while that id array is alive.
+    """
+    if not filters:
+        return None
+    metadata = get_metadata_index(path)
+    key = (path, id(review_ids))
+    entry = _aligned_metadata.get(key)
+    if entry is None or entry[0] is not metadata:
+        entry = (metadata, metadata.aligned_to(review_ids))
+        try:
+            weakref.finalize(review_ids, _aligned_metadata.pop, key, None)
+            _aligned_metadata[key] = entry
+        except TypeError:
+            pass  # Not weak-referenceable (e.g. a list); its id could be reused, so don't cache
+    return entry[1].select(filters)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Build the review metadata filter index.")
+    parser.add_argument('--source', default=None, help="CSV file to read instead of processed_product_reviews")
+    parser.add_argument('--path', default=DEFAULT_METADATA_PATH)
+    args = parser.parse_args()
+    build_metadata_index(args.source, args.path)
@@ -0,0 +1,162 @@
+import logging
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from retrieval.exact_search import _normalize, _top_k, block_top_k
+from vectorization.vector_store import DEFAULT_STORE_PATH, open_vector_store
+
+logger = logging.getLogger()
+
+MODES = ('int8', 'binary')
+# Smaller than the exact index's blocks: each int8 block is widened to float32 before its matmul,
+# and keeping that copy cache-sized is about 3x faster than 65536-row blocks
+DEFAULT_BLOCK_SIZE = 8192
+DEFAULT_RESCORE_K = 100
+
+# Set bits per byte value, for numpy builds without np.bitwise_count
+_POPCOUNT = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1).astype(np.uint8)
+
+# Quantized indexes already loaded in this process, keyed by (store path, mode)
+_resident_indexes = {}
+
+
+def _popcount(packed):
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(packed)
+    return _POPCOUNT[packed]
+
+
+class QuantizedIndex:
+    """
+    Compressed in-memory codes for the live rows of a vector store, with float rescoring from disk.
+
+    `int8` keeps one byte per dimension: each dimension is clipped to its 0.1-99.9 percentile
+    range of the normalized corpus and mapped linearly onto 0..255, and the query is scored
+    against the codes without dequantizing the corpus. `binary` keeps one bit per dimension
+    (the sign after centering on the corpus mean) packed into bytes, and ranks by Hamming
+    distance. Either way the best `rescore_k` candidates are rescored with exact cosine over
+    the store's memory-mapped float32 vectors, so only the codes need to stay resident.
+    """
+
+    def __init__(self, mode='int8', rescore_k=DEFAULT_RESCORE_K, block_size=DEFAULT_BLOCK_SIZE):
+        if mode not in MODES:
+            raise ValueError(f"Unknown quantization mode {mode!r}; expected one of {MODES}.")
+        self.mode = mode
+        self.rescore_k = rescore_k
+        self.block_size = block_size
+        self.store = None
+        self.store_rows = np.zeros(0, dtype=np.int64)
+        self.review_ids = np.zeros(0, dtype=object)
+        self.codes = None
+        self.offset = None
+        self.scale = None
+        self.store_signature = None
+
+    def __len__(self):
+        return len(self.review_ids)
+
+    @property
+    def nbytes(self):
+        """
+        Resident bytes of the codes and quantization parameters.
+        """
+        return sum(array.nbytes for array in (self.codes, self.offset, self.scale) if array is not None)
+
+    @classmethod
+    def from_vector_store(cls, store_path=DEFAULT_STORE_PATH, mode='int8', rescore_k=DEFAULT_RESCORE_K,
+                          block_size=DEFAULT_BLOCK_SIZE, sample_size=100000, seed=0):
+        """
+        Fit the quantizer on a sample of live rows, then encode the store block by block.
+        """
+        store = open_vector_store(store_path)
+        index = cls(mode, rescore_k, block_size)
+        index.store = store
+        index.store_signature = store.signature()
+        index.store_rows = np.flatnonzero(store.live_mask())
+        index.review_ids = np.array([store.ids[row] for row in index.store_rows], dtype=object)
+        if len(index.store_rows) == 0:
+            index.codes = np.zeros((0, store.dim if mode == 'int8' else -(-store.dim // 8)), dtype=np.uint8)
+            return index
+
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(index.store_rows, min(sample_size, len(index.store_rows)), replace=False))
+        index.fit(_normalize(store.vectors[sample_rows]))
+        index.codes = np.concatenate([
+            index.encode(_normalize(store.vectors[index.store_rows[start:start + block_size]]))
+            for start in range(0, len(index.store_rows), block_size)
+        ])
+        return index
+
+    def fit(self, sample):
+        """
+        Learn the per-dimension quantization parameters from normalized sample vectors.
+        """
+        if self.mode == 'int8':
+            low, high = np.percentile(sample, [0.1, 99.9], axis=0)
+            self.offset = low.astype(np.float32)
+            self.scale = (np.maximum(high - low, 1e-6) / 255).astype(np.float32)
+        else:
+            self.offset = sample.mean(axis=0).astype(np.float32)
+        return self
+
+    def encode(self, vectors):
+        if self.mode == 'int8':
+            return np.clip(np.rint((vectors - self.offset) / self.scale), 0, 255).astype(np.uint8)
+        return np.packbits(vectors > self.offset, axis=1)
+
+    def _coarse_scores(self, queries, codes):
+        """
+        Higher-is-better scores of normalized queries against a block of codes.
+        """
+        if self.mode == 'int8':
+            # q . (offset + scale * code) without materializing the dequantized block
+            return (queries * self.scale) @ codes.T.astype(np.float32) + (queries @ self.offset)[:, None]
+        query_codes = self.encode(queries)
+        distances = np.stack([_popcount(codes ^ query_code).sum(axis=1, dtype=np.int32) for query_code in query_codes])
+        return -distances.astype(np.float32)
+
+    def search(self, queries, top_k=5, rescore_k=None, rows=None):
+        """
+        Return (review_ids, scores) for a single query vector or a (n, dim) batch, like ExactSearchIndex.
+        `rescore_k=0` skips rescoring and returns coarse scores (approximate cosine for int8,
+        negative Hamming distance for binary). `rows` restricts the scan to a subset of positions.
+        """
+        rescore_k = self.rescore_k if rescore_k is None else rescore_k
+        queries = np.asarray(queries, dtype=np.float32)
+        single = queries.ndim == 1
+        normalized = _normalize(np.atleast_2d(queries))
+        best_rows, best_scores = block_top_k(normalized, self.codes, max(top_k, rescore_k), self.block_size, rows,
+                                            score_block=self._coarse_scores)
+
+        if rescore_k:
+            for i, candidates in enumerate(best_rows):
+                # Sorted store rows keep the memmap reads sequential
+                order = np.argsort(self.store_rows[candidates])
+                candidates = candidates[order]
+                scores = _normalize(self.store.vectors[self.store_rows[candidates]]) @ normalized[i]
+                best_rows[i], best_scores[i] = candidates, scores
+            keep = _top_k(best_scores, top_k)
+            best_rows = np.take_along_axis(best_rows, keep, axis=1)
+            best_scores = np.take_along_axis(best_scores, keep, axis=1)
+        else:
+            best_rows, best_scores = best_rows[:, :top_k], best_scores[:, :top_k]
+
+        ids = [self.review_ids[row].tolist() for row in best_rows]
+        return (ids[0], best_scores[0]) if single else (ids, best_scores)
+
+
+def get_quantized_index(store_path=DEFAULT_STORE_PATH, mode='int8'):
+    """
+    Return the process-resident quantized index for a vector store, re-encoding it if the store changed.
+    """
+    key = (store_path, mode)
+    index = _resident_indexes.get(key)
+    if index is None or index.store_signature != open_vector_store(store_path).signature():
+        index = QuantizedIndex.from_vector_store(store_path, mode)
+        _resident_indexes[key] = index
+        logger.info(f"Loaded {mode} quantized index with {len(index)} vectors ({index.nbytes / 2 ** 20:.1f} MiB) from {store_path}.")
+    return index
@@ -1,52 +1,75 @@
 import numpy as np
 import json
-from sqlalchemy import create_engine, text
-from sklearn.metrics.pairwise import cosine_similarity
 import logging
 import sys
 import os
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
 
-from ingestion.database_setup import get_database_connection
-from sentence_transformers import SentenceTransformer  # Ensure the model is consistent with embeddings generation
+from monitoring.logging_config import LazyRepr, get_sampled_logger
+from monitoring.metrics import timed
+from retrieval.ann_index import DEFAULT_INDEX_PATH, get_ann_index
+from retrieval.bm25_index import DEFAULT_BM25_PATH, get_bm25_index
+from retrieval.exact_search import get_exact_index
+from retrieval.hydration import get_review_hydrator
+from retrieval.metadata_filter import DEFAULT_METADATA_PATH, get_metadata_index, select_rows
+from retrieval.quantized_search import get_quantized_index
+from vectorization.vector_store import DEFAULT_STORE_PATH
+from vectorization.model_manager import DEFAULT_MODEL_NAME, LazyEmbeddingModel, encode_query, fast_start_enabled, get_embedding_model, model_name_for  # Ensure the model is consistent with embeddings generation
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger()
+# Per-request messages; under load at most 10 per second are written
+request_logger = get_sampled_logger('retrieval.requests', max_per_second=10)
 
-def initialize_embedding_model():
+def initialize_embedding_model(fast_start=None):
     """
-    Initialize and return the SentenceTransformer model.
+    Return the shared SentenceTransformer model, loading it once per process.
+    In fast-start mode (or with LLM_FAST_START=1) return a lazy stand-in instead, so prompts
+    served from the query-embedding cache never load the model or torch.
     """
     try:
+        if fast_start if fast_start is not None else fast_start_enabled():
+            logger.info("Fast start: the embedding model loads on the first uncached prompt.")
+            return LazyEmbeddingModel(DEFAULT_MODEL_NAME)
         logger.info("Initializing embedding model...")
-        model = SentenceTransformer('all-MiniLM-L6-v2')  
+        model = get_embedding_model(DEFAULT_MODEL_NAME)
         logger.info("Embedding model loaded successfully.")
         return model
     except Exception as e:
         logger.error(f"Error initializing embedding model: {e}")
         return None
 
+@timed('query_embedding')
 def generate_embedding(prompt, embedding_model):
     """
     Generate an embedding for the given text prompt using the embedding model.
+    Prompts already seen by a managed model are served from the query-embedding cache.
     """
     try:
         if embedding_model is None:
             raise ValueError("Embedding model is not initialized.")
-        logger.info(f"Generating embedding for prompt: {prompt}")
+        request_logger.info("Generating embedding for prompt: %s", LazyRepr(prompt, 200))
+        model_name = model_name_for(embedding_model)
+        if model_name is not None:
+            return encode_query(prompt, model_name)
         embedding = embedding_model.encode(prompt)
         return np.array(embedding)
     except Exception as e:
         logger.error(f"Error generating embedding: {e}")
         return None
 
+@timed('similarity_search', backend='database')
 def retrieve_similar_embeddings(prompt_embedding, top_n=5):
     """
     Retrieve similar embeddings from the review_embeddings table based on cosine similarity.
     """
     try:
+        from sqlalchemy import text
+
+        from ingestion.database_setup import get_database_connection
+
         engine = get_database_connection()
 
         query = text("SELECT review_id, review_embeddings FROM review_embeddings_table")
@@ -65,44 +88,194 @@ def retrieve_similar_embeddings(prompt_embedding, top_n=5):
             logger.warning("No embeddings found in review_embeddings table.")
             return []
 
-        # Compute cosine similarity
-        similarities = cosine_similarity([prompt_embedding], stored_embeddings)[0]
-        
-        # Get the top N similar embeddings
-        top_indices = np.argsort(similarities)[-top_n:][::-1]  # Descending order
-        similar_ids = [review_ids[i] for i in top_indices]
-        return similar_ids
+        return brute_force_top_n(prompt_embedding, stored_embeddings, review_ids, top_n)
     except Exception as e:
         logger.error(f"Error retrieving similar embeddings: {e}")
         return []
 
+def brute_force_top_n(prompt_embedding, stored_embeddings, review_ids, top_n=5):
+    """
+    Exact top N review IDs by cosine similarity. Used as ground truth for the ANN index.
+    """
+    from sklearn.metrics.pairwise import cosine_similarity
+
+    # Compute cosine similarity
+    similarities = cosine_similarity([prompt_embedding], stored_embeddings)[0]
+
+    # Get the top N similar embeddings
+    top_indices = np.argsort(similarities)[-top_n:][::-1]  # Descending order
+    return [review_ids[i] for i in top_indices]
+
+def expand_to_members(review_ids, filters=None, metadata_path=DEFAULT_METADATA_PATH, per_cluster=None):
+    """
+    Map retrieved canonical review IDs back to the reviews of their near-duplicate clusters
+    (review_duplicates), in rank order with each canonical first. With `filters`, only members
+    whose own metadata matches are kept, so a filtered search returns the copy that satisfies
+    the filter (e.g. the store B listing of a review syndicated from store A).
+    `per_cluster` caps the reviews kept per canonical.
+    """
+    from preprocessing.dedupe import cluster_members
+
+    members = cluster_members(review_ids)
+    expanded = []
+    for review_id in review_ids:
+        cluster = [review_id] + [member for member in members[review_id] if member != review_id]
+        if filters:
+            matching = get_metadata_index(metadata_path).matches(filters, cluster)
+            # Keep the canonical if the metadata no longer matches any member, rather than dropping the hit
+            cluster = [member for member, match in zip(cluster, matching) if match] or [review_id]
+        expanded.extend(cluster[:per_cluster])
+    return expanded
+
 
+def matching_members(similar_ids, filters, metadata_path=DEFAULT_METADATA_PATH):
+    """
+    Replace each filtered hit whose own metadata does not match `filters` with the member of its
+    near-duplicate cluster that does. Hits that match themselves need no database lookup.
+    """
+    if not filters:
+        return similar_ids
+    matches = get_metadata_index(metadata_path).matches(filters, similar_ids)
+    if matches.all():
+        return list(similar_ids)
+    # Only canonicals are indexed; these matched through one of their near-duplicates
+    unmatched = [review_id for review_id, match in zip(similar_ids, matches) if not match]
+    members = dict(zip(unmatched, expand_to_members(unmatched, filters, metadata_path, per_cluster=1)))
+    return [members.get(review_id, review_id) for review_id in similar_ids]
 
-def query_database_for_records(review_ids):
+@timed('similarity_search', backend='exact')
+def retrieve_similar_embeddings_from_store(prompt_embedding, top_n=5, store_path=DEFAULT_STORE_PATH,
+                                           filters=None, metadata_path=DEFAULT_METADATA_PATH):
     """
-    Query the database for records matching the given review IDs.
+    Retrieve similar review IDs with the resident exact index built from the vector store
+    (pre-normalized float32 matrix, one matmul and argpartition per query).
+    `filters` restricts the scan to reviews whose metadata matches (see MetadataIndex).
     """
     try:
-        if not review_ids:
-            logger.warning("No review IDs provided to query.")
+        index = get_exact_index(store_path)
+        if len(index) == 0:
+            logger.warning("No embeddings found in the vector store.")
             return []
+        rows = select_rows(filters, index.review_ids, metadata_path)
+        similar_ids, _ = index.search(prompt_embedding, top_k=top_n, rows=rows)
+        return matching_members(similar_ids, filters, metadata_path)
+    except Exception as e:
+        logger.error(f"Error retrieving similar embeddings from vector store: {e}")
+        return []
 
-        engine = get_database_connection()
+@timed('similarity_search', backend='exact_batch')
+def retrieve_similar_embeddings_batch(prompt_embeddings, top_n=5, store_path=DEFAULT_STORE_PATH,
+                                      filters=None, metadata_path=DEFAULT_METADATA_PATH):
+    """
+    Exact top N review IDs and scores for a batch of prompt embeddings, scored with one matmul per block.
+    `filters` applies to every prompt in the batch.
+    """
+    try:
+        index = get_exact_index(store_path)
+        rows = select_rows(filters, index.review_ids, metadata_path)
+        ids, scores = index.search(np.asarray(prompt_embeddings), top_k=top_n, rows=rows)
+        return [matching_members(query_ids, filters, metadata_path) for query_ids in ids], scores
+    except Exception as e:
+        logger.error(f"Error retrieving similar embeddings for batch: {e}")
+        return [[] for _ in prompt_embeddings], np.zeros((len(prompt_embeddings), 0), dtype=np.float32)
 
-        # Dynamically construct the placeholders for the IN clause
-        placeholders = ', '.join(f":id{i}" for i in range(len(review_ids)))
+@timed('similarity_search', backend='ann')
+def retrieve_similar_embeddings_ann(prompt_embedding, top_n=5, index_path=DEFAULT_INDEX_PATH, nprobe=None, rerank_k=None,
+                                    filters=None, metadata_path=DEFAULT_METADATA_PATH):
+    """
+    Retrieve similar review IDs from the resident IVF-PQ index instead of scanning the table.
+    nprobe and rerank_k trade latency for recall; None uses the index defaults.
+    `filters` is applied inside the list scan rather than to the returned results.
+    """
+    try:
+        index = get_ann_index(index_path)
+        rows = select_rows(filters, index.review_ids, metadata_path)
+        similar_ids, _ = index.search(prompt_embedding, top_n=top_n, nprobe=nprobe, rerank_k=rerank_k, rows=rows)
+        return matching_members(similar_ids, filters, metadata_path)
+    except Exception as e:
+        logger.error(f"Error retrieving similar embeddings from ANN index: {e}")
+        return []
 
-        # Updated query with correct column name (e.g., reviewId)
-        query = text(f"SELECT * FROM review_embeddings_table WHERE review_id IN ({placeholders})")
+@timed('similarity_search', backend='quantized')
+def retrieve_similar_embeddings_quantized(prompt_embedding, top_n=5, mode='int8', rescore_k=None, store_path=DEFAULT_STORE_PATH,
+                                          filters=None, metadata_path=DEFAULT_METADATA_PATH):
+    """
+    Retrieve similar review IDs by scanning int8 or binary codes of the vector store, then rescoring
+    the best rescore_k candidates with the float vectors on disk. rescore_k=0 returns the coarse ranking.
+    """
+    try:
+        index = get_quantized_index(store_path, mode)
+        rows = select_rows(filters, index.review_ids, metadata_path)
+        similar_ids, _ = index.search(prompt_embedding, top_k=top_n, rescore_k=rescore_k, rows=rows)
+        return matching_members(similar_ids, filters, metadata_path)
+    except Exception as e:
+        logger.error(f"Error retrieving similar embeddings from {mode} quantized index: {e}")
+        return []
 
-        # Map review IDs to parameter names
-        params = {f"id{i}": review_id for i, review_id in enumerate(review_ids)}
 
-        with engine.connect() as conn:
-            result = conn.execute(query, params)
-            records = result.fetchall()
+@timed('similarity_search', backend='bm25')
+def retrieve_similar_reviews_bm25(prompt, top_n=5, bm25_path=DEFAULT_BM25_PATH, filters=None, metadata_path=DEFAULT_METADATA_PATH):
+    """
+    Retrieve review IDs by BM25 keyword match on the cleaned review text. Suited to product
+    names, sizes and codes that the embedding model does not separate well.
+    """
+    try:
+        index = get_bm25_index(bm25_path)
+        rows = select_rows(filters, index.review_ids, metadata_path)
+        similar_ids, _ = index.search(prompt, top_k=top_n, rows=rows)
+        return matching_members(similar_ids, filters, metadata_path)
+    except Exception as e:
+        logger.error(f"Error retrieving reviews from BM25 index: {e}")
+        return []
 
-        return records
+def reciprocal_rank_fusion(rankings, top_n=5, k=60, weights=None):
+    """
+    Fuse ranked lists of review IDs: each list adds weight / (k + rank) to every ID it contains.
+    """
+    weights = weights or [1.0] * len(rankings)
+    fused = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, review_id in enumerate(ranking, start=1):
+            fused[review_id] = fused.get(review_id, 0.0) + weight / (k + rank)
+    return sorted(fused, key=fused.get, reverse=True)[:top_n]
+
+@timed('similarity_search', backend='hybrid')
+def retrieve_hybrid(prompt, prompt_embedding, top_n=5, candidate_k=50, store_path=DEFAULT_STORE_PATH,
+                    bm25_path=DEFAULT_BM25_PATH, filters=None, metadata_path=DEFAULT_METADATA_PATH, rrf_k=60):
+    """
+    Retrieve review IDs by fusing the top `candidate_k` BM25 and exact vector results with reciprocal rank fusion.
+    """
+    vector_ids = retrieve_similar_embeddings_from_store(prompt_embedding, candidate_k, store_path, filters, metadata_path)
+    keyword_ids = retrieve_similar_reviews_bm25(prompt, candidate_k, bm25_path, filters, metadata_path)
+    return reciprocal_rank_fusion([vector_ids, keyword_ids], top_n=top_n, k=rrf_k)
+
+
+@timed('hydration')
+def query_database_for_records(review_ids, columns=None):
+    """
+    Review records (dicts with review_text and the other review fields, or only `columns`) for the
+    given review IDs, in the same order. Served by the shared hydrator: hot reviews come from its
+    cache, the rest from the Parquet doc store or batched reads of processed_product_reviews.
+    """
+    try:
+        if not review_ids:
+            logger.warning("No review IDs provided to query.")
+            return []
+        return get_review_hydrator().get(list(review_ids), columns)
+    except Exception as e:
+        logger.error(f"Error querying database: {e}")
+        return []
+
+@timed('hydration', mode='async')
+async def query_database_for_records_async(review_ids, columns=None):
+    """
+    Async variant of query_database_for_records; database reads use the asyncio engine.
+    """
+    try:
+        if not review_ids:
+            logger.warning("No review IDs provided to query.")
+            return []
+        return await get_review_hydrator().get_async(list(review_ids), columns)
     except Exception as e:
         logger.error(f"Error querying database: {e}")
         return []
@@ -124,8 +297,8 @@ if __name__ == "__main__":
         logger.error("Prompt embedding generation failed. Exiting.")
         sys.exit(1)
 
-    # Retrieve similar embeddings from the review_embeddings table
-    similar_ids = retrieve_similar_embeddings(prompt_embedding)
+    # Retrieve similar embeddings from the resident ANN index
+    similar_ids = retrieve_similar_embeddings_ann(prompt_embedding)
     logger.info(f"Retrieved similar IDs: {similar_ids}")
 
     # Query the database for records corresponding to the similar review IDs
@@ -0,0 +1,242 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from monitoring.logging_config import setup_logging
+from monitoring.metrics import REGISTRY, SIZE_BUCKETS, observe, timed
+from vectorization.model_manager import DEFAULT_MODEL_NAME, LazyEmbeddingModel, fast_start_enabled, get_embedding_model, get_query_embedding_cache
+from retrieval.exact_search import get_exact_index
+from retrieval.metadata_filter import DEFAULT_METADATA_PATH, select_rows
+from retrieval.query_api import matching_members
+from vectorization.vector_store import DEFAULT_STORE_PATH
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger()
+
+
+class QueryService:
+    """
+    In-process retrieval service that micro-batches concurrent queries.
+
+    Requests are queued; a single batching task waits up to `max_wait_ms` after the first request
+    (or until `max_batch_size` requests are queued), encodes all prompts with one model.encode
+    call, scores them with one batched exact search and resolves each caller's future.
+
+    With `fast_start` (default: LLM_FAST_START) the model is not preloaded; it loads on the first
+    prompt that misses the query-embedding cache.
+    """
+
+    def __init__(self, index, encoder=None, model_name=DEFAULT_MODEL_NAME,
+                 max_batch_size=32, max_wait_ms=5.0, use_cache=True, metadata_path=DEFAULT_METADATA_PATH, fast_start=None):
+        self.index = index
+        self.fast_start = fast_start if fast_start is not None else fast_start_enabled()
+        self.metadata_path = metadata_path
+        self.encoder = encoder
+        self.model_name = model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.cache = get_query_embedding_cache(model_name) if use_cache and encoder is None else None
+        self.batch_sizes = []
+        self._queue = None
+        self._worker = None
+        self._batch = []
+
+    @classmethod
+    def from_vector_store(cls, store_path=DEFAULT_STORE_PATH, **kwargs):
+        return cls(get_exact_index(store_path), **kwargs)
+
+    async def start(self):
+        if self.encoder is None and self.fast_start:
+            self.encoder = LazyEmbeddingModel(self.model_name)
+        elif self.encoder is None:
+            # Load the model up front so the first request doesn't pay for it
+            self.encoder = await asyncio.get_running_loop().run_in_executor(None, get_embedding_model, self.model_name)
+        self._queue = asyncio.Queue()
+        self._worker = asyncio.create_task(self._batch_loop())
+        logger.info(f"Query service started over {len(self.index)} reviews "
+                    f"(max_batch_size={self.max_batch_size}, max_wait_ms={self.max_wait * 1000:.1f}).")
+
+    async def stop(self):
+        """
+        Stop the batching task. Requests still queued or in the batch being processed fail with
+        RuntimeError instead of waiting forever.
+        """
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+            pending = [future for *_, future in self._batch]
+            while not self._queue.empty():
+                pending.append(self._queue.get_nowait()[-1])
+            self._batch = []
+            for future in pending:
+                if not future.done():
+                    future.set_exception(RuntimeError("Query service stopped."))
+
+    async def query(self, prompt, top_n=5, filters=None):
+        """
+        Return (review_ids, scores) of the top_n reviews most similar to `prompt`,
+        restricted to reviews whose metadata matches `filters` when given.
+        """
+        if self._worker is None:
+            raise RuntimeError("Query service is not running.")
+        with timed('query_service_request'):
+            future = asyncio.get_running_loop().create_future()
+            await self._queue.put((prompt, top_n, filters, future))
+            return await future
+
+    async def _batch_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Kept on the service so stop() can fail the requests of a cancelled batch
+            self._batch = batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            self.batch_sizes.append(len(batch))
+            observe('query_batch_size', len(batch), SIZE_BUCKETS)
+            try:
+                # Encoding and scoring release the GIL; keep them off the event loop
+                results = await loop.run_in_executor(None, self._process_batch, batch)
+                for (*_, future), result in zip(batch, results):
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+            except Exception as e:
+                logger.error(f"Error processing query batch: {e}")
+                for *_, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _encode(self, prompts):
+        embeddings = [self.cache.get(prompt) if self.cache is not None else None for prompt in prompts]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            encoded = np.asarray(self.encoder.encode([prompts[i] for i in missing], batch_size=len(missing)), dtype=np.float32)
+            for i, embedding in zip(missing, encoded):
+                embeddings[i] = embedding
+                if self.cache is not None:
+                    self.cache.put(prompts[i], embedding)
+        return np.vstack(embeddings)
+
+    @timed('query_batch')
+    def _process_batch(self, batch):
+        queries = self._encode([prompt for prompt, *_ in batch])
+        results = [None] * len(batch)
+        unfiltered = [i for i, (_, _, filters, _) in enumerate(batch) if not filters]
+        if unfiltered:
+            # One search at the largest requested top_n, then trim per request
+            max_top_n = max(batch[i][1] for i in unfiltered)
+            ids, scores = self.index.search(queries[unfiltered], top_k=max_top_n)
+            for row, i in enumerate(unfiltered):
+                top_n = batch[i][1]
+                results[i] = (ids[row][:top_n], scores[row][:top_n].tolist())
+        for i, (_, top_n, filters, _) in enumerate(batch):
+            if filters:
+                # Filtered requests scan only their own matching rows; a bad filter fails only its own request
+                try:
+                    rows = select_rows(filters, self.index.review_ids, self.metadata_path)
+                    ids, scores = self.index.search(queries[i], top_k=top_n, rows=rows)
+                    # A canonical may have matched through a near-duplicate; return that member
+                    results[i] = (matching_members(ids, filters, self.metadata_path), scores.tolist())
+                except Exception as e:
+                    results[i] = e
+        return results
+
+
+async def _handle_http(service, reader, writer):
+    """
+    Minimal HTTP/1.1 handler: POST /query with {"prompt": ..., "top_n": 5, "filters": {...}}, GET /health
+    and GET /metrics (Prometheus text, or JSON with ?format=json).
+    """
+    try:
+        request_line = (await reader.readline()).decode('latin-1').split()
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        body = await reader.readexactly(int(headers.get('content-length', 0)))
+
+        if len(request_line) >= 2 and request_line[0] == 'GET' and request_line[1] == '/health':
+            status, payload = '200 OK', {'status': 'ok'}
+        elif len(request_line) >= 2 and request_line[0] == 'GET' and request_line[1].split('?')[0] == '/metrics':
+            # Prometheus text exposition, or the JSON snapshot with ?format=json
+            status = '200 OK'
+            payload = REGISTRY.to_json() if request_line[1].endswith('format=json') else REGISTRY.to_prometheus()
+        elif len(request_line) >= 2 and request_line[0] == 'POST' and request_line[1] == '/query':
+            request = json.loads(body or b'{}')
+            start = time.perf_counter()
+            review_ids, scores = await service.query(request['prompt'], int(request.get('top_n', 5)), request.get('filters'))
+            status, payload = '200 OK', {'review_ids': review_ids, 'scores': scores,
+                                         'latency_ms': (time.perf_counter() - start) * 1000}
+        else:
+            status, payload = '404 Not Found', {'error': 'not found'}
+    except (KeyError, ValueError) as e:
+        status, payload = '400 Bad Request', {'error': str(e)}
+    except Exception as e:
+        logger.error(f"Error handling request: {e}")
+        status, payload = '500 Internal Server Error', {'error': 'internal error'}
+
+    if isinstance(payload, str):
+        data, content_type = payload.encode('utf-8'), 'text/plain; version=0.0.4'
+    else:
+        data, content_type = json.dumps(payload).encode('utf-8'), 'application/json'
+    writer.write(f"HTTP/1.1 {status}\r\nContent-Type: {content_type}\r\nContent-Length: {len(data)}\r\n"
+                 f"Connection: close\r\n\r\n".encode('latin-1') + data)
+    await writer.drain()
+    writer.close()
+
+
+async def serve(host='127.0.0.1', port=8080, store_path=DEFAULT_STORE_PATH, max_batch_size=32, max_wait_ms=5.0, fast_start=None):
+    """
+    Run the query service behind a local HTTP endpoint until cancelled.
+    """
+    service = QueryService.from_vector_store(store_path, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms,
+                                             fast_start=fast_start)
+    await service.start()
+    server = await asyncio.start_server(lambda r, w: _handle_http(service, r, w), host, port)
+    logger.info(f"Serving queries on http://{host}:{port}/query")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Serve batched similarity queries over HTTP.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--store-path', default=DEFAULT_STORE_PATH)
+    parser.add_argument('--max-batch-size', type=int, default=32)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--fast-start', action='store_true', default=None,
+                        help="Don't preload the model; serve cached prompts until one needs encoding")
+    parser.add_argument('--log-file', default='project_log.log', help="Rotated log file, written from a background thread")
+    args = parser.parse_args()
+    setup_logging(log_file=args.log_file)
+    asyncio.run(serve(args.host, args.port, args.store_path, args.max_batch_size, args.max_wait_ms, args.fast_start))
@@ -1,38 +1,250 @@
+import hashlib
+import os
+import sys
+import threading
 import warnings
-from transformers import pipeline
+from collections import OrderedDict
 import logging
 
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from monitoring.logging_config import LazyRepr, get_sampled_logger
+from monitoring.metrics import count, stage
+from preprocessing.cleaning_engine import clean_text_fast
+from retrieval.summarizer_backend import get_summarizer
+
 # Suppress the warning for max_length mismatch
 warnings.filterwarnings("ignore", category=UserWarning, message=".*max_length.*")
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+request_logger = get_sampled_logger('retrieval.requests', max_per_second=10)
+
+PROMPT_TEMPLATE = "Context: {context}\n\nQuestion: {query}\n\nAnswer:"
+# Reviews sharing at least this fraction of their words with a kept review are treated as duplicates
+DUPLICATE_THRESHOLD = 0.9
+# A review is only truncated into the remaining budget if at least this many tokens still fit
+MIN_TRUNCATED_TOKENS = 32
+DEFAULT_RESPONSE_CACHE_SIZE = 1024
+
+class ResponseCache:
+    """
+    Bounded LRU cache of generated answers keyed on (hash of the exact model input, model, generation params).
+    """
+
+    def __init__(self, max_size=DEFAULT_RESPONSE_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(input_text, model_name, generation_params):
+        # The model is cased and sees the context in order, truncation included: key on the exact input
+        return (hashlib.sha256(input_text.encode('utf-8')).hexdigest(), model_name, tuple(sorted(generation_params.items())))
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                count('cache_requests', cache='response', result='miss')
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            count('cache_requests', cache='response', result='hit')
+            return self._entries[key]
+
+    def put(self, key, response):
+        with self._lock:
+            self._entries[key] = response
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'size': len(self), 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0}
+
+
+_response_cache = ResponseCache()
+
+
+def get_response_cache():
+    """
+    The process-wide response cache used by generate_summary_or_response and generate.
+    """
+    return _response_cache
+
+
+def _model_name(summarizer_model):
+    if isinstance(getattr(summarizer_model, 'name', None), str):
+        return summarizer_model.name
+    model = getattr(summarizer_model, 'model', None)
+    return getattr(getattr(model, 'config', None), 'name_or_path', None) or getattr(model, 'name_or_path', None) or type(summarizer_model).__name__
+
+
+def _token_lengths(tokenizer, texts):
+    if tokenizer is None:
+        return [len(text.split()) for text in texts]
+    if not texts:
+        return []
+    return [len(ids) for ids in tokenizer(list(texts), add_special_tokens=False)['input_ids']]
+
+
+def _truncate(tokenizer, text, max_tokens):
+    if tokenizer is None:
+        return ' '.join(text.split()[:max_tokens])
+    ids = tokenizer(text, add_special_tokens=False)['input_ids'][:max_tokens]
+    return tokenizer.decode(ids, skip_special_tokens=True)
 
-def generate_summary_or_response(retrieved_records, query, summarizer_model):
+
+def _dedupe(records, text_field, threshold=DUPLICATE_THRESHOLD):
+    """
+    Drop records whose cleaned text shares at least `threshold` of its words (Jaccard) with an earlier record.
+    """
+    kept, kept_words = [], []
+    for record in records:
+        words = set(clean_text_fast(record.get(text_field) or '').split())
+        if any(len(words & other) >= threshold * len(words | other) for other in kept_words):
+            continue
+        kept.append(record)
+        kept_words.append(words)
+    return kept
+
+
+def pack_context(retrieved_records, query, tokenizer=None, max_input_tokens=1024, scores=None, text_field='review_text'):
+    """
+    Return the records that fit the model's input budget, best first, with the last one possibly truncated.
+
+    Records are ordered by `scores` (highest first) when given, otherwise taken in retrieval order.
+    Near-duplicates are removed first, and the budget is `max_input_tokens` minus the tokens of the
+    prompt template and query, so the lowest-scoring reviews are the ones dropped or truncated.
+    """
+    if scores is not None:
+        # Pair each record with its score before dropping the ones without text
+        pairs = [(record, score) for record, score in zip(retrieved_records, scores) if record.get(text_field)]
+        records = [record for record, _ in sorted(pairs, key=lambda pair: -pair[1])]
+    else:
+        records = [record for record in retrieved_records if record.get(text_field)]
+    records = _dedupe(records, text_field)
+
+    overhead = _token_lengths(tokenizer, [PROMPT_TEMPLATE.format(context='', query=query)])[0] + 2  # BOS/EOS
+    budget = max_input_tokens - overhead
+    packed = []
+    for record, length in zip(records, _token_lengths(tokenizer, [record[text_field] for record in records])):
+        if length <= budget:
+            packed.append(record)
+            budget -= length + 1  # Joining space
+        else:
+            if budget >= MIN_TRUNCATED_TOKENS:
+                packed.append({**record, text_field: _truncate(tokenizer, record[text_field], budget)})
+            break
+    return packed
+
+
+def _prepare(retrieved_records, query, summarizer_model, max_input_tokens, scores, text_field):
+    """
+    (model input text, generation params, cache key) for one query.
+    """
+    tokenizer = getattr(summarizer_model, 'tokenizer', None)
+    if max_input_tokens is None:
+        max_input_tokens = min(getattr(tokenizer, 'model_max_length', 1024), 1024)
+    packed = pack_context(retrieved_records, query, tokenizer, max_input_tokens, scores, text_field)
+    context = " ".join(record[text_field] for record in packed)
+    input_text = PROMPT_TEMPLATE.format(context=context, query=query)
+
+    # Calculate the length of the input and adjust max_length based on it
+    input_length = _token_lengths(tokenizer, [input_text])[0]
+    max_length = min(40, input_length + 50)  # Lower the max_length to a more reasonable value
+    min_length = max(10, min(max_length - 10, 50))  # Ensure min_length is valid
+    params = {'max_length': max_length, 'min_length': min_length, 'do_sample': False}
+
+    key = ResponseCache.make_key(input_text, _model_name(summarizer_model), params)
+    return input_text, params, key
+
+
+def generate_summary_or_response(retrieved_records, query, summarizer_model, max_input_tokens=None,
+                                 scores=None, text_field='review_text', use_cache=True):
     """
     Use retrieved records to generate a response or summary.
+
+    The context is packed to the model's token budget (see pack_context), and answers are cached
+    on the exact model input, the model and the generation parameters.
     """
     try:
-        # Combine retrieved records as context
-        context = " ".join([record['review_text'] for record in retrieved_records])  # Adjust field as needed
-        input_text = f"Context: {context}\n\nQuestion: {query}\n\nAnswer:"
-
-        # Calculate the length of the input and adjust max_length based on it
-        input_length = len(input_text.split())
-        max_length = min(40, input_length + 50)  # Lower the max_length to a more reasonable value
-        min_length = max(10, min(max_length - 10, 50))  # Ensure min_length is valid
+        input_text, params, key = _prepare(retrieved_records, query, summarizer_model, max_input_tokens, scores, text_field)
+        if use_cache:
+            cached = _response_cache.get(key)
+            if cached is not None:
+                request_logger.info("Serving cached response.")
+                return cached
 
         # Generate a summary or answer with dynamic max_length
-        response = summarizer_model(input_text, max_length=max_length, min_length=min_length, do_sample=False)
+        with stage('generation', rows=1):
+            response = summarizer_model(input_text, truncation=True, **params)
 
         # Log the generated response
-        logger.info(f"Generated response: {response[0]['summary_text']}")
+        request_logger.info("Generated response: %s", LazyRepr(response[0]['summary_text']))
+        if use_cache:
+            _response_cache.put(key, response[0]['summary_text'])
         return response[0]['summary_text']
     except Exception as e:
         logger.error(f"Error generating response: {e}")
         return "Sorry, I could not generate a response."
 
+
+def generate(requests, summarizer_model, batch_size=8, max_input_tokens=None, text_field='review_text', use_cache=True):
+    """
+    Answer many (query, retrieved_records) pairs. Cached answers are reused and the rest go through
+    the pipeline in batched calls, one per distinct set of generation parameters.
+    Returns the responses in request order.
+    """
+    responses = [None] * len(requests)
+    pending = {}
+    for i, (query, retrieved_records) in enumerate(requests):
+        try:
+            input_text, params, key = _prepare(retrieved_records, query, summarizer_model, max_input_tokens, None, text_field)
+        except Exception as e:
+            logger.error(f"Error preparing request {i}: {e}")
+            responses[i] = "Sorry, I could not generate a response."
+            continue
+        cached = _response_cache.get(key) if use_cache else None
+        if cached is not None:
+            responses[i] = cached
+        else:
+            # Identical requests in one call are generated once
+            pending.setdefault(tuple(sorted(params.items())), {}).setdefault(key, (input_text, []))[1].append(i)
+
+    for params, by_key in pending.items():
+        keys = list(by_key)
+        try:
+            with stage('generation', rows=len(keys)):
+                outputs = summarizer_model([by_key[key][0] for key in keys], batch_size=batch_size, truncation=True, **dict(params))
+        except Exception as e:
+            logger.error(f"Error generating batch of {len(keys)} responses: {e}")
+            outputs = [[{'summary_text': "Sorry, I could not generate a response."}]] * len(keys)
+            use_batch_cache = False
+        else:
+            use_batch_cache = use_cache
+        for key, output in zip(keys, outputs):
+            # The pipeline returns a dict per input, or a one-element list of dicts
+            text = (output[0] if isinstance(output, list) else output)['summary_text']
+            if use_batch_cache:
+                _response_cache.put(key, text)
+            for i in by_key[key][1]:
+                responses[i] = text
+    return responses
+
 # Example script usage
 if __name__ == "__main__":
     # Example data, replace with actual retrieved records
@@ -41,9 +253,15 @@ if __name__ == "__main__":
                          {"review_text": "Build quality is poor."}, 
                          {"review_text": "Customer support is unresponsive."}, 
                          {"review_text": "The product overheats during use."}] 
-    # Load or initialize your summarization model (e.g., HuggingFace pipeline)
-    summarizer_model = pipeline("summarization", model="facebook/bart-large-cnn")
+    # Load the summarizer once per worker; set LLM_SUMMARIZER_MODEL / LLM_SUMMARIZER_QUANTIZE / LLM_SUMMARIZER_THREADS to tune it
+    summarizer_model = get_summarizer()
     
     # Generate a response
     response = generate_summary_or_response(retrieved_records, query, summarizer_model)
     print(f"Final Generated Response: {response}")
+
+    # Or stream the answer as it is generated
+    input_text = PROMPT_TEMPLATE.format(context=" ".join(record['review_text'] for record in retrieved_records), query=query)
+    for piece in summarizer_model.stream(input_text, max_length=40, min_length=30):
+        print(piece, end='', flush=True)
+    print()
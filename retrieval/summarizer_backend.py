@@ -0,0 +1,143 @@
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SUMMARIZER_MODEL = 'facebook/bart-large-cnn'
+# Distilled BART fine-tuned on the same data: about half the decoder layers, similar output
+DISTILLED_SUMMARIZER_MODEL = 'sshleifer/distilbart-cnn-12-6'
+
+# Environment overrides for serving nodes; the model may be a hub name or a local directory
+MODEL_ENV = 'LLM_SUMMARIZER_MODEL'
+QUANTIZE_ENV = 'LLM_SUMMARIZER_QUANTIZE'
+THREADS_ENV = 'LLM_SUMMARIZER_THREADS'
+
+# Backends already loaded in this process, keyed by (model, quantize)
+_backends = {}
+_lock = threading.Lock()
+
+
+class SummarizerBackend:
+    """
+    Seq2seq summarizer for CPU serving, callable like a transformers summarization pipeline.
+
+    `quantize=True` applies torch dynamic int8 quantization to every nn.Linear (weights stored as
+    int8, activations quantized on the fly), which cuts the model's memory roughly in half to a
+    quarter and speeds up CPU matmuls. `num_threads` sets torch's intra-op thread count. A local
+    directory is loaded with local_files_only, so a distilled checkpoint can be swapped in offline.
+    """
+
+    def __init__(self, model_name_or_path=DEFAULT_SUMMARIZER_MODEL, quantize=False, num_threads=None, max_input_tokens=1024):
+        self.model_name_or_path = model_name_or_path
+        self.quantize = quantize
+        self.num_threads = num_threads
+        self.max_input_tokens = max_input_tokens
+        self.model = None
+        self.tokenizer = None
+
+    @property
+    def name(self):
+        # Quantized output can differ slightly, so it is cached separately
+        return f"{self.model_name_or_path}+int8" if self.quantize else self.model_name_or_path
+
+    def load(self):
+        import torch
+        from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+        start_time = time.perf_counter()
+        if self.num_threads:
+            torch.set_num_threads(self.num_threads)
+        local_only = os.path.isdir(self.model_name_or_path)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_name_or_path, local_files_only=local_only)
+        model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name_or_path, local_files_only=local_only)
+        model.eval()
+        if self.quantize:
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        self.max_input_tokens = min(self.max_input_tokens, self.tokenizer.model_max_length)
+        logger.info(f"Loaded summarizer {self.model_name_or_path} (quantize={self.quantize}, "
+                    f"threads={torch.get_num_threads()}) in {time.perf_counter() - start_time:.1f}s.")
+        return self
+
+    def _encode(self, texts):
+        return self.tokenizer(texts, return_tensors='pt', padding=True, truncation=True, max_length=self.max_input_tokens,
+                              return_token_type_ids=False)
+
+    def __call__(self, inputs, batch_size=8, truncation=True, **generation_params):
+        """
+        Summarize a string or a list of strings. Returns [{'summary_text': ...}] per input,
+        like the summarization pipeline. Inputs are always truncated to the model's input limit.
+        """
+        import torch
+
+        texts = [inputs] if isinstance(inputs, str) else list(inputs)
+        outputs = []
+        with torch.inference_mode():
+            for start in range(0, len(texts), batch_size):
+                encoded = self._encode(texts[start:start + batch_size])
+                generated = self.model.generate(**encoded, **generation_params)
+                outputs.extend(self.tokenizer.batch_decode(generated, skip_special_tokens=True, clean_up_tokenization_spaces=True))
+        return [{'summary_text': text.strip()} for text in outputs]
+
+    def stream(self, input_text, **generation_params):
+        """
+        Yield the summary of one input incrementally, as decoded text pieces, while it is generated.
+        """
+        import torch
+        from transformers import TextIteratorStreamer
+
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        encoded = self._encode([input_text])
+
+        errors = []
+
+        def run():
+            try:
+                with torch.inference_mode():
+                    self.model.generate(**encoded, streamer=streamer, **generation_params)
+            except Exception as e:
+                errors.append(e)
+                # generate() ends the streamer only when it finishes; unblock the caller's loop
+                streamer.end()
+
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        yield from streamer
+        worker.join()
+        if errors:
+            raise errors[0]
+
+    def parameter_bytes(self):
+        """
+        Bytes held by the model's parameters and buffers, including packed int8 weights.
+        """
+        import torch
+
+        total = sum(t.numel() * t.element_size() for t in list(self.model.parameters()) + list(self.model.buffers()))
+        for module in self.model.modules():
+            if isinstance(module, torch.ao.nn.quantized.dynamic.Linear):
+                weight, bias = module._weight_bias()
+                total += weight.numel() * weight.element_size() + (bias.numel() * bias.element_size() if bias is not None else 0)
+        return total
+
+
+def get_summarizer(model_name_or_path=None, quantize=None, num_threads=None):
+    """
+    Return the process-wide summarizer, loading it once per worker. Unset arguments come from
+    LLM_SUMMARIZER_MODEL, LLM_SUMMARIZER_QUANTIZE (1/true) and LLM_SUMMARIZER_THREADS.
+    """
+    model_name_or_path = model_name_or_path or os.environ.get(MODEL_ENV) or DEFAULT_SUMMARIZER_MODEL
+    if quantize is None:
+        quantize = os.environ.get(QUANTIZE_ENV, '').lower() in ('1', 'true', 'yes')
+    if num_threads is None and os.environ.get(THREADS_ENV):
+        num_threads = int(os.environ[THREADS_ENV])
+    key = (model_name_or_path, quantize)
+    backend = _backends.get(key)
+    if backend is not None:
+        return backend
+    with _lock:
+        if key not in _backends:
+            _backends[key] = SummarizerBackend(model_name_or_path, quantize, num_threads).load()
+        return _backends[key]
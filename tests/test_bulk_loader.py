@@ -0,0 +1,75 @@
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, inspect
+
+from ingestion.bulk_loader import bulk_load
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine('sqlite://')
+    yield engine
+    engine.dispose()
+
+
+def frame(ids, texts):
+    return pd.DataFrame({'review_hash_id': ids, 'review_text': texts})
+
+
+def read(engine, table='reviews'):
+    return pd.read_sql(f"SELECT * FROM {table} ORDER BY review_hash_id", engine)
+
+
+def test_replace_swaps_in_the_new_rows(engine):
+    assert bulk_load(frame(['a', 'b'], ['old a', 'old b']), 'reviews', engine) == 2
+    chunks = iter([frame(['c'], ['new c']), frame(['d'], ['new d'])])
+    assert bulk_load(chunks, 'reviews', engine, mode='replace', chunksize=1) == 2
+    assert read(engine)['review_hash_id'].tolist() == ['c', 'd']
+    assert not inspect(engine).has_table('reviews__staging')
+
+
+@pytest.mark.parametrize('strategy', ['executemany', 'multi', 'fast_executemany'])
+def test_append_adds_rows(engine, strategy):
+    bulk_load(frame(['a'], ['first']), 'reviews', engine)
+    assert bulk_load(frame(['b', 'c'], ['second', 'third']), 'reviews', engine, mode='append', strategy=strategy) == 2
+    assert read(engine)['review_hash_id'].tolist() == ['a', 'b', 'c']
+
+
+def test_merge_replaces_matching_keys(engine):
+    bulk_load(frame(['a', 'b'], ['old a', 'old b']), 'reviews', engine)
+    bulk_load(frame(['b', 'c'], ['new b', 'new c']), 'reviews', engine, mode='merge', key_columns=['review_hash_id'])
+    assert read(engine)['review_text'].tolist() == ['old a', 'new b', 'new c']
+
+
+def test_append_and_merge_create_a_missing_target(engine):
+    bulk_load(frame(['a'], ['first']), 'reviews', engine, mode='merge', key_columns=['review_hash_id'])
+    bulk_load(frame(['b'], ['second']), 'other', engine, mode='append')
+    assert len(read(engine)) == 1 and len(read(engine, 'other')) == 1
+
+
+def test_replace_with_an_empty_frame_empties_the_table(engine):
+    bulk_load(frame(['a', 'b'], ['old a', 'old b']), 'reviews', engine)
+    assert bulk_load(frame([], []), 'reviews', engine) == 0
+    assert read(engine).empty
+    assert [column['name'] for column in inspect(engine).get_columns('reviews')] == ['review_hash_id', 'review_text']
+
+
+def test_replace_with_an_empty_iterator_empties_the_table(engine):
+    bulk_load(frame(['a'], ['old a']), 'reviews', engine)
+    assert bulk_load(iter([]), 'reviews', engine) == 0
+    assert read(engine).empty
+
+
+def test_append_with_no_rows_keeps_the_table(engine):
+    bulk_load(frame(['a'], ['old a']), 'reviews', engine)
+    assert bulk_load(iter([]), 'reviews', engine, mode='append') == 0
+    assert read(engine)['review_hash_id'].tolist() == ['a']
+
+
+def test_invalid_arguments_raise(engine):
+    with pytest.raises(ValueError):
+        bulk_load(frame(['a'], ['x']), 'reviews', engine, mode='upsert')
+    with pytest.raises(ValueError):
+        bulk_load(frame(['a'], ['x']), 'reviews', engine, mode='merge')
+    with pytest.raises(ValueError):
+        bulk_load(frame(['a'], ['x']), 'reviews', engine, strategy='bcp')
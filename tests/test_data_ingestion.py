@@ -0,0 +1,25 @@
+import pandas as pd
+from sqlalchemy import create_engine, inspect
+
+from ingestion.data_ingestion import apply_schema, ingest_reviews
+
+
+def test_integer_columns_have_the_same_type_in_every_chunk():
+    complete = apply_schema(pd.DataFrame({'review_rating': ['5', '3'], 'helpful_review_count': ['1', '2']}, dtype=object))
+    with_gaps = apply_schema(pd.DataFrame({'review_rating': [None, '4'], 'helpful_review_count': ['40000', None]}, dtype=object))
+    assert complete.dtypes.to_dict() == with_gaps.dtypes.to_dict() == {'review_rating': 'Int8', 'helpful_review_count': 'Int32'}
+    assert with_gaps['helpful_review_count'].tolist() == [40000, pd.NA]
+
+
+def test_ingest_reviews_streams_chunks_into_one_table(tmp_path):
+    path = tmp_path / 'reviews.jsonl'
+    path.write_text('{"review_hash_id": "a", "brand": "Dove", "review_rating": 5, "helpful_review_count": 0}\n'
+                    '{"review_hash_id": "b", "brand": "Knorr", "review_rating": null, "helpful_review_count": 40000}\n'
+                    '{"review_hash_id": "c", "brand": "Dove", "review_rating": 2}\n')
+    engine = create_engine(f"sqlite:///{tmp_path / 'reviews.db'}")
+
+    stats = ingest_reviews(str(path), 'product_reviews', engine, chunk_size=1)
+    assert stats['rows'] == 3
+    rows = pd.read_sql('SELECT review_hash_id, review_rating, helpful_review_count FROM product_reviews ORDER BY review_hash_id', engine)
+    assert rows['helpful_review_count'].tolist()[1] == 40000
+    assert {column['name'] for column in inspect(engine).get_columns('product_reviews')} >= {'brand', 'review_rating'}
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+
+import pytest
+from sqlalchemy import text
+
+from ingestion import database_setup
+from ingestion.database_setup import (InstrumentedQueuePool, dispose_engines, get_engine, get_pool_metrics,
+                                      load_database_config)
+
+
+@pytest.fixture(autouse=True)
+def sqlite_env(monkeypatch):
+    for name in list(os.environ):
+        if name.startswith('LLM_DB_'):
+            monkeypatch.delenv(name)
+    monkeypatch.setenv('LLM_DB_URL', 'sqlite://')
+    dispose_engines()
+    yield
+    dispose_engines()
+
+
+def test_engine_is_shared_per_role():
+    read = get_engine('read')
+    assert get_engine('read') is read
+    assert get_engine('write') is not read
+    assert database_setup.get_database_connection() is read
+
+
+def test_unknown_role_raises():
+    with pytest.raises(ValueError):
+        get_engine('admin')
+
+
+def test_environment_overrides_json_config(tmp_path, monkeypatch):
+    config_path = tmp_path / 'db.json'
+    config_path.write_text(json.dumps({'url': 'sqlite:///from_file.db', 'database': 'FileDB',
+                                       'roles': {'read': {'pool_size': 3, 'max_overflow': 1}}}))
+    monkeypatch.setenv('LLM_DB_CONFIG', str(config_path))
+    monkeypatch.setenv('LLM_DB_READ_POOL_SIZE', '7')
+
+    config = load_database_config()
+    assert config['url'] == 'sqlite://'
+    assert config['database'] == 'FileDB'
+    assert config['roles']['read']['pool_size'] == 7
+    assert config['roles']['read']['max_overflow'] == 1
+    assert config['roles']['write'] == database_setup.DEFAULT_ROLE_SETTINGS['write']
+
+
+def test_json_config_used_without_environment(tmp_path, monkeypatch):
+    monkeypatch.delenv('LLM_DB_URL')
+    config_path = tmp_path / 'db.json'
+    config_path.write_text(json.dumps({'url': 'sqlite:///from_file.db'}))
+    assert load_database_config(str(config_path))['url'] == 'sqlite:///from_file.db'
+
+
+def test_pool_metrics_count_checkouts(tmp_path, monkeypatch):
+    # A file database gets the instrumented pool; in-memory SQLite has no pool sizing
+    monkeypatch.setenv('LLM_DB_URL', f"sqlite:///{tmp_path / 'metrics.db'}")
+    engine = get_engine('read')
+    assert isinstance(engine.pool, InstrumentedQueuePool)
+    for _ in range(3):
+        with engine.connect() as connection:
+            connection.execute(text('SELECT 1'))
+
+    stats = get_pool_metrics()['read']
+    assert stats['checked_out'] == 0
+    assert stats['timeouts'] == 0
+    assert stats['checkouts'] == 3
+    assert stats['wait_seconds_total'] >= stats['wait_seconds_max'] >= 0.0
+    assert stats['wait_seconds_avg'] == pytest.approx(stats['wait_seconds_total'] / stats['checkouts'])
+
+
+def test_pool_metrics_in_memory_engine():
+    get_engine('read')
+    assert set(get_pool_metrics()['read']) == {'status'}
+
+
+def test_dispose_engines_forgets_engines():
+    read = get_engine('read')
+    dispose_engines()
+    assert get_pool_metrics() == {}
+    assert get_engine('read') is not read
+
+
+def test_async_engine_is_shared_and_queries_sqlite():
+    from ingestion.database_setup import get_async_engine
+
+    engine = get_async_engine('read')
+    assert get_async_engine('read') is engine
+    assert engine.url.drivername == 'sqlite+aiosqlite'
+
+    async def select_one():
+        async with engine.connect() as connection:
+            return (await connection.execute(text('SELECT 1'))).scalar()
+
+    try:
+        assert asyncio.run(select_one()) == 1
+    finally:
+        asyncio.run(engine.dispose())
+    dispose_engines()
+    assert get_async_engine('read') is not engine
+
+
+def test_async_hydration_reads_through_async_engine(tmp_path, monkeypatch):
+    from ingestion.database_setup import get_async_engine
+    from retrieval.hydration import ReviewHydrator
+
+    monkeypatch.setenv('LLM_DB_URL', f"sqlite:///{tmp_path / 'reviews.db'}")
+    with get_engine('write').begin() as connection:
+        connection.execute(text('CREATE TABLE processed_product_reviews (review_hash_id TEXT, review_text TEXT)'))
+        connection.execute(text("INSERT INTO processed_product_reviews VALUES ('a', 'first'), ('b', 'second')"))
+
+    hydrator = ReviewHydrator(doc_store_path=None)
+    try:
+        records = asyncio.run(hydrator.get_async(['b', 'missing', 'a'], ['review_text']))
+    finally:
+        asyncio.run(get_async_engine().dispose())
+    assert records == [{'review_hash_id': 'b', 'review_text': 'second'}, {'review_hash_id': 'a', 'review_text': 'first'}]
+    assert hydrator.stats()['misses'] == 3
@@ -0,0 +1,46 @@
+import numpy as np
+
+from retrieval.exact_search import ExactSearchIndex, get_exact_index, prebuild_exact_index
+from vectorization.vector_store import VectorStore
+
+
+def _fill(path, seed, rows=64, dim=8):
+    vectors = np.random.default_rng(seed).standard_normal((rows, dim)).astype(np.float32)
+    store = VectorStore.create(str(path), dim=dim, overwrite=True)
+    store.append([f"r{i}" for i in range(rows)], vectors)
+    return vectors
+
+
+def test_prebuilt_index_round_trip(tmp_path):
+    vectors = _fill(tmp_path, seed=0)
+    prebuild_exact_index(str(tmp_path))
+    index = ExactSearchIndex.load(str(tmp_path))
+    assert index is not None
+    assert index.search(vectors[7], top_k=1)[0] == ['r7']
+
+
+def test_prebuilt_index_ignored_after_store_is_recreated(tmp_path):
+    _fill(tmp_path, seed=0)
+    prebuild_exact_index(str(tmp_path))
+    # Same row count, new vectors: the old prebuilt matrix must not be used
+    vectors = _fill(tmp_path, seed=1)
+    assert ExactSearchIndex.load(str(tmp_path)) is None
+    assert get_exact_index(str(tmp_path)).search(vectors[7], top_k=1)[0] == ['r7']
+
+
+def test_sharded_search_follows_store_changes(tmp_path):
+    from retrieval.exact_search import ShardedExactSearch
+
+    store = VectorStore.create(str(tmp_path), dim=8)
+    search = ShardedExactSearch(str(tmp_path), n_workers=2)
+    try:
+        assert search.search(np.ones(8, dtype=np.float32), top_k=3)[0] == []
+
+        vectors = np.random.default_rng(0).standard_normal((10, 8)).astype(np.float32)
+        store.append([f"r{i}" for i in range(10)], vectors)
+        assert search.search(vectors[7], top_k=1)[0] == ['r7']
+
+        store.delete(['r7'])
+        assert 'r7' not in search.search(vectors[7], top_k=3)[0]
+    finally:
+        search.close()
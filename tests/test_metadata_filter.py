@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import text
+
+from ingestion import database_setup
+from retrieval.metadata_filter import MetadataIndex, build_metadata_index, select_rows
+
+REVIEWS = pd.DataFrame({
+    'review_hash_id': ['a', 'a2', 'b', 'c'],
+    'online_store': ['STORE_A', 'STORE_B', 'STORE_A', 'STORE_B'],
+    'review_rating': [5, 4, 2, 1],
+    'review_date': ['02-01-2019', '03-01-2019', '01-06-2019', '15-12-2019'],
+})
+# a2 is a near-duplicate of a, so only a, b and c are indexed
+MAPPING = pd.DataFrame({'review_hash_id': ['a', 'a2', 'b', 'c'], 'canonical_review_hash_id': ['a', 'a', 'b', 'c']})
+INDEXED = np.array(['c', 'a', 'b'], dtype=object)
+
+
+@pytest.fixture
+def metadata_path(tmp_path):
+    csv_path = tmp_path / 'reviews.csv'
+    REVIEWS.to_csv(csv_path, index=False)
+    path = str(tmp_path / 'metadata.npz')
+    build_metadata_index(str(csv_path), path, mapping=MAPPING)
+    return path
+
+
+def test_canonical_matches_through_a_near_duplicate(metadata_path):
+    assert select_rows({'online_store': 'store_b'}, INDEXED, metadata_path).tolist() == [0, 1]
+    assert select_rows({'online_store': 'store_a', 'review_rating': {'gte': 3}}, INDEXED, metadata_path).tolist() == [1]
+    # Conditions hold for one review, not across the members of a cluster
+    assert select_rows({'online_store': 'store_b', 'review_rating': 5}, INDEXED, metadata_path).tolist() == []
+
+
+def test_dates_are_day_first_and_iso_filters_parse(metadata_path):
+    rows = select_rows({'review_date': {'gte': '2019-01-03', 'lt': '2019-07-01'}}, INDEXED, metadata_path)
+    assert INDEXED[rows].tolist() == ['a', 'b']
+    with pytest.raises(ValueError):
+        select_rows({'review_date': {'gte': 'not a date'}}, INDEXED, metadata_path)
+
+
+def test_invalid_conditions_raise(metadata_path):
+    for filters in ({'online_store': {}}, {'unknown': 1}, {'online_store': {'gt': 'a'}}):
+        with pytest.raises(ValueError):
+            select_rows(filters, INDEXED, metadata_path)
+
+
+def test_matches_checks_each_review_itself():
+    index = MetadataIndex.from_frame(REVIEWS.merge(MAPPING))
+    assert index.matches({'online_store': 'STORE_B'}, ['a', 'a2', 'missing']).tolist() == [False, True, False]
+
+
+def test_filtered_results_map_to_the_matching_member(metadata_path, tmp_path, monkeypatch):
+    from retrieval.query_api import expand_to_members
+
+    monkeypatch.setenv('LLM_DB_URL', f"sqlite:///{tmp_path / 'reviews.db'}")
+    database_setup.dispose_engines()
+    try:
+        with database_setup.get_engine('write').begin() as connection:
+            MAPPING.to_sql('review_duplicates', connection, index=False)
+        assert expand_to_members(['a', 'b']) == ['a', 'a2', 'b']
+        assert expand_to_members(['c', 'a'], {'online_store': 'STORE_B'}, metadata_path, per_cluster=1) == ['c', 'a2']
+    finally:
+        database_setup.dispose_engines()
+
+
+def test_matching_members_replaces_only_hits_matched_through_a_member(metadata_path, tmp_path, monkeypatch):
+    from retrieval.query_api import matching_members
+
+    # Hits that match themselves are returned without a database lookup
+    monkeypatch.setenv('LLM_DB_URL', 'mssql+pyodbc://unreachable/db')
+    database_setup.dispose_engines()
+    assert matching_members(['c', 'b'], {'review_rating': {'lte': 2}}, metadata_path) == ['c', 'b']
+
+    monkeypatch.setenv('LLM_DB_URL', f"sqlite:///{tmp_path / 'reviews.db'}")
+    database_setup.dispose_engines()
+    try:
+        with database_setup.get_engine('write').begin() as connection:
+            MAPPING.to_sql('review_duplicates', connection, index=False)
+        assert matching_members(['c', 'a'], {'online_store': 'STORE_B'}, metadata_path) == ['c', 'a2']
+    finally:
+        database_setup.dispose_engines()
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from monitoring import metrics
+from monitoring.metrics import REGISTRY, stage
+
+
+@pytest.mark.skipif(metrics._memory_status() is None, reason="needs /proc")
+def test_stage_peak_rss_is_per_stage(monkeypatch):
+    monkeypatch.setattr(metrics, '_enabled', True)
+    REGISTRY.reset()
+    with stage('heavy'):
+        block = np.ones(64 * 2 ** 20 // 8)  # 64 MiB, written so it is resident
+    del block
+    with stage('light'):
+        pass
+
+    lines = dict(line.rsplit(' ', 1) for line in REGISTRY.to_prometheus().splitlines() if not line.startswith('#'))
+    heavy_growth = float(lines['stage_rss_growth_bytes{stage="heavy"}'])
+    assert heavy_growth >= 48 * 2 ** 20
+    # The light stage after it must not inherit the heavy stage's high-water mark
+    assert float(lines['stage_peak_rss_bytes{stage="light"}']) < float(lines['stage_peak_rss_bytes{stage="heavy"}'])
+    assert float(lines['stage_rss_growth_bytes{stage="light"}']) < heavy_growth
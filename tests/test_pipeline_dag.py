@@ -0,0 +1,64 @@
+import os
+
+import pandas as pd
+
+from pipeline.dag import PipelineRunner, Stage
+
+
+def read_numbers(path, chunk_size):
+    yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def double(chunk):
+    return chunk.assign(value=chunk['value'] * 2)
+
+
+def total(chunks, label):
+    return pd.DataFrame({'label': [label], 'total': [sum(int(chunk['value'].sum()) for chunk in chunks)]})
+
+
+def build(path, chunk_size=2, label='sum'):
+    return [
+        Stage('ingest', read_numbers, kind='source', params={'path': path, 'chunk_size': chunk_size}),
+        Stage('double', double, input='ingest', executor='thread'),
+        Stage('total', total, kind='table', input='double', params={'label': label}),
+    ]
+
+
+def run(path, run_dir, **kwargs):
+    report = PipelineRunner(build(path, **kwargs), run_dir).run()
+    result = pd.read_parquet(os.path.join(run_dir, 'total', 'result.parquet'))
+    return report, result.iloc[0].to_dict()
+
+
+def write(path, values):
+    pd.DataFrame({'value': values}).to_csv(path, index=False)
+    return str(path)
+
+
+def test_rerun_uses_checkpoints(tmp_path):
+    path = write(tmp_path / 'numbers.csv', [1, 2, 3])
+    _, result = run(path, str(tmp_path / 'run'))
+    report, again = run(path, str(tmp_path / 'run'))
+    assert again == result == {'label': 'sum', 'total': 12}
+    assert all(summary.get('checkpointed') for summary in report.values())
+
+
+def test_changed_input_file_invalidates_checkpoints(tmp_path):
+    run_dir = str(tmp_path / 'run')
+    run(write(tmp_path / 'numbers.csv', [1, 2, 3]), run_dir)
+    report, result = run(write(tmp_path / 'other.csv', [10, 20]), run_dir)
+    assert result['total'] == 60
+    assert not any(summary.get('checkpointed') for summary in report.values())
+
+
+def test_changed_params_invalidate_only_affected_stages(tmp_path):
+    path, run_dir = write(tmp_path / 'numbers.csv', [1, 2, 3]), str(tmp_path / 'run')
+    run(path, run_dir)
+    report, result = run(path, run_dir, label='renamed')
+    assert result == {'label': 'renamed', 'total': 12}
+    assert report['double'].get('checkpointed') and not report['total'].get('checkpointed')
+
+    report, _ = run(path, run_dir, chunk_size=1, label='renamed')
+    assert report['ingest']['chunks'] == 3
+    assert not any(summary.get('checkpointed') for summary in report.values())
@@ -0,0 +1,31 @@
+import numpy as np
+import pytest
+
+from retrieval.exact_search import ExactSearchIndex
+from retrieval.quantized_search import QuantizedIndex
+from vectorization.vector_store import VectorStore
+
+
+@pytest.fixture
+def store_path(tmp_path):
+    vectors = np.random.default_rng(0).standard_normal((300, 64)).astype(np.float32)
+    store = VectorStore.create(str(tmp_path), dim=64)
+    store.append([f"r{i}" for i in range(300)], vectors)
+    return str(tmp_path)
+
+
+@pytest.mark.parametrize('mode', ['int8', 'binary'])
+def test_rescored_results_match_exact_search(store_path, mode):
+    index = QuantizedIndex.from_vector_store(store_path, mode=mode, rescore_k=150, block_size=64)
+    exact = ExactSearchIndex.from_vector_store(store_path)
+    queries = np.random.default_rng(1).standard_normal((4, 64)).astype(np.float32)
+    ids, scores = index.search(queries, top_k=3)
+    assert [query_ids[0] for query_ids in ids] == [query_ids[0] for query_ids in exact.search(queries, top_k=3)[0]]
+    assert np.all(np.diff(scores, axis=1) <= 0)
+
+
+def test_coarse_search_respects_rows(store_path):
+    index = QuantizedIndex.from_vector_store(store_path, mode='int8', block_size=64)
+    rows = np.arange(100, 200)
+    ids, _ = index.search(np.ones(64, dtype=np.float32), top_k=10, rescore_k=0, rows=rows)
+    assert len(ids) == 10 and all(100 <= int(review_id[1:]) < 200 for review_id in ids)
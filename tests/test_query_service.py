@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from retrieval.exact_search import ExactSearchIndex
+from retrieval.metadata_filter import MetadataIndex
+from retrieval.query_service import QueryService
+
+IDS = ['a', 'b', 'c']
+
+
+class BlockingEncoder:
+    """
+    Encodes prompts to fixed vectors; holds each batch until `release` is set.
+    """
+
+    def __init__(self, blocking=False):
+        self.release = threading.Event()
+        if not blocking:
+            self.release.set()
+
+    def encode(self, prompts, batch_size=None):
+        self.release.wait(5)
+        return np.tile(np.arange(1, 9, dtype=np.float32), (len(prompts), 1))
+
+
+@pytest.fixture
+def index():
+    return ExactSearchIndex(IDS, np.random.default_rng(0).random((3, 8)).astype(np.float32))
+
+
+def test_invalid_filter_fails_only_its_request(index, tmp_path):
+    metadata_path = str(tmp_path / 'metadata.npz')
+    MetadataIndex.from_frame(pd.DataFrame({'review_hash_id': IDS, 'brand': ['Dove', 'Knorr', 'Dove']})).save(metadata_path)
+
+    async def run():
+        service = QueryService(index, encoder=BlockingEncoder(), metadata_path=metadata_path, max_wait_ms=50, use_cache=False)
+        await service.start()
+        try:
+            return await asyncio.gather(service.query('x', 2), service.query('y', 3, {'brand': 'Dove'}),
+                                        service.query('z', 2, {'unknown': 1}), return_exceptions=True)
+        finally:
+            await service.stop()
+
+    plain, filtered, invalid = asyncio.run(run())
+    assert len(plain[0]) == 2
+    assert sorted(filtered[0]) == ['a', 'c']
+    assert isinstance(invalid, ValueError)
+
+
+def test_stop_fails_pending_requests(index):
+    encoder = BlockingEncoder(blocking=True)
+
+    async def run():
+        service = QueryService(index, encoder=encoder, max_batch_size=2, max_wait_ms=1, use_cache=False)
+        await service.start()
+        requests = [asyncio.create_task(service.query(f"q{i}", 2)) for i in range(5)]
+        await asyncio.sleep(0.05)  # The first batch is now being encoded, the rest are queued
+        await service.stop()
+        encoder.release.set()
+        results = await asyncio.wait_for(asyncio.gather(*requests, return_exceptions=True), 5)
+        with pytest.raises(RuntimeError):
+            await service.query('late', 2)
+        return results
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
@@ -0,0 +1,41 @@
+from retrieval.rag_use_case import ResponseCache, generate_summary_or_response, get_response_cache, pack_context
+
+
+class EchoSummarizer:
+    name = 'echo'
+
+    def __init__(self):
+        self.inputs = []
+
+    def __call__(self, input_text, **params):
+        self.inputs.append(input_text)
+        return [{'summary_text': f"answer {len(self.inputs)}"}]
+
+
+RECORDS = [{'review_hash_id': 'a', 'review_text': 'Battery life is short and the case cracks after a week of use.'},
+           {'review_hash_id': 'b', 'review_text': 'Smells fresh all day but leaves white marks on dark clothes.'}]
+
+
+def test_pack_context_keeps_scores_with_their_records():
+    records = [{'review_text': ''}, {'review_text': 'low score'}, {'review_text': 'high score'}]
+    assert pack_context(records, 'q', scores=[0.9, 0.1, 0.8]) == [{'review_text': 'high score'}, {'review_text': 'low score'}]
+
+
+def test_response_cache_keys_on_the_exact_model_input():
+    get_response_cache().clear()
+    summarizer = EchoSummarizer()
+    first = generate_summary_or_response(RECORDS, 'Any issues?', summarizer)
+    assert generate_summary_or_response(RECORDS, 'Any issues?', summarizer) == first
+    assert len(summarizer.inputs) == 1
+
+    # Case, context order and truncation all change what the model sees
+    generate_summary_or_response(RECORDS, 'any issues?', summarizer)
+    generate_summary_or_response(RECORDS[::-1], 'Any issues?', summarizer)
+    generate_summary_or_response(RECORDS, 'Any issues?', summarizer, max_input_tokens=25)
+    assert len(summarizer.inputs) == len(set(summarizer.inputs)) == 4
+
+
+def test_make_key_includes_model_and_params():
+    key = ResponseCache.make_key('input', 'model', {'max_length': 40})
+    assert key != ResponseCache.make_key('input', 'other', {'max_length': 40})
+    assert key != ResponseCache.make_key('input', 'model', {'max_length': 30})
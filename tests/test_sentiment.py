@@ -0,0 +1,19 @@
+import os
+
+import pandas as pd
+
+from preprocessing.sentiment import LexiconSentimentScorer, TextBlobSentimentScorer, parity_report
+from preprocessing.text_cleaning import clean_text
+
+SAMPLE_CSV = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'input', 'amazon_reviews.csv'))
+SAMPLE_SIZE = 1000
+
+
+def test_lexicon_scorer_matches_textblob():
+    # A fixed sample: the first reviews of the bundled export, cleaned as the pipeline does
+    reviews = pd.read_csv(SAMPLE_CSV, usecols=['review_text'], nrows=SAMPLE_SIZE, encoding='utf-8-sig')
+    texts = [clean_text(text) for text in reviews['review_text'].dropna()]
+
+    report = parity_report(texts, LexiconSentimentScorer(cache_size=0), TextBlobSentimentScorer(cache_size=0))
+    assert report['n'] == len(texts) > 0
+    assert report['within_0_01'] >= 0.99
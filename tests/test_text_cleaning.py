@@ -0,0 +1,18 @@
+from preprocessing.text_cleaning import clean_csv_streaming
+
+
+def test_clean_csv_streaming_empty_input(tmp_path):
+    input_csv = tmp_path / 'empty.csv'
+    input_csv.write_text('')
+    assert clean_csv_streaming(str(input_csv), str(tmp_path / 'cleaned.csv')) == 0
+
+
+def test_clean_csv_streaming_imputes_missing_values(tmp_path):
+    input_csv = tmp_path / 'reviews.csv'
+    input_csv.write_text('brand,review_text\nDove,Great smell!!\n,Lasts  all day\nDove,\n,\n')
+    output_csv = tmp_path / 'cleaned.csv'
+
+    assert clean_csv_streaming(str(input_csv), str(output_csv)) == 3
+    lines = output_csv.read_text().splitlines()
+    assert lines[0] == 'brand,review_text'
+    assert lines[1:] == ['dove,great smell', 'dove,lasts all day', 'dove,great smell']
@@ -1,57 +1,134 @@
+import hashlib
 import os
 import sys
-from sentence_transformers import SentenceTransformer
+import time
 import pandas as pd
 import numpy as np
+from sqlalchemy import inspect
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
 
 from ingestion.database_setup import get_database_connection
+from monitoring.metrics import stage
+from preprocessing.dedupe import DUPLICATES_TABLE
+from vectorization.model_manager import DEFAULT_MODEL_NAME, get_embedding_model
+from vectorization.vector_store import DEFAULT_STORE_PATH, VectorStore
 import logging
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger()
 
-# Initialize the Sentence Transformer model
-model = SentenceTransformer('all-MiniLM-L6-v2')  # You can use other models as well
+# Sentence Transformer model, loaded once per process by the model manager on first use
+MODEL_NAME = DEFAULT_MODEL_NAME  # You can use other models as well
 
 def get_embeddings(texts):
     """
     Given a list of texts, return their embeddings.
     """
     try:
-        embeddings = model.encode(texts, convert_to_tensor=True)
+        embeddings = get_embedding_model(MODEL_NAME).encode(texts, convert_to_tensor=True)
         return embeddings
     except Exception as e:
         logger.error(f"Error generating embeddings: {e}")
         return []
 
-def save_embeddings_to_csv():
-    try:
-        # Step 1: Load preprocessed data from the database
-        engine = get_database_connection()
-        df = pd.read_sql('SELECT * FROM processed_product_reviews', con=engine)
+def content_hash(cleaned_review_text, model_name=MODEL_NAME):
+    """
+    Hash of the text and the model that embedded it; a change to either means re-embedding.
+    """
+    return hashlib.sha1(f"{model_name}\0{cleaned_review_text}".encode('utf-8')).hexdigest()
 
-        # Step 2: Generate embeddings for the cleaned reviews
-        embeddings = df['cleaned_review_text'].apply(lambda x: get_embeddings([x])).tolist()
+def iter_review_chunks(chunk_size=10000, canonical_only=False):
+    """
+    Stream (review_hash_id, cleaned_review_text) rows from the database in chunks.
+    With canonical_only, near-duplicates recorded in review_duplicates are skipped; reviews
+    added since the last dedupe run are still included.
+    """
+    engine = get_database_connection()
+    query = 'SELECT review_hash_id, cleaned_review_text FROM processed_product_reviews'
+    if canonical_only:
+        if inspect(engine).has_table(DUPLICATES_TABLE):
+            query = (f"SELECT p.review_hash_id, p.cleaned_review_text FROM processed_product_reviews p "
+                     f"LEFT JOIN {DUPLICATES_TABLE} d ON d.review_hash_id = p.review_hash_id "
+                     f"WHERE d.review_hash_id IS NULL OR d.canonical_review_hash_id = p.review_hash_id")
+        else:
+            logger.warning(f"No {DUPLICATES_TABLE} table; run preprocessing/dedupe.py first. Embedding every review.")
+    with engine.connect().execution_options(stream_results=True) as conn:
+        for chunk in pd.read_sql(query, con=conn, chunksize=chunk_size):
+            chunk['cleaned_review_text'] = chunk['cleaned_review_text'].fillna('').astype(str)
+            yield chunk
 
-        # Flatten the embeddings from (1, 384) to a 1D array with 384 elements for each review
-        embeddings_flattened = [embedding[0] for embedding in embeddings]  # Get the first element, which is a 384-dimensional array
+def encode_batch(texts, batch_size=64):
+    """
+    Encode a list of texts in length-sorted order (less padding per batch) and return
+    a float32 array in the original order.
+    """
+    order = np.argsort([len(text) for text in texts], kind='stable')
+    with stage('embedding', rows=len(texts)):
+        encoded = get_embedding_model(MODEL_NAME).encode([texts[i] for i in order], batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+    embeddings = np.empty_like(encoded, dtype=np.float32)
+    embeddings[order] = encoded
+    return embeddings
+
+def generate_embeddings(write_chunk, chunk_size=10000, batch_size=64, num_threads=None, canonical_only=False):
+    """
+    Embed every review chunk by chunk and hand each (review_ids, float32 embeddings, texts)
+    triple to `write_chunk`, so only one chunk is held in memory at a time.
+    """
+    if num_threads:
+        import torch
+        torch.set_num_threads(num_threads)
 
-        # Convert the flattened embeddings to a DataFrame
-        embeddings_df = pd.DataFrame(embeddings_flattened)
+    total = 0
+    start_time = time.perf_counter()
+    for chunk in iter_review_chunks(chunk_size, canonical_only):
+        texts = chunk['cleaned_review_text'].tolist()
+        embeddings = encode_batch(texts, batch_size=batch_size)
+        write_chunk(chunk['review_hash_id'].tolist(), embeddings, texts)
+        total += len(chunk)
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"Embedded {total} reviews ({total / elapsed:.1f} reviews/sec).")
+    return total
 
-        # Add review IDs for reference
-        embeddings_df['review_id'] = df['review_hash_id']  # Assuming you have review_hash_id as the ID
+def save_embeddings_to_csv(output_path='review_embeddings.csv', chunk_size=10000, batch_size=64, num_threads=None, canonical_only=True):
+    try:
+        # The first chunk creates the file with a header; later chunks are appended as they are encoded
+        first_chunk = True
 
-        # Save embeddings and associated review ids to a CSV file
-        embeddings_df.to_csv('review_embeddings.csv', index=False)
+        def write_chunk(review_ids, embeddings, texts):
+            nonlocal first_chunk
+            embeddings_df = pd.DataFrame(embeddings)
+            embeddings_df['review_id'] = review_ids
+            embeddings_df.to_csv(output_path, mode='w' if first_chunk else 'a', header=first_chunk, index=False)
+            first_chunk = False
 
-        logger.info("Embeddings saved to review_embeddings.csv successfully.")
+        total = generate_embeddings(write_chunk, chunk_size, batch_size, num_threads, canonical_only)
+        logger.info(f"{total} embeddings saved to {output_path} successfully.")
 
     except Exception as e:
         logger.error(f"Error during saving embeddings to CSV: {e}")
 
+def save_embeddings_to_vector_store(store_path=DEFAULT_STORE_PATH, chunk_size=10000, batch_size=64, num_threads=None, dtype='float32',
+                                    canonical_only=True):
+    """
+    Embed every review (only canonicals of near-duplicate clusters, by default) and append the
+    float32 vectors to a fresh binary vector store.
+    """
+    try:
+        store = VectorStore.create(store_path, model_name=MODEL_NAME, dim=get_embedding_model(MODEL_NAME).get_sentence_embedding_dimension(),
+                                   dtype=dtype, overwrite=True)
+
+        def write_chunk(review_ids, embeddings, texts):
+            # Record content hashes so later incremental runs can skip unchanged reviews
+            store.append(review_ids, embeddings, content_hashes=[content_hash(text) for text in texts])
+
+        total = generate_embeddings(write_chunk, chunk_size, batch_size, num_threads, canonical_only)
+        logger.info(f"{total} embeddings saved to the vector store at {store_path} successfully.")
+        return store
+    except Exception as e:
+        logger.error(f"Error during saving embeddings to vector store: {e}")
+        return None
+
 if __name__ == '__main__':
     save_embeddings_to_csv()
@@ -0,0 +1,82 @@
+import logging
+import os
+import sys
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from retrieval.ann_index import DEFAULT_INDEX_PATH, IVFPQIndex
+from vectorization.embeddings_model import MODEL_NAME, content_hash, encode_batch, iter_review_chunks
+from vectorization.model_manager import get_embedding_model
+from vectorization.vector_store import DEFAULT_STORE_PATH, HEADER_FILE, VectorStore
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger()
+
+
+def _open_or_create_store(store_path):
+    if os.path.exists(os.path.join(store_path, HEADER_FILE)):
+        store = VectorStore.open(store_path)
+        if store.model_name != MODEL_NAME:
+            raise ValueError(f"Vector store at {store_path} was built with {store.model_name}, not {MODEL_NAME}; "
+                             "rebuild it with save_embeddings_to_vector_store.")
+        return store
+    return VectorStore.create(store_path, model_name=MODEL_NAME, dim=get_embedding_model(MODEL_NAME).get_sentence_embedding_dimension())
+
+
+def update_embeddings_incrementally(store_path=DEFAULT_STORE_PATH, index_path=DEFAULT_INDEX_PATH,
+                                    chunk_size=10000, batch_size=64, canonical_only=True):
+    """
+    Embed only new or changed reviews and upsert them into the vector store and the ANN index.
+
+    A review is re-embedded when its review_hash_id is not in the store or the hash of its
+    cleaned_review_text and the model name differs from the stored one. Reviews that are no
+    longer in processed_product_reviews are tombstoned, as are reviews that became near-duplicates
+    of another canonical when canonical_only is set. Nothing is rebuilt from scratch.
+    """
+    start_time = time.perf_counter()
+    store = _open_or_create_store(store_path)
+    stored_hashes = store.live_content_hashes()
+    index = IVFPQIndex.load(index_path) if index_path and os.path.exists(index_path) else None
+    if index is not None and len(index.review_ids) != len(store):
+        raise ValueError(f"ANN index at {index_path} is out of sync with the vector store; rebuild it with build_index_from_store.")
+
+    seen = set()
+    scanned = embedded = 0
+    for chunk in iter_review_chunks(chunk_size, canonical_only):
+        review_ids = chunk['review_hash_id'].astype(str).tolist()
+        texts = chunk['cleaned_review_text'].tolist()
+        hashes = [content_hash(text) for text in texts]
+        seen.update(review_ids)
+        scanned += len(review_ids)
+
+        pending = [i for i, (review_id, h) in enumerate(zip(review_ids, hashes)) if stored_hashes.get(review_id) != h]
+        if not pending:
+            continue
+        pending_ids = [review_ids[i] for i in pending]
+        embeddings = encode_batch([texts[i] for i in pending], batch_size=batch_size)
+        store.append(pending_ids, embeddings, content_hashes=[hashes[i] for i in pending])
+        if index is not None:
+            # Tombstone the superseded rows before adding, so the new rows stay live
+            index.remove(pending_ids)
+            index.add(embeddings, pending_ids, keep_vectors=index.vector_store_path is None)
+        embedded += len(pending)
+
+    deleted_ids = [review_id for review_id in stored_hashes if review_id not in seen]
+    store.delete(deleted_ids)
+    if index is not None:
+        index.remove(deleted_ids)
+        if index.vector_store_path:
+            # The store grew; remap it so re-ranking sees the new rows
+            index.attach_vector_store(index.vector_store_path)
+        index.save(index_path)
+
+    elapsed = time.perf_counter() - start_time
+    logger.info(f"Incremental embedding update: scanned {scanned} reviews, embedded {embedded}, "
+                f"tombstoned {len(deleted_ids)} in {elapsed:.1f}s.")
+    return {'scanned': scanned, 'embedded': embedded, 'deleted': len(deleted_ids)}
+
+
+if __name__ == '__main__':
+    update_embeddings_incrementally()
@@ -0,0 +1,213 @@
+import atexit
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))  # Root directory
+
+from monitoring.metrics import count
+
+logger = logging.getLogger()
+
+DEFAULT_MODEL_NAME = 'all-MiniLM-L6-v2'
+
+# Set LLM_QUERY_CACHE_PATH to persist the query-embedding cache across restarts
+QUERY_CACHE_PATH_ENV = 'LLM_QUERY_CACHE_PATH'
+DEFAULT_QUERY_CACHE_SIZE = 100000
+# Set LLM_FAST_START=1 to defer loading the model (and torch) until a prompt misses the cache
+FAST_START_ENV = 'LLM_FAST_START'
+
+# Models and caches live for the whole process and are shared by every caller
+_models = {}
+_query_caches = {}
+_lock = threading.Lock()
+
+
+def get_embedding_model(model_name=DEFAULT_MODEL_NAME):
+    """
+    Return the SentenceTransformer for `model_name`, loading it on first use only.
+    """
+    model = _models.get(model_name)
+    if model is not None:
+        return model
+    with _lock:
+        if model_name not in _models:
+            from sentence_transformers import SentenceTransformer
+
+            logger.info(f"Loading embedding model {model_name}...")
+            _models[model_name] = SentenceTransformer(model_name)
+            logger.info(f"Embedding model {model_name} loaded.")
+        return _models[model_name]
+
+
+def fast_start_enabled():
+    return os.environ.get(FAST_START_ENV, '0').lower() not in ('0', 'false', 'no', '')
+
+
+class LazyEmbeddingModel:
+    """
+    Stand-in for a managed model that loads it on the first encode() call. Lets a process start
+    and serve cached prompts without importing sentence_transformers or torch.
+    """
+
+    def __init__(self, model_name=DEFAULT_MODEL_NAME):
+        self.model_name = model_name
+
+    @property
+    def loaded(self):
+        return self.model_name in _models
+
+    def encode(self, *args, **kwargs):
+        return get_embedding_model(self.model_name).encode(*args, **kwargs)
+
+
+def model_name_for(model):
+    """
+    Name under which a managed model was loaded, or None for models loaded elsewhere.
+    """
+    if isinstance(model, LazyEmbeddingModel):
+        return model.model_name
+    for name, managed in _models.items():
+        if managed is model:
+            return name
+    return None
+
+
+def normalize_prompt(prompt):
+    """
+    Cache key for a prompt: trimmed, whitespace-collapsed and lowercased. Lowercasing is safe
+    because the MiniLM tokenizer is uncased, so it produces the same embedding.
+    """
+    return ' '.join(prompt.split()).lower()
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache from normalized prompt text to its embedding, with hit/miss counters
+    and optional persistence to an .npz file.
+    """
+
+    def __init__(self, max_size=DEFAULT_QUERY_CACHE_SIZE, persist_path=None):
+        self.max_size = max_size
+        self.persist_path = persist_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if persist_path and os.path.exists(persist_path):
+            self.load(persist_path)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, prompt):
+        key = normalize_prompt(prompt)
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is None:
+                self.misses += 1
+                count('cache_requests', cache='query_embedding', result='miss')
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            count('cache_requests', cache='query_embedding', result='hit')
+            return embedding
+
+    def put(self, prompt, embedding):
+        embedding = np.asarray(embedding, dtype=np.float32)
+        embedding.setflags(write=False)  # Shared between callers; nobody may modify it in place
+        key = normalize_prompt(prompt)
+        with self._lock:
+            self._entries[key] = embedding
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'size': len(self), 'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0}
+
+    def save(self, path=None):
+        path = path or self.persist_path
+        with self._lock:
+            keys = list(self._entries)
+            vectors = np.stack(list(self._entries.values())) if keys else np.zeros((0, 0), dtype=np.float32)
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'wb') as f:
+            np.savez(f, keys=np.array(keys, dtype=str), vectors=vectors)
+        logger.info(f"Saved {len(keys)} cached query embeddings to {path}.")
+
+    def load(self, path=None):
+        path = path or self.persist_path
+        with np.load(path, allow_pickle=False) as archive:
+            for key, vector in zip(archive['keys'].tolist(), archive['vectors']):
+                self.put(key, vector)
+        logger.info(f"Loaded {len(self)} cached query embeddings from {path}.")
+
+
+def get_query_embedding_cache(model_name=DEFAULT_MODEL_NAME, max_size=DEFAULT_QUERY_CACHE_SIZE):
+    """
+    Return the process-wide query-embedding cache for `model_name`. With LLM_QUERY_CACHE_PATH set,
+    the cache is loaded from <path>.<model_name>.npz and saved back at exit.
+    """
+    cache = _query_caches.get(model_name)
+    if cache is not None:
+        return cache
+    with _lock:
+        if model_name not in _query_caches:
+            persist_path = None
+            if os.environ.get(QUERY_CACHE_PATH_ENV):
+                persist_path = f"{os.environ[QUERY_CACHE_PATH_ENV]}.{model_name.replace('/', '_')}.npz"
+            cache = QueryEmbeddingCache(max_size, persist_path)
+            if persist_path:
+                atexit.register(cache.save)
+            _query_caches[model_name] = cache
+        return _query_caches[model_name]
+
+
+def encode_query(prompt, model_name=DEFAULT_MODEL_NAME):
+    """
+    Embedding for a single prompt, served from the cache when the prompt was seen before.
+    """
+    cache = get_query_embedding_cache(model_name)
+    embedding = cache.get(prompt)
+    if embedding is None:
+        embedding = np.asarray(get_embedding_model(model_name).encode(prompt), dtype=np.float32)
+        cache.put(prompt, embedding)
+    return embedding
+
+
+def precompute_query_embeddings(prompts, model_name=DEFAULT_MODEL_NAME, batch_size=64):
+    """
+    Encode the prompts not cached yet and save the cache, so fast-start processes can answer
+    them without loading the model. Needs LLM_QUERY_CACHE_PATH to persist anything.
+    """
+    cache = get_query_embedding_cache(model_name)
+    missing = list(dict.fromkeys(prompt for prompt in prompts if cache.get(prompt) is None))
+    if missing:
+        embeddings = get_embedding_model(model_name).encode(missing, batch_size=batch_size)
+        for prompt, embedding in zip(missing, embeddings):
+            cache.put(prompt, embedding)
+    if cache.persist_path:
+        cache.save()
+    else:
+        logger.warning(f"{QUERY_CACHE_PATH_ENV} is not set; precomputed embeddings are not persisted.")
+    return len(missing)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Precompute the persisted query-embedding cache from a file of prompts, one per line.")
+    parser.add_argument('prompts', help="Text file with one prompt per line")
+    parser.add_argument('--model-name', default=DEFAULT_MODEL_NAME)
+    args = parser.parse_args()
+    with open(args.prompts, encoding='utf-8') as f:
+        prompts = [line.strip() for line in f if line.strip()]
+    logger.info(f"Encoded {precompute_query_embeddings(prompts, args.model_name)} new prompts.")
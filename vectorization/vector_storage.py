@@ -6,6 +6,9 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 from ingestion.database_setup import get_database_connection  # Import the database connection function
+from ingestion.bulk_loader import bulk_load
+from monitoring.logging_config import LazyRepr
+from vectorization.vector_store import DEFAULT_STORE_PATH, VectorStore
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -23,7 +26,7 @@ def load_embeddings_from_json(file_path):
             data = json.load(f)
         
         # Check the first few entries to debug
-        logger.info(f"First few entries: {data[:5]}")
+        logger.info("First few entries: %s", LazyRepr(data[:5]))
 
         # Ensure the JSON data is in the expected format
         if not all(['review_id' in entry and 'embedding' in entry for entry in data]):
@@ -63,24 +66,43 @@ def insert_embeddings_into_db(df):
     """
     try:
         # Connect to the database using the engine from database_setup.py
-        engine = get_database_connection()
+        engine = get_database_connection(role='write')
         logger.info("Database connection established successfully.")
         
         # Convert numpy array to list and then to JSON for storage
-        df['review_embeddings'] = df['review_embeddings'].apply(lambda x: json.dumps(x.tolist()))
+        # (on a copy, so the caller's numpy vectors stay usable for the vector store)
+        df = df.assign(review_embeddings=df['review_embeddings'].apply(lambda x: json.dumps(x.tolist())))
 
-        # Use pandas to_sql for bulk insert (replace existing table if needed)
-        with engine.begin():  # This ensures a transaction is used if you're using SQLAlchemy
-            df.to_sql('review_embeddings_table', con=engine, if_exists='replace', index=False)
+        # Stage in chunks and swap in the new table, so readers never see it missing
+        bulk_load(df, 'review_embeddings_table', engine, mode='replace')
         
         logger.info(f"Successfully inserted {len(df)} embeddings into the database.")
     
     except Exception as e:
         logger.error(f"Error inserting embeddings into database: {e}")
 
+def insert_embeddings_into_vector_store(df, store_path=DEFAULT_STORE_PATH, model_name='all-MiniLM-L6-v2', dtype='float32'):
+    """
+    Append the review embeddings to the binary vector store, creating it on first use.
+    Vectors are written as raw float32/float16 rows instead of JSON text.
+    """
+    try:
+        vectors = np.vstack(df['review_embeddings'].to_numpy()).astype(np.float32)
+        if os.path.exists(os.path.join(store_path, 'header.json')):
+            store = VectorStore.open(store_path)
+        else:
+            store = VectorStore.create(store_path, model_name=model_name, dim=vectors.shape[1], dtype=dtype)
+        store.append(df['review_id'].tolist(), vectors)
+        logger.info(f"Successfully appended {len(df)} embeddings to the vector store at {store_path}.")
+        return store
+    except Exception as e:
+        logger.error(f"Error inserting embeddings into vector store: {e}")
+        return None
+
 # Example of how the function would be used
 if __name__ == '__main__':
     file_path = 'C:/Users/RNaveen/Documents/LLM-Data-Engineer-Assignment/vectorization/cleaned_vector_store.json'
     df = load_embeddings_from_json(file_path)
     if not df.empty:
         print(df.head())  # You can use this to verify the output
+        insert_embeddings_into_vector_store(df)
@@ -0,0 +1,258 @@
+import json
+import logging
+import os
+import secrets
+
+import numpy as np
+
+# Set up logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger()
+
+DEFAULT_STORE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'vector_store'))
+
+HEADER_FILE = 'header.json'
+VECTORS_FILE = 'vectors.bin'
+IDS_FILE = 'ids.txt'
+HASHES_FILE = 'hashes.txt'
+TOMBSTONES_FILE = 'tombstones.txt'
+STORE_VERSION = 1
+SUPPORTED_DTYPES = ('float32', 'float16')
+
+
+class VectorStore:
+    """
+    Append-only on-disk embedding store.
+
+    A store is a directory holding a contiguous row-major matrix (`vectors.bin`), one review id
+    per line in row order (`ids.txt`) and a `header.json` with the model name, dimension, dtype
+    and row count. The matrix is opened with np.memmap, so opening a store does not read the
+    vectors and the pages are shared by every process that maps the same file.
+
+    Rows are never rewritten: appending an id again supersedes its earlier row, and deleted ids
+    are recorded in `tombstones.txt`. `hashes.txt` holds an optional content hash per row so
+    incremental runs can tell which reviews changed.
+    """
+
+    def __init__(self, path, header):
+        self.path = path
+        self.header = header
+        self.model_name = header['model_name']
+        self.dim = header['dim']
+        self.dtype = np.dtype(header['dtype'])
+        self._vectors = None
+        self._ids = None
+        self._hashes = None
+        self._id_to_row = None
+        self._tombstones = None
+
+    @classmethod
+    def create(cls, path=DEFAULT_STORE_PATH, model_name='all-MiniLM-L6-v2', dim=384, dtype='float32', overwrite=False):
+        """
+        Create an empty store at `path`.
+        """
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported dtype {dtype}; expected one of {SUPPORTED_DTYPES}.")
+        if os.path.exists(os.path.join(path, HEADER_FILE)) and not overwrite:
+            raise FileExistsError(f"A vector store already exists at {path}.")
+        os.makedirs(path, exist_ok=True)
+        open(os.path.join(path, VECTORS_FILE), 'wb').close()
+        for name in (IDS_FILE, HASHES_FILE, TOMBSTONES_FILE):
+            open(os.path.join(path, name), 'w', encoding='utf-8').close()
+        # A new generation per create(), so indexes derived from a replaced store are never reused
+        header = {'version': STORE_VERSION, 'model_name': model_name, 'dim': int(dim), 'dtype': dtype, 'count': 0,
+                  'generation': secrets.randbits(62)}
+        store = cls(path, header)
+        store._write_header()
+        logger.info(f"Created vector store at {path} ({model_name}, dim={dim}, {dtype}).")
+        return store
+
+    @classmethod
+    def open(cls, path=DEFAULT_STORE_PATH):
+        """
+        Open an existing store. Vectors are memory-mapped lazily on first access.
+        """
+        with open(os.path.join(path, HEADER_FILE), 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        if header.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported vector store version {header.get('version')} at {path}.")
+        return cls(path, header)
+
+    def __len__(self):
+        return self.header['count']
+
+    def _write_header(self):
+        # Write then rename so readers never see a half-written header
+        tmp_path = os.path.join(self.path, HEADER_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.header, f)
+        os.replace(tmp_path, os.path.join(self.path, HEADER_FILE))
+
+    @property
+    def vectors(self):
+        """
+        Read-only (count, dim) memory map of the stored vectors.
+        """
+        if self._vectors is None:
+            if len(self) == 0:
+                self._vectors = np.zeros((0, self.dim), dtype=self.dtype)
+            else:
+                self._vectors = np.memmap(os.path.join(self.path, VECTORS_FILE), dtype=self.dtype,
+                                          mode='r', shape=(len(self), self.dim))
+        return self._vectors
+
+    @property
+    def ids(self):
+        """
+        Review ids in row order.
+        """
+        if self._ids is None:
+            with open(os.path.join(self.path, IDS_FILE), 'r', encoding='utf-8') as f:
+                # The header count is authoritative; ignore ids from an interrupted append
+                self._ids = [line.rstrip('\n') for _, line in zip(range(len(self)), f)]
+        return self._ids
+
+    @property
+    def content_hashes(self):
+        """
+        Content hash of each row in row order ('' when none was recorded).
+        """
+        if self._hashes is None:
+            hashes_path = os.path.join(self.path, HASHES_FILE)
+            if not os.path.exists(hashes_path):
+                self._hashes = [''] * len(self)
+            else:
+                with open(hashes_path, 'r', encoding='utf-8') as f:
+                    self._hashes = [line.rstrip('\n') for _, line in zip(range(len(self)), f)]
+        return self._hashes
+
+    @property
+    def tombstones(self):
+        """
+        Ids that have been deleted and not re-added since.
+        """
+        if self._tombstones is None:
+            self._tombstones = set()
+            tombstones_path = os.path.join(self.path, TOMBSTONES_FILE)
+            if not os.path.exists(tombstones_path):
+                return self._tombstones
+            with open(tombstones_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    # A later append revives a tombstoned id; tombstone lines record the row count at deletion
+                    review_id, count = line.rstrip('\n').rsplit('\t', 1)
+                    if self.id_to_row.get(review_id, -1) < int(count):
+                        self._tombstones.add(review_id)
+        return self._tombstones
+
+    @property
+    def id_to_row(self):
+        """
+        Mapping from review id to its most recent row.
+        """
+        if self._id_to_row is None:
+            self._id_to_row = {review_id: row for row, review_id in enumerate(self.ids)}
+        return self._id_to_row
+
+    def signature(self):
+        """
+        Value that changes whenever the store is recreated or rows are appended or tombstoned;
+        used to refresh derived indexes.
+        """
+        tombstones_path = os.path.join(self.path, TOMBSTONES_FILE)
+        return (self.header.get('generation', 0), len(self),
+                os.path.getsize(tombstones_path) if os.path.exists(tombstones_path) else 0)
+
+    def append(self, review_ids, vectors, content_hashes=None):
+        """
+        Append vectors for the given review ids and return their row numbers.
+        Re-appending an existing id supersedes its previous row.
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=self.dtype)
+        review_ids = [str(review_id) for review_id in review_ids]
+        if vectors.ndim != 2 or vectors.shape[1] != self.dim:
+            raise ValueError(f"Expected vectors of shape (n, {self.dim}), got {vectors.shape}.")
+        if len(review_ids) != len(vectors):
+            raise ValueError("review_ids and vectors must have the same length.")
+        if any('\n' in review_id or '\t' in review_id for review_id in review_ids):
+            raise ValueError("Review ids must not contain newlines or tabs.")
+        content_hashes = [''] * len(review_ids) if content_hashes is None else [str(h) for h in content_hashes]
+        if len(content_hashes) != len(review_ids):
+            raise ValueError("content_hashes and review_ids must have the same length.")
+
+        start = len(self)
+        self._truncate_to_count()
+        with open(os.path.join(self.path, VECTORS_FILE), 'ab') as f:
+            f.write(vectors.tobytes())
+        with open(os.path.join(self.path, IDS_FILE), 'a', encoding='utf-8') as f:
+            f.writelines(review_id + '\n' for review_id in review_ids)
+        with open(os.path.join(self.path, HASHES_FILE), 'a', encoding='utf-8') as f:
+            f.writelines(content_hash + '\n' for content_hash in content_hashes)
+        self.header['count'] = start + len(vectors)
+        self._write_header()
+
+        if self._ids is not None:
+            self._ids.extend(review_ids)
+        if self._hashes is not None:
+            self._hashes.extend(content_hashes)
+        if self._tombstones is not None:
+            self._tombstones.difference_update(review_ids)
+        if self._id_to_row is not None:
+            self._id_to_row.update((review_id, start + i) for i, review_id in enumerate(review_ids))
+        # The memory map has a fixed shape; remap on next access
+        self._vectors = None
+        return np.arange(start, start + len(vectors))
+
+    def _truncate_to_count(self):
+        """
+        Drop any bytes or ids left behind by an append that died before updating the header.
+        """
+        vectors_path = os.path.join(self.path, VECTORS_FILE)
+        expected = len(self) * self.dim * self.dtype.itemsize
+        if os.path.getsize(vectors_path) != expected:
+            with open(vectors_path, 'r+b') as f:
+                f.truncate(expected)
+            ids, hashes = self.ids, self.content_hashes
+            with open(os.path.join(self.path, IDS_FILE), 'w', encoding='utf-8') as f:
+                f.writelines(review_id + '\n' for review_id in ids)
+            with open(os.path.join(self.path, HASHES_FILE), 'w', encoding='utf-8') as f:
+                f.writelines(content_hash + '\n' for content_hash in hashes)
+
+    def delete(self, review_ids):
+        """
+        Tombstone the given ids. Their rows stay on disk but are no longer live.
+        """
+        review_ids = [str(review_id) for review_id in review_ids if str(review_id) in self.id_to_row]
+        with open(os.path.join(self.path, TOMBSTONES_FILE), 'a', encoding='utf-8') as f:
+            f.writelines(f"{review_id}\t{len(self)}\n" for review_id in review_ids)
+        self.tombstones.update(review_ids)
+        return len(review_ids)
+
+    def live_mask(self):
+        """
+        Boolean mask over rows that are the current version of a non-deleted id.
+        """
+        mask = np.zeros(len(self), dtype=bool)
+        tombstones = self.tombstones
+        mask[[row for review_id, row in self.id_to_row.items() if review_id not in tombstones]] = True
+        return mask
+
+    def live_content_hashes(self):
+        """
+        Mapping from every live id to the content hash of its current row.
+        """
+        hashes, tombstones = self.content_hashes, self.tombstones
+        return {review_id: hashes[row] for review_id, row in self.id_to_row.items() if review_id not in tombstones}
+
+    def get(self, review_ids):
+        """
+        Return the vectors for the given review ids, in the same order.
+        """
+        rows = [self.id_to_row[str(review_id)] for review_id in review_ids]
+        return np.asarray(self.vectors[rows])
+
+
+def open_vector_store(path=DEFAULT_STORE_PATH):
+    """
+    Open the vector store at `path` without reading the vectors into memory.
+    """
+    return VectorStore.open(path)